@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# admission.py — admission control and fair queuing for the analyze endpoints
+"""
+Every analysis consumes Groq capacity for 10-30 seconds, so admission is decided up front:
+
+1. Per-client token buckets cap how fast any one client may start scans → 429 with
+   Retry-After. Every request is charged to its client IP; a logged-in request is also
+   charged to its JWT user id, so neither many accounts behind one address nor one
+   account spread over many addresses gets past the limit.
+2. A global concurrency cap limits scans running in this process. Requests beyond it
+   wait in a bounded queue → 503 with Retry-After when the queue is full or the wait
+   times out.
+3. Waiting requests are served by weighted fair queuing: traffic classes (interactive,
+   batch) share free slots in proportion to their weights, and inside a class the
+   clients take turns, so one clinic batch script cannot starve everyone else.
+"""
+import math
+import time
+import threading
+from typing import Callable
+from collections import OrderedDict, deque
+
+import metrics
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Stride scheduling constant: a class advances by STRIDE / weight each time it is served
+_STRIDE = 1_000_000
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.updated = clock()
+
+    def take(self) -> float:
+        """Take one token. Returns 0 on success, else seconds until a token is available."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def refund(self):
+        """Give back a token taken by a request that was refused elsewhere."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class _BucketTable:
+    """Token buckets keyed by client, evicting the least recently used beyond ``max_keys``."""
+
+    def __init__(self, rate_per_min: float, burst: float, max_keys: int = 50_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def take(self, key: str) -> float:
+        if self.rate <= 0:
+            return 0.0  # limit disabled
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, self.clock)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+    def refund(self, key: str):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+
+class _Waiter:
+    __slots__ = ("key", "traffic_class", "event", "granted")
+
+    def __init__(self, key: str, traffic_class: str):
+        self.key = key
+        self.traffic_class = traffic_class
+        self.event = threading.Event()
+        self.granted = False
+
+
+class _ClassQueue:
+    """Waiters of one traffic class, one FIFO per client, served round-robin."""
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.pass_value = 0
+        self.clients: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+
+    def push(self, waiter: _Waiter):
+        self.clients.setdefault(waiter.key, deque()).append(waiter)
+
+    def pop(self) -> _Waiter:
+        key, fifo = next(iter(self.clients.items()))
+        waiter = fifo.popleft()
+        if fifo:
+            self.clients.move_to_end(key)  # next client's turn
+        else:
+            del self.clients[key]
+        return waiter
+
+    def remove(self, waiter: _Waiter):
+        fifo = self.clients.get(waiter.key)
+        if fifo and waiter in fifo:
+            fifo.remove(waiter)
+            if not fifo:
+                del self.clients[waiter.key]
+
+
+class Rejection:
+    """Why a request was not admitted, rendered by the server as an HTTP error."""
+
+    def __init__(self, status: int, retry_after: float, reason: str):
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class Ticket:
+    """A granted slot; call ``release()`` exactly once when the analysis is done."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = controller.clock()
+
+    def release(self):
+        self._controller._release(self._controller.clock() - self._started)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        weights: dict[str, float],
+        max_queued_per_client: int,
+        user_rate_per_min: float,
+        user_burst: float,
+        ip_rate_per_min: float,
+        ip_burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.clock = clock
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_queued_per_client = max_queued_per_client
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+        self._queued_per_client: dict[str, int] = {}
+        self._classes = {name: _ClassQueue(weight) for name, weight in weights.items()}
+        self._user_buckets = _BucketTable(user_rate_per_min, user_burst, clock=clock)
+        self._ip_buckets = _BucketTable(ip_rate_per_min, ip_burst, clock=clock)
+        self._avg_service_s = 15.0  # EWMA of analysis duration, seeds Retry-After estimates
+
+    def acquire(self, user_id: str | None, ip: str | None, traffic_class: str = INTERACTIVE) -> Ticket | Rejection:
+        """Admit a request now, queue it until a slot frees up, or reject it."""
+        if traffic_class not in self._classes:
+            traffic_class = INTERACTIVE
+        ip_key = f"ip:{ip or 'unknown'}"
+        key = f"user:{user_id}" if user_id else ip_key
+
+        with self._lock:
+            wait = self._user_buckets.take(key) if user_id else 0.0
+            if not wait:
+                wait = self._ip_buckets.take(ip_key)
+                if wait and user_id:
+                    self._user_buckets.refund(key)  # refused by the IP limit: not a scan
+            if wait:
+                metrics.incr("admission.rejected.rate_limited")
+                return Rejection(429, wait, "Too many scans in a short time. Please wait a moment and try again.")
+
+            if self._running < self.max_concurrent and self._queued == 0:
+                self._running += 1
+                metrics.incr("admission.admitted")
+                return Ticket(self)
+
+            if self._queued >= self.max_queue:
+                metrics.incr("admission.rejected.queue_full")
+                return Rejection(503, self._estimate_wait_locked(), "The server is busy right now. Please try again in a few seconds.")
+            if self._queued_per_client.get(key, 0) >= self.max_queued_per_client:
+                metrics.incr("admission.rejected.client_queue_full")
+                return Rejection(429, self._estimate_wait_locked(), "You already have scans waiting. Please wait for them to finish.")
+
+            waiter = _Waiter(key, traffic_class)
+            queue = self._classes[traffic_class]
+            if not queue.clients:
+                # A class returning from idle must not bank credit for the time it was away
+                queue.pass_value = max(queue.pass_value, self._min_active_pass_locked())
+            queue.push(waiter)
+            self._queued += 1
+            self._queued_per_client[key] = self._queued_per_client.get(key, 0) + 1
+
+        waiter.event.wait(self.queue_timeout)
+
+        with self._lock:
+            if not waiter.granted:
+                self._classes[traffic_class].remove(waiter)
+                self._dequeued_locked(waiter)
+                metrics.incr("admission.rejected.queue_timeout")
+                return Rejection(503, self._estimate_wait_locked(), "The server is busy right now. Please try again in a few seconds.")
+        metrics.incr("admission.admitted")
+        metrics.incr(f"admission.admitted_after_queue.{traffic_class}")
+        return Ticket(self)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "queued_by_class": {name: sum(len(f) for f in q.clients.values()) for name, q in self._classes.items()},
+            }
+
+    # ─── internals (call with self._lock held) ───────────────
+    def _release(self, duration_s: float):
+        with self._lock:
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * duration_s
+            self._running -= 1
+            while self._running < self.max_concurrent:
+                waiter = self._next_waiter_locked()
+                if waiter is None:
+                    break
+                self._dequeued_locked(waiter)
+                self._running += 1
+                waiter.granted = True
+                waiter.event.set()
+
+    def _next_waiter_locked(self) -> _Waiter | None:
+        active = [q for q in self._classes.values() if q.clients]
+        if not active:
+            return None
+        queue = min(active, key=lambda q: q.pass_value)
+        queue.pass_value += _STRIDE / queue.weight
+        return queue.pop()
+
+    def _min_active_pass_locked(self) -> float:
+        active = [q.pass_value for q in self._classes.values() if q.clients]
+        return min(active) if active else 0
+
+    def _dequeued_locked(self, waiter: _Waiter):
+        self._queued -= 1
+        remaining = self._queued_per_client.get(waiter.key, 1) - 1
+        if remaining > 0:
+            self._queued_per_client[waiter.key] = remaining
+        else:
+            self._queued_per_client.pop(waiter.key, None)
+
+    def _estimate_wait_locked(self) -> float:
+        return self._avg_service_s * (self._queued + 1) / max(1, self.max_concurrent)
@@ -4,21 +4,26 @@
 import os
 import io
 import re
+import copy
 import sys
+import difflib
+import hashlib
 import tempfile
+import threading
+import time
+import contextvars
+import weakref
+from typing import BinaryIO
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
-from groq import Groq
 import asyncio
-import edge_tts
 import json
 import base64
-import cv2
-import numpy as np
-from PIL import Image
-from pillow_heif import register_heif_opener
-
-# Support HEIC/HEIF (standard iPhone formats)
-register_heif_opener()
+import db
+import phrasebook
+import token_budget
+from metrics import stage, incr
 
 load_dotenv()
 
@@ -59,6 +64,55 @@ Given raw text extracted from a medicine image, analyze it to identify:
 Provide comprehensive, accurate medical information.
 """
 
+MEDICINE_ANALYSIS_SCHEMA = """
+Return ALL fields in English.
+
+Return JSON structure:
+{
+    "is_medicine": true,
+    "medicine_name": "Name of the medicine",
+    "active_salts": ["salt1", "salt2"],
+    "dosage_strength": "e.g. 500mg, 10mg etc.",
+    "is_high_dosage": true or false,
+    "dosage_info": "Explain whether this is a high or normal dosage and why",
+    "conditions": ["list of medical conditions this medicine is used for"],
+    "what_it_does": "A clear explanation of what this medicine does in the body and how it works",
+    "suitable_age_group": "e.g. Adults (18+), Children (6-12), All ages, etc.",
+    "advice": "Comprehensive safety advice including dosage level, conditions, what it does, and age group suitability. Write in English."
+}
+
+If the image does not appear to be a medicine, return:
+{
+    "is_medicine": false,
+    "medicine_name": "Unknown",
+    "active_salts": [],
+    "dosage_strength": "N/A",
+    "is_high_dosage": false,
+    "dosage_info": "N/A",
+    "conditions": [],
+    "what_it_does": "N/A",
+    "suitable_age_group": "N/A",
+    "advice": "This does not appear to be a medicine."
+}
+"""
+
+MEDICINE_ANALYSIS_PROMPT = "Based on the extracted medicine text below, provide a detailed medical analysis." + MEDICINE_ANALYSIS_SCHEMA
+
+# --- Medicine Strip: fused OCR + analysis (one vision call) ---
+# Printed strips are easy to read, so the vision model can fill the analysis schema
+# directly; the answer is validated and the two-stage path is used when it falls short.
+MEDICINE_FUSED_INSTRUCTION = """
+You are a Medical AI specialist with deep pharmaceutical knowledge and precise OCR skills.
+Read the printed text on the medicine strip, box, or label in the image: the brand name,
+strength, composition/active ingredients and manufacturer. Then analyze the medicine:
+- The primary medicine name exactly as printed
+- Active salts/ingredients from the composition text
+- Whether this is a high or normal dosage
+- Medical conditions this medicine treats and what it does
+- Suitable age groups
+Only report what the label supports; never guess a name that is not printed.
+"""
+
 # --- Prescription: Vision OCR ---
 # Free-form extraction (no JSON constraint) for best handwriting accuracy
 PRESCRIPTION_OCR_SYSTEM = """
@@ -188,7 +242,156 @@ Cetrimide/Savlon = Cetrimide
 """
 
 
-client = Groq(api_key=os.getenv("API_KEY"))
+# ========== LAZY IMPORTS ==========
+# cv2, numpy, PIL/pillow_heif, groq and edge_tts take most of a second to import. They
+# load on first use, or up front through init(), so importing this module stays cheap
+# for the server's cold start and for test collection.
+_imaging_lock = threading.Lock()
+_heif_registered = False
+
+
+def _imaging():
+    """(cv2, numpy, PIL.Image), with the HEIC/HEIF opener (iPhone photos) registered."""
+    global _heif_registered
+    import cv2
+    import numpy as np
+    from PIL import Image
+    if not _heif_registered:
+        with _imaging_lock:
+            if not _heif_registered:
+                from pillow_heif import register_heif_opener
+                register_heif_opener()
+                _heif_registered = True
+    return cv2, np, Image
+
+
+def init():
+    """Import the imaging, Groq and Edge TTS libraries now instead of on first use."""
+    _imaging()
+    import groq  # noqa: F401
+    import edge_tts  # noqa: F401
+
+
+# ========== ASYNC RUNTIME ==========
+# All Groq and Edge TTS I/O runs on asyncio. The blocking public API hands its coroutine
+# to one shared engine loop, so hundreds of in-flight scans cost a task each rather than
+# a blocked thread each. CPU-bound image work runs in a small thread pool instead.
+CPU_WORKERS = int(os.getenv("SANJEEVANI_CPU_WORKERS", str(os.cpu_count() or 2)))
+
+_cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="ai-engine-cpu")
+# One AsyncGroq client per event loop — its connection pool is bound to the loop that created it
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, groq.AsyncGroq]" = weakref.WeakKeyDictionary()
+_engine_loop: asyncio.AbstractEventLoop | None = None
+_engine_pid: int | None = None
+_engine_lock = threading.Lock()
+
+
+def _make_client() -> "groq.AsyncGroq":
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=os.getenv("API_KEY"))
+
+
+def _client() -> "groq.AsyncGroq":
+    """AsyncGroq client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = _make_client()
+    return client
+
+
+def _get_engine_loop() -> asyncio.AbstractEventLoop:
+    """Start (once per process — threads don't survive a gunicorn fork) the shared engine loop."""
+    global _engine_loop, _engine_pid
+    with _engine_lock:
+        if _engine_loop is None or _engine_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="ai-engine-loop", daemon=True).start()
+            _engine_loop, _engine_pid = loop, os.getpid()
+        return _engine_loop
+
+
+def _run_sync(coro, cancel: "CancelToken | None" = None):
+    """
+    Run a coroutine on the engine loop and block the calling thread until it finishes.
+    If ``cancel`` fires first, the task is cancelled (aborting its in-flight HTTP calls)
+    and CancelledError is raised.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _get_engine_loop())
+    if cancel is None:
+        return future.result()
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_S)
+        except FutureTimeoutError:  # the builtin TimeoutError only from Python 3.11
+            if cancel.cancelled and future.cancel():
+                raise CancelledError
+
+
+async def _run_cpu(fn, *args):
+    """Run CPU-bound work in the CPU pool, keeping the caller's context (stage timings)."""
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_cpu_pool, ctx.run, fn, *args)
+
+
+# ========== CANCELLATION ==========
+# The blocking API polls a CancelToken while it waits; once it fires, the scan's task is
+# cancelled, which aborts the Groq or Edge TTS request it is awaiting and starts no later
+# stage. CPU work already handed to the pool finishes, but its result is dropped.
+CANCEL_POLL_S = float(os.getenv("SANJEEVANI_CANCEL_POLL_S", "0.25"))
+
+
+class CancelToken:
+    """Fired when whoever asked for a scan no longer wants the answer (e.g. the client hung up)."""
+
+    def __init__(self, check=None):
+        # check: optional callable polled by ``cancelled``; True fires the token
+        self._event = threading.Event()
+        self._check = check
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self._check is not None and self._check():
+            self._event.set()
+        return self._event.is_set()
+
+
+@contextmanager
+def _remote_stage(name: str):
+    """
+    stage() for one Groq or Edge TTS round trip, counting calls cut off by a cancelled scan.
+    Wall time only: the engine loop serves other scans while this one waits.
+    """
+    with stage(name, cpu=False):
+        try:
+            yield
+        except asyncio.CancelledError:
+            incr(f"cancelled.aborted.{name}")
+            raise
+
+
+def _cancelled_scan(kind: str) -> tuple[dict, None]:
+    incr("cancelled.scans")
+    incr(f"cancelled.scans.{kind}")
+    _safe_print(f"[INFO] {kind.capitalize()} scan cancelled: the client went away")
+    return {"error": "Scan cancelled: the client disconnected", "cancelled": True}, None
+
+
+def shutdown():
+    """Close the engine loop's Groq client and stop the loop (graceful worker exit)."""
+    global _engine_loop
+    with _engine_lock:
+        loop, _engine_loop = _engine_loop, None
+    if loop is None or _engine_pid != os.getpid():
+        return
+    client = _clients.get(loop)
+    if client is not None:
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+
 
 LANG_MAP = {
     'English': 'en',
@@ -237,65 +440,298 @@ def _safe_print(*args, **kwargs):
         print(*safe_args, **kwargs)
 
 
-def _preprocess_image(image_bytes: bytes) -> tuple[bytes, str]:
+# Decoded with cv2.imdecode instead of PIL (see _decode_gray)
+_CV2_GRAY_FORMATS = {"PNG", "WEBP", "BMP", "TIFF"}
+
+
+def _decode_gray(source: BinaryIO, image_format: str):
     """
-    Convert any image format to JPEG and resize to max 1600px on the longest side.
-    Returns (processed_bytes, mime_type).
+    Decode straight to an 8-bit grayscale array where that avoids PIL's full-size RGBX
+    frame (4 bytes per pixel), or None to let PIL decode it. OpenCV reads PNG/WebP/BMP/
+    TIFF as one channel; for HEIC, pillow_heif's own RGB buffer is converted directly.
     """
-    try:
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Log suspected format for debugging
-        original_format = getattr(img, "format", "Unknown")
-        _safe_print(f"[INFO] Preprocessing image: format={original_format}, size={img.size}, mode={img.mode}")
-
-        # Convert palette/transparency modes (like PNG) or HEIF modes to RGB for JPEG
-        if img.mode not in ("RGB", "L"):
+    cv2, np, _ = _imaging()
+    source.seek(0)
+    if image_format in _CV2_GRAY_FORMATS:
+        encoded = np.frombuffer(source.read(), np.uint8)
+        return cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image_format == "HEIF":
+        from pillow_heif import open_heif
+        pixels = np.asarray(open_heif(source, convert_hdr_to_8bit=True))
+        if pixels.ndim == 3:
+            code = cv2.COLOR_RGBA2GRAY if pixels.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(pixels, code)
+        return np.ascontiguousarray(pixels)
+    return None
+
+
+def _binarize(source: BinaryIO):
+    """
+    Decode any image format to a binarized 8-bit grayscale array, at most 1600px on the
+    longest side. Raises on undecodable input.
+    """
+    cv2, np, Image = _imaging()
+    max_dim = 1600
+    with stage("preprocess.decode"):
+        source.seek(0)
+        img = Image.open(source)
+        original_format, original_size, original_mode = img.format or "Unknown", img.size, img.mode
+        gray = _decode_gray(source, original_format)
+        if gray is None:
+            # JPEG: libjpeg decodes straight to grayscale at 1/2-1/8 scale, so the
+            # full-resolution RGB frame of a 12-48 MP photo is never materialised
+            w, h = img.size
+            scale = min(1.0, max_dim / max(w, h))
+            img.draft("L", (max(1, int(w * scale)), max(1, int(h * scale))))
+            img.load()
+        else:
+            # Just drop it: Image.close() would also close the caller's upload stream
+            img = None
+
+    # Log suspected format for debugging
+    _safe_print(f"[INFO] Preprocessing image: format={original_format}, size={original_size}, mode={original_mode}")
+
+    # Convert palette/transparency modes (like PNG), CMYK or HEIF modes to RGB
+    with stage("preprocess.convert"):
+        if img is not None and img.mode not in ("RGB", "L"):
             img = img.convert("RGB")
-            
-        # Resize if very large (improves both speed and OCR accuracy)
-        max_dim = 1600
-        w, h = img.size
+
+    # Resize if very large (improves both speed and OCR accuracy). Before going to
+    # grayscale, so a full-size colour frame and a full-size gray copy never coexist
+    with stage("preprocess.resize"):
+        h, w = gray.shape if gray is not None else img.size[::-1]
         if max(w, h) > max_dim:
             scale = max_dim / max(w, h)
-            img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-            
-        # --- OpenCV Preprocessing Pipeline ---
-        cv_img = np.array(img)
-        # Convert RGB to BGR for OpenCV (PIL images are usually RGB)
-        if len(cv_img.shape) == 3 and cv_img.shape[2] == 3:
-            cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
-            gray = cv2.cvtColor(cv_img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = cv_img
-
-        # 1. CLAHE (Contrast Limited Adaptive Histogram Equalization)
+            size = (int(w * scale), int(h * scale))
+            if gray is not None:
+                # Same LANCZOS filter as the PIL path; frombuffer wraps the array without a copy
+                shared = Image.frombuffer("L", (w, h), gray, "raw", "L", 0, 1)
+                gray = np.asarray(shared.resize(size, Image.LANCZOS))
+                del shared
+            else:
+                img = img.resize(size, Image.LANCZOS)
+
+    # --- OpenCV Preprocessing Pipeline ---
+    # One PIL pass gives 8-bit luma with the same weights as cv2.COLOR_RGB2GRAY, and
+    # each intermediate below is dropped as soon as the next one exists
+    with stage("preprocess.grayscale"):
+        if gray is None:
+            if img.mode == "RGB":
+                img = img.convert("L")
+            gray = np.asarray(img)
+        del img
+
+    # 1. CLAHE (Contrast Limited Adaptive Histogram Equalization)
+    with stage("preprocess.clahe"):
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
         contrast_img = clahe.apply(gray)
-        
-        # 2. Denoising
+        del gray
+
+    # 2. Denoising
+    with stage("preprocess.denoise"):
         denoised = cv2.fastNlMeansDenoising(contrast_img, None, h=10, templateWindowSize=7, searchWindowSize=21)
-        
-        # 3. Adaptive Thresholding (Gaussian method)
-        binarized = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-        
-        # Convert back to PIL Image
-        final_img = Image.fromarray(binarized)
-        if final_img.mode != "RGB":
-            final_img = final_img.convert("RGB")
+        del contrast_img
+
+    # 3. Adaptive Thresholding (Gaussian method), in place
+    with stage("preprocess.threshold"):
+        return cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, dst=denoised)
 
+
+def _encode_jpeg(gray, quality: int = 92) -> bytes:
+    """Encode as a grayscale JPEG: a third of the work and smaller than expanding to RGB."""
+    _, _, Image = _imaging()
+    with stage("preprocess.encode"):
         buf = io.BytesIO()
-        final_img.save(buf, format="JPEG", quality=92)
-        return buf.getvalue(), "image/jpeg"
-    except Exception as e:
-        _safe_print(f"[WARN] Image preprocessing failed: {e}. Attempting raw fallback.")
-        # Fallback: detect MIME from magic bytes and return raw
+        Image.fromarray(gray).save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+
+def _raw_upload(source: BinaryIO) -> tuple[bytes, str]:
+    """The upload as-is with a MIME type sniffed from its magic bytes (preprocessing fallback)."""
+    with stage("preprocess.fallback"):
+        source.seek(0)
+        raw = source.read()
         mime = "image/jpeg"
-        if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        if raw[:8] == b'\x89PNG\r\n\x1a\n':
             mime = "image/png"
-        elif image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        elif raw[:4] == b'RIFF' and raw[8:12] == b'WEBP':
             mime = "image/webp"
-        return image_bytes, mime
+    return raw, mime
+
+
+def _preprocess_image(image: bytes | BinaryIO) -> tuple[bytes, str]:
+    """
+    Convert any image format to a binarized grayscale JPEG, at most 1600px on the longest
+    side. ``image`` is the upload as bytes or as a seekable binary file (the spooled
+    upload), which is decoded from the file rather than read into memory first.
+    Returns (processed_bytes, mime_type).
+    """
+    source = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+    try:
+        return _encode_jpeg(_binarize(source)), "image/jpeg"
+    except Exception as e:
+        _safe_print(f"[WARN] Image preprocessing failed: {e}. Attempting raw fallback.")
+        return _raw_upload(source)
+
+
+def warm_up():
+    """
+    Import the heavy libraries and run the preprocessing pipeline once on a tiny synthetic
+    image, so codec plugins and OpenCV kernels are ready before the first real request.
+    """
+    init()
+    _, _, Image = _imaging()
+    blank = Image.new("RGB", (64, 48), "white")
+    buf = io.BytesIO()
+    blank.save(buf, format="JPEG")
+    _preprocess_image(buf.getvalue())
+    assess_image_quality(buf.getvalue())
+
+
+# ========== IMAGE QUALITY GATE ==========
+# Cheap checks on a small grayscale copy, run before preprocessing and before any model
+# call, so a blurred, dark, blank or glare-washed photo gets a "retake" answer in a few
+# milliseconds instead of after a paid vision call. Thresholds are tuned for the
+# QUALITY_MAX_DIM copy; re-run benchmarks/quality_gate.py after changing them.
+QUALITY_GATE = os.getenv("SANJEEVANI_QUALITY_GATE", "1") != "0"
+QUALITY_MAX_DIM = 512
+QUALITY_GLARE_LEVEL = 245  # clipped highlights, allowing for sensor noise and JPEG ringing
+# JPEG decodes at 1/8 scale; other formats need a full decode on top of preprocessing's,
+# so bigger ones (12 MP HEIC photos) skip the gate and rely on the OCR length check
+QUALITY_FULL_DECODE_MAX_PIXELS = int(os.getenv("SANJEEVANI_QUALITY_MAX_FULL_DECODE_MP", "4")) * 1_000_000
+QUALITY_THRESHOLDS = {
+    # 90th-percentile Laplacian variance over an 8x8 grid of tiles (the text, not the table)
+    "min_sharpness": float(os.getenv("SANJEEVANI_QUALITY_MIN_SHARPNESS", "60")),
+    # 99th-percentile brightness: even the brightest parts of the photo are darker than this
+    "min_highlight": float(os.getenv("SANJEEVANI_QUALITY_MIN_HIGHLIGHT", "70")),
+    # 1st-percentile brightness: even the darkest parts (the ink) are brighter than this
+    "max_shadow": float(os.getenv("SANJEEVANI_QUALITY_MAX_SHADOW", "175")),
+    # Fraction of pixels on a Canny edge; printed or written text sits well above it
+    "min_text_density": float(os.getenv("SANJEEVANI_QUALITY_MIN_TEXT_DENSITY", "0.01")),
+    # Largest saturated blob as a fraction of the photo (ignored on white backgrounds)
+    "max_glare": float(os.getenv("SANJEEVANI_QUALITY_MAX_GLARE", "0.06")),
+}
+
+RETAKE_MESSAGES = {
+    "blurry": "The photo is blurry. Hold the phone steady and tap the screen to focus on the label.",
+    "too_dark": "The photo is too dark. Move somewhere brighter or turn on the flash.",
+    "overexposed": "The photo is washed out. Avoid direct light or turn off the flash.",
+    "no_text": "No text is visible. Fill the frame with the label or the prescription.",
+    "glare": "Glare is hiding part of the label. Tilt it away from the light and try again.",
+}
+
+
+def _small_gray(image: bytes | BinaryIO):
+    """
+    Grayscale copy at most QUALITY_MAX_DIM on the longest side, or None when the format
+    has no cheap reduced decode and the photo is above QUALITY_FULL_DECODE_MAX_PIXELS.
+    """
+    cv2, np, Image = _imaging()
+    source = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+    source.seek(0)
+    img = Image.open(source)
+    if img.format != "JPEG" and img.size[0] * img.size[1] > QUALITY_FULL_DECODE_MAX_PIXELS:
+        source.seek(0)
+        return None
+    gray = _decode_gray(source, img.format or "")
+    if gray is None:
+        # JPEG: DCT scaling decodes at 1/4-1/8 size, never the full-resolution frame
+        img.draft("L", (QUALITY_MAX_DIM, QUALITY_MAX_DIM))
+        img = img.convert("L")
+        img.thumbnail((QUALITY_MAX_DIM, QUALITY_MAX_DIM), Image.BILINEAR)
+        gray = np.asarray(img)
+    else:
+        del img  # not close(): that closes ``source``, which preprocessing reads next
+        h, w = gray.shape
+        scale = QUALITY_MAX_DIM / max(h, w)
+        if scale < 1:
+            gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    source.seek(0)
+    return gray
+
+
+def assess_image_quality(image: bytes | BinaryIO, thresholds: dict | None = None) -> dict:
+    """
+    Score blur, exposure, text density and glare on a small grayscale copy.
+    Returns {"ok", "reasons" (codes from RETAKE_MESSAGES), "metrics"}, or None when the
+    photo is too costly to check (see _small_gray). ``thresholds`` overrides entries of
+    QUALITY_THRESHOLDS.
+    """
+    limits = {**QUALITY_THRESHOLDS, **(thresholds or {})}
+    cv2, np, _ = _imaging()
+    with stage("quality"):
+        gray = _small_gray(image)
+        if gray is None:
+            return None
+        h, w = gray.shape
+
+        laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+        grid = 8 if min(h, w) >= 64 else 1
+        th, tw = h // grid, w // grid
+        tiles = laplacian[:th * grid, :tw * grid].reshape(grid, th, grid, tw)
+        sharpness = float(np.percentile(tiles.var(axis=(1, 3)), 90))
+
+        cdf = np.cumsum(np.bincount(gray.ravel(), minlength=256)) / gray.size
+        shadow, median, highlight = (int(np.searchsorted(cdf, q)) for q in (0.01, 0.5, 0.99))
+
+        text_density = float(np.count_nonzero(cv2.Canny(gray, 50, 150))) / gray.size
+
+        # Saturated blobs big enough to survive an opening: specular glare, not white text
+        saturated = cv2.morphologyEx((gray >= QUALITY_GLARE_LEVEL).astype(np.uint8), cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(saturated, connectivity=8)
+        glare = float(stats[1:, cv2.CC_STAT_AREA].max()) / gray.size if count > 1 else 0.0
+
+    reasons = []
+    if highlight < limits["min_highlight"]:
+        reasons.append("too_dark")
+    if shadow > limits["max_shadow"]:
+        reasons.append("overexposed")
+    if not reasons:  # bad exposure also flattens edges: report only the cause
+        if sharpness < limits["min_sharpness"]:
+            reasons.append("blurry")
+        if text_density < limits["min_text_density"]:
+            reasons.append("no_text")
+    if median < 235 and glare > limits["max_glare"]:
+        reasons.append("glare")
+    return {
+        "ok": not reasons,
+        "reasons": reasons,
+        "metrics": {
+            "sharpness": round(sharpness, 1),
+            "shadow": shadow,
+            "median": median,
+            "highlight": highlight,
+            "text_density": round(text_density, 4),
+            "glare": round(glare, 4),
+        },
+    }
+
+
+async def _quality_gate(image: bytes | BinaryIO) -> dict | None:
+    """A "retake photo" error dict when the upload fails the quality checks, else None."""
+    if not QUALITY_GATE:
+        return None
+    try:
+        quality = await _run_cpu(assess_image_quality, image)
+    except Exception as e:  # undecodable here: let preprocessing and its raw fallback decide
+        _safe_print(f"[WARN] Image quality check failed: {e}")
+        return None
+    if quality is None:
+        incr("quality.skipped")
+        return None
+    if quality["ok"]:
+        return None
+    incr("quality.rejected")
+    for reason in quality["reasons"]:
+        incr(f"quality.rejected.{reason}")
+    _safe_print(f"[INFO] Photo rejected by quality gate: {quality['reasons']} {quality['metrics']}")
+    messages = [RETAKE_MESSAGES[reason] for reason in quality["reasons"]]
+    return {
+        "error": "Please retake the photo. " + " ".join(messages),
+        "retake_photo": True,
+        "reasons": [{"code": code, "message": message} for code, message in zip(quality["reasons"], messages)],
+        "quality": quality["metrics"],
+    }
 
 
 def _extract_json_from_text(text: str) -> dict:
@@ -325,29 +761,181 @@ def _extract_json_from_text(text: str) -> dict:
     raise ValueError(f"Could not parse JSON from model response (first 300 chars): {text[:300]}")
 
 
-def _call_vision_model_json(image_bytes: bytes, system_prompt: str) -> str:
+# ========== TOKEN BUDGETS ==========
+# Every Groq call goes through _chat with a max_tokens sized by token_budget for the
+# answer it expects, so a rambling or looping generation cannot stretch the tail.
+async def _chat(call: str, budget: int, retry: bool = True, whole: bool = False, tag: str | None = None,
+                **request):
+    """
+    chat.completions.create with ``max_tokens=budget``, logging the budget against usage
+    (truncations also under ``tag``). A JSON answer cut off by the budget cannot be
+    parsed, and a ``whole`` text answer (a translation) is unsafe to show cut off, so
+    either is asked for once more with twice the budget. The caller still checks
+    finish_reason on what comes back.
+    """
+    request["max_tokens"] = budget
+    prompt_estimate = token_budget.estimate_messages(request["messages"])
+    response = await _client().chat.completions.create(**request)
+    truncated = _truncated(response)
+    log = token_budget.record(call, budget, prompt_estimate, response, tag=tag if retry else None)
+    _safe_print(f"[{'WARN' if truncated else 'INFO'}] {log}")
+    if truncated and retry and (whole or "response_format" in request) and budget < token_budget.MAX_BUDGET:
+        return await _chat(call, min(2 * budget, token_budget.MAX_BUDGET), retry=False, whole=whole, **request)
+    return response
+
+
+def _truncated(response) -> bool:
+    return getattr(response.choices[0], "finish_reason", None) == "length"
+
+
+# ========== OCR ESCALATION ==========
+# Most strips read fine from a small rendering, so OCR first sends a cheap draft (the
+# text region, smaller and at lower JPEG quality) and only re-sends the whole image at
+# full preprocessing resolution when the transcript looks incomplete. The re-read is not
+# cropped: a faint expiry line or strength the crop left out is then still on the page.
+# Image bytes and prompt tokens sent are counted under vision.* in metrics.
+OCR_ESCALATION = os.getenv("SANJEEVANI_OCR_ESCALATION", "1") != "0"
+OCR_DRAFT_DIM = int(os.getenv("SANJEEVANI_OCR_DRAFT_DIM", "896"))
+OCR_DRAFT_QUALITY = 75
+# Shorter transcripts than this are re-read (a strip prints name, strength and composition)
+OCR_MIN_CHARS = {"medicine": 40, "prescription": 80}
+
+_STRENGTH_PATTERN = re.compile(r"\d+(?:\.\d+)?\s?(?:mg|mcg|µg|gm?|ml|iu|%|units?)\b", re.IGNORECASE)
+_DOSE_PATTERN = re.compile(r"\b[0-2½]\s?-\s?[0-2½]\s?-\s?[0-2½]\b|\b(?:OD|BD|BID|TDS|TID|QID|HS|SOS|stat)\b", re.IGNORECASE)
+_WORD_PATTERN = re.compile(r"[a-z]{6,}")
+
+# Generic names common on Indian strips and prescriptions. A transcript word that is one
+# or two letters off one of these is almost always a misread ("Paracetarnol"); brands
+# derived from generics ("Pregalin") differ by more and are left alone.
+COMMON_DRUG_NAMES = frozenset("""
+paracetamol acetaminophen ibuprofen diclofenac aceclofenac nimesulide naproxen mefenamic
+aspirin tramadol amoxicillin amoxycillin clavulanate ampicillin cloxacillin azithromycin clarithromycin
+erythromycin doxycycline ciprofloxacin ofloxacin levofloxacin norfloxacin moxifloxacin
+cefixime cefuroxime cefpodoxime ceftriaxone cefadroxil cephalexin cefalexin metronidazole
+tinidazole ornidazole nitrofurantoin linezolid fluconazole itraconazole terbinafine
+clotrimazole ketoconazole albendazole ivermectin acyclovir valacyclovir oseltamivir
+pantoprazole omeprazole esomeprazole rabeprazole lansoprazole ranitidine famotidine
+domperidone ondansetron metoclopramide itopride levosulpiride loperamide racecadotril
+lactulose bisacodyl cetirizine levocetirizine fexofenadine loratadine desloratadine
+chlorpheniramine montelukast bilastine dextromethorphan ambroxol bromhexine guaifenesin
+salbutamol levosalbutamol terbutaline theophylline budesonide fluticasone formoterol
+prednisolone methylprednisolone dexamethasone hydrocortisone deflazacort metformin
+glimepiride gliclazide glipizide sitagliptin vildagliptin teneligliptin linagliptin
+dapagliflozin empagliflozin pioglitazone voglibose acarbose insulin amlodipine telmisartan
+losartan olmesartan valsartan ramipril enalapril atenolol metoprolol bisoprolol carvedilol
+nebivolol propranolol hydrochlorothiazide chlorthalidone furosemide frusemide torsemide spironolactone
+atorvastatin rosuvastatin fenofibrate clopidogrel prasugrel ticagrelor warfarin apixaban
+rivaroxaban dabigatran levothyroxine thyroxine carbimazole methimazole alprazolam
+clonazepam lorazepam diazepam etizolam escitalopram sertraline fluoxetine paroxetine
+amitriptyline nortriptyline duloxetine venlafaxine mirtazapine olanzapine quetiapine
+risperidone aripiprazole haloperidol levetiracetam phenytoin valproate carbamazepine
+oxcarbazepine lamotrigine gabapentin pregabalin topiramate donepezil levodopa carbidopa
+betahistine cinnarizine flunarizine sumatriptan calcium cholecalciferol methylcobalamin
+folic pyridoxine thiamine riboflavin ferrous zinc magnesium potassium multivitamin
+tamsulosin finasteride sildenafil tadalafil mifepristone misoprostol progesterone
+dydrogesterone estradiol norethisterone letrozole clomiphene hydroxychloroquine
+methotrexate azathioprine colchicine allopurinol febuxostat mupirocin fusidic
+permethrin povidone chlorhexidine lidocaine tranexamic ethamsylate drotaverine
+dicyclomine hyoscine simethicone rifaximin ursodeoxycholic silymarin
+""".split())
+
+
+def _ocr_escalation_reasons(text: str, kind: str) -> list[str]:
+    """Why a draft transcript of a ``kind`` ("medicine"/"prescription") image should be re-read."""
+    reasons = []
+    if len(text.strip()) < OCR_MIN_CHARS[kind]:
+        reasons.append("short_text")
+    if not _STRENGTH_PATTERN.search(text) and not (kind == "prescription" and _DOSE_PATTERN.search(text)):
+        reasons.append("no_dosage")
+    if "[illegible]" in text.lower():
+        reasons.append("illegible")
+    for word in set(_WORD_PATTERN.findall(text.lower())) - COMMON_DRUG_NAMES:
+        candidates = [name for name in COMMON_DRUG_NAMES if name[0] == word[0] and abs(len(name) - len(word)) <= 1]
+        if difflib.get_close_matches(word, candidates, n=1, cutoff=0.85):
+            reasons.append("misread_drug_name")
+            break
+    return reasons
+
+
+def _text_region(binarized):
+    """(left, top, right, bottom) around the ink of a binarized page, or None if that is most of it."""
+    cv2, np, _ = _imaging()
+    h, w = binarized.shape
+    # 8x8 blocks with a fifth or more ink; stray threshold speckle stays below that
+    blocks = cv2.resize(binarized, (max(1, w // 8), max(1, h // 8)), interpolation=cv2.INTER_AREA)
+    ys, xs = np.nonzero(blocks < 204)
+    if len(xs) < 16:
+        return None
+    margin = 4
+    left, right = np.percentile(xs, (0.5, 99.5))
+    top, bottom = np.percentile(ys, (0.5, 99.5))
+    box = (max(0, int(left - margin) * 8), max(0, int(top - margin) * 8),
+           min(w, int(right + 1 + margin) * 8), min(h, int(bottom + 1 + margin) * 8))
+    if (box[2] - box[0]) * (box[3] - box[1]) > 0.85 * w * h:
+        return None
+    return box
+
+
+def _vision_renders(image: bytes | BinaryIO) -> tuple[bytes | None, bytes, str]:
+    """
+    (draft, detail, mime) renderings of one upload, preprocessed once: the draft is the
+    text region at most OCR_DRAFT_DIM and lower JPEG quality, detail the whole page at
+    full preprocessing resolution. If preprocessing fails, draft is None and detail is
+    the raw upload.
+    """
+    cv2, _, _ = _imaging()
+    source = io.BytesIO(image) if isinstance(image, (bytes, bytearray, memoryview)) else image
+    with stage("preprocess"):
+        try:
+            binarized = _binarize(source)
+        except Exception as e:
+            _safe_print(f"[WARN] Image preprocessing failed: {e}. Attempting raw fallback.")
+            raw, mime = _raw_upload(source)
+            return None, raw, mime
+        small = binarized
+        box = _text_region(binarized)
+        if box:
+            left, top, right, bottom = box
+            small = binarized[top:bottom, left:right]
+        h, w = small.shape
+        if max(h, w) > OCR_DRAFT_DIM:
+            scale = OCR_DRAFT_DIM / max(h, w)
+            # INTER_AREA turns the binary strokes into anti-aliased gray, which reads better small
+            small = cv2.resize(small, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        return _encode_jpeg(small, OCR_DRAFT_QUALITY), _encode_jpeg(binarized), "image/jpeg"
+
+
+def _encode_for_vision(image: bytes | BinaryIO) -> tuple[str, str]:
+    """Preprocess an image and return (base64_payload, mime_type) for a vision request."""
+    with stage("preprocess"):
+        processed_bytes, mime_type = _preprocess_image(image)
+        return base64.b64encode(processed_bytes).decode("utf-8"), mime_type
+
+
+async def _call_vision_model_json_async(image: bytes | BinaryIO, system_prompt: str) -> str:
     """
     Vision OCR with JSON response format — for medicine strips where text is machine-printed.
     Returns the extracted text string.
     """
-    processed_bytes, mime_type = _preprocess_image(image_bytes)
-    image_base64 = base64.b64encode(processed_bytes).decode("utf-8")
-
-    response = client.chat.completions.create(
-        model=VISION_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}},
-                    {"type": "text", "text": "Extract all text from this image. Return as JSON with key 'extracted_text'."}
-                ]
-            }
-        ],
-        temperature=0.1,
-        response_format={"type": "json_object"}
-    )
+    image_base64, mime_type = await _run_cpu(_encode_for_vision, image)
+
+    with _remote_stage("vision_ocr"):
+        response = await _chat(
+            "vision_ocr.medicine", token_budget.ocr_budget("medicine"),
+            model=VISION_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}},
+                        {"type": "text", "text": "Extract all text from this image. Return as JSON with key 'extracted_text'."}
+                    ]
+                }
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
     raw = response.choices[0].message.content.strip()
 
     try:
@@ -363,54 +951,118 @@ def _call_vision_model_json(image_bytes: bytes, system_prompt: str) -> str:
         return raw.strip()
 
 
-def _call_vision_model_freetext(image_bytes: bytes, system_prompt: str, user_prompt: str) -> str:
+async def _call_vision_model_freetext_async(image: bytes | BinaryIO, system_prompt: str, user_prompt: str,
+                                            kind: str | None = None) -> str:
     """
     Vision OCR WITHOUT JSON constraint — critical for handwritten prescriptions.
     Free-form transcription gives much better accuracy for messy handwriting.
+    With ``kind`` ("medicine" or "prescription"), a small draft is read first and the
+    whole image at full resolution only when the draft transcript looks incomplete.
     Returns the raw transcribed text.
     """
-    processed_bytes, mime_type = _preprocess_image(image_bytes)
-    image_base64 = base64.b64encode(processed_bytes).decode("utf-8")
-
-    response = client.chat.completions.create(
-        model=VISION_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}},
-                    {"type": "text", "text": user_prompt}
-                ]
-            }
-        ],
-        temperature=0.05,  # Very low temperature for maximum faithfulness to image
-        max_tokens=2048,
-    )
+    if kind is None or not OCR_ESCALATION:
+        image_base64, mime_type = await _run_cpu(_encode_for_vision, image)
+        return await _vision_ocr_request(image_base64, mime_type, system_prompt, user_prompt, kind)
+
+    draft, detail, mime_type = await _run_cpu(_vision_renders, image)
+    if draft is not None:
+        text = await _vision_ocr_request(base64.b64encode(draft).decode("utf-8"), mime_type, system_prompt, user_prompt, kind)
+        reasons = _ocr_escalation_reasons(text, kind)
+        if not reasons:
+            incr("vision.ocr_draft_ok")
+            return text
+        incr("vision.ocr_escalated")
+        for reason in reasons:
+            incr(f"vision.ocr_escalated.{reason}")
+        _safe_print(f"[INFO] Draft OCR escalated to full resolution: {reasons}")
+    detail_text = await _vision_ocr_request(base64.b64encode(detail).decode("utf-8"), mime_type, system_prompt, user_prompt, kind)
+    # A full-resolution read that comes back empty (refusal, hiccup) loses to the draft
+    return detail_text if detail_text or draft is None else text
+
+
+async def _vision_ocr_request(image_base64: str, mime_type: str, system_prompt: str, user_prompt: str,
+                              kind: str | None = None) -> str:
+    """One free-text vision OCR call, counting the image bytes and prompt tokens it sends."""
+    incr("vision.requests")
+    incr("vision.image_bytes", len(image_base64))
+    with _remote_stage("vision_ocr"):
+        response = await _chat(
+            f"vision_ocr.{kind or 'other'}", token_budget.ocr_budget(kind),
+            model=VISION_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}},
+                        {"type": "text", "text": user_prompt}
+                    ]
+                }
+            ],
+            temperature=0.05,  # Very low temperature for maximum faithfulness to image
+        )
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None):
+        incr("vision.prompt_tokens", usage.prompt_tokens)
     return response.choices[0].message.content.strip()
 
 
-def _call_analysis_model(extracted_text: str, system_prompt: str, user_prompt: str) -> dict:
+def _call_vision_model_freetext(image: bytes | BinaryIO, system_prompt: str, user_prompt: str,
+                                kind: str | None = None) -> str:
+    """Blocking form of _call_vision_model_freetext_async (used by diagnostic scripts)."""
+    return _run_sync(_call_vision_model_freetext_async(image, system_prompt, user_prompt, kind))
+
+
+async def _call_analysis_model_async(extracted_text: str, system_prompt: str, user_prompt: str) -> dict:
     """Model 2 (Analysis): Analyze extracted text using the text-based reasoning model."""
-    response = client.chat.completions.create(
-        model=ANALYSIS_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Extracted text from image:\n\n{extracted_text}\n\n{user_prompt}"}
-        ],
-        temperature=0.1,
-        response_format={"type": "json_object"}
-    )
+    extracted_text = token_budget.trim_ocr(extracted_text)
+    with _remote_stage("analysis"):
+        response = await _chat(
+            "analysis.medicine", token_budget.medicine_analysis_budget(),
+            model=ANALYSIS_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Extracted text from image:\n\n{extracted_text}\n\n{user_prompt}"}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+    raw = response.choices[0].message.content.strip()
+    return _extract_json_from_text(raw)
+
+
+async def _call_vision_analysis_async(image: bytes | BinaryIO, system_prompt: str, user_prompt: str) -> dict:
+    """Vision model reads the image and answers the analysis schema in the same call (fused mode)."""
+    image_base64, mime_type = await _run_cpu(_encode_for_vision, image)
+
+    with _remote_stage("vision_analysis"):
+        response = await _chat(
+            "vision_analysis", token_budget.medicine_analysis_budget(),
+            model=VISION_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_base64}"}},
+                        {"type": "text", "text": user_prompt}
+                    ]
+                }
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
     raw = response.choices[0].message.content.strip()
     return _extract_json_from_text(raw)
 
 
-def _call_prescription_analysis(extracted_text: str, target_language: str, lang_code: str) -> dict:
+async def _call_prescription_analysis_async(extracted_text: str, target_language: str, lang_code: str) -> dict:
     """
     Dedicated prescription analysis call.
     Keeps the OCR text and JSON schema in a single message to avoid double-embedding.
     Drug dictionary is in the system prompt; everything else is in one user message.
     """
+    extracted_text = token_budget.trim_ocr(extracted_text)
     schema = f"""
 You are given the transcribed text of a handwritten Indian prescription. Extract ALL medicines and return ONLY valid JSON.
 Return ALL fields in English.
@@ -460,15 +1112,17 @@ RULES:
 6. Explicitly check for severe known drug interactions among the extracted medicines and add them to the 'interactions' array. If none exist, return an empty array.
 7. ALL text fields must be in English.
 """
-    response = client.chat.completions.create(
-        model=ANALYSIS_MODEL,
-        messages=[
-            {"role": "system", "content": PRESCRIPTION_ANALYSIS_INSTRUCTION},
-            {"role": "user", "content": schema}
-        ],
-        temperature=0.1,
-        response_format={"type": "json_object"}
-    )
+    with _remote_stage("analysis"):
+        response = await _chat(
+            "analysis.prescription", token_budget.prescription_analysis_budget(extracted_text),
+            model=ANALYSIS_MODEL,
+            messages=[
+                {"role": "system", "content": PRESCRIPTION_ANALYSIS_INSTRUCTION},
+                {"role": "user", "content": schema}
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
     raw = response.choices[0].message.content.strip()
     return _extract_json_from_text(raw)
 
@@ -485,9 +1139,93 @@ def _cap_text(text: str, max_chars: int = MAX_AUDIO_CHARS) -> str:
     return truncated.strip()
 
 
-def _generate_audio(text: str, lang_code: str) -> str | None:
+# ========== TTS CACHE ==========
+# Summaries for popular medicines are identical across users, so synthesized MP3s are kept
+# in the shared cache table (db.cache_*), keyed by a hash of the voice and the capped text
+# and trimmed least-recently-used to SANJEEVANI_TTS_CACHE_MB (0 disables it).
+# With SANJEEVANI_TTS_PHRASES=1 every sentence is synthesized and cached on its own and the
+# MP3s are concatenated, so a prescription of mostly common drugs only synthesizes the
+# sentences not heard before, at the cost of a flatter intonation across sentence breaks.
+TTS_CACHE_MAX_BYTES = int(float(os.getenv("SANJEEVANI_TTS_CACHE_MB", "256")) * 1_048_576)
+TTS_PHRASES = os.getenv("SANJEEVANI_TTS_PHRASES", "0") == "1"
+TTS_PHRASE_CONCURRENCY = 4
+CACHE_TRIM_EVERY = 50  # writes between LRU trims of a cache namespace (per process)
+
+_TTS_NAMESPACE = "tts"
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?।|])\s+")
+_cache_writes: dict[str, int] = {}
+
+
+def _tts_key(text: str, voice: str) -> str:
+    return hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()
+
+
+async def _cache_get(namespace: str, key: str, max_bytes: int) -> bytes | None:
+    """Shared cache lookup; a cache of size 0 is disabled."""
+    if not max_bytes:
+        return None
+    try:
+        return await asyncio.to_thread(db.cache_get, namespace, key)
+    except Exception as e:
+        _safe_print(f"[WARN] {namespace} cache lookup failed: {e}")
+        return None
+
+
+async def _cache_put(namespace: str, key: str, value: bytes, max_bytes: int):
+    """Shared cache write, trimming the namespace to ``max_bytes`` every CACHE_TRIM_EVERY writes."""
+    if not max_bytes or not value:
+        return
+    try:
+        await asyncio.to_thread(db.cache_put, namespace, key, value)
+        _cache_writes[namespace] = writes = _cache_writes.get(namespace, 0) + 1
+        if writes % CACHE_TRIM_EVERY == 0:
+            await asyncio.to_thread(db.cache_trim, namespace, max_bytes)
+    except Exception as e:
+        _safe_print(f"[WARN] {namespace} cache write failed: {e}")
+
+
+async def _synthesize(text: str, voice: str) -> bytes:
+    """One Edge TTS round trip, streamed in memory."""
+    import edge_tts
+    with _remote_stage("tts"):
+        communicate = edge_tts.Communicate(text, voice)
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio += chunk["data"]
+    return bytes(audio)
+
+
+async def _cached_speech(text: str, voice: str, limit: asyncio.Semaphore | None = None) -> bytes:
+    key = _tts_key(text, voice)
+    audio = await _cache_get(_TTS_NAMESPACE, key, TTS_CACHE_MAX_BYTES)
+    if audio is not None:
+        incr("tts_cache.hits")
+        return audio
+    incr("tts_cache.misses")
+    if limit is None:
+        audio = await _synthesize(text, voice)
+    else:
+        async with limit:
+            audio = await _synthesize(text, voice)
+    await _cache_put(_TTS_NAMESPACE, key, audio, TTS_CACHE_MAX_BYTES)
+    return audio
+
+
+async def _phrase_speech(text: str, voice: str) -> bytes:
+    """Synthesize (or reuse) each sentence separately and join the MP3 frames."""
+    sentences = [part.strip() for part in _SENTENCE_BREAK.split(text) if part.strip()]
+    if len(sentences) < 2:
+        return await _cached_speech(text, voice)
+    limit = asyncio.Semaphore(TTS_PHRASE_CONCURRENCY)
+    parts = await asyncio.gather(*(_cached_speech(sentence, voice, limit) for sentence in sentences))
+    return b"".join(parts)
+
+
+async def _generate_audio_async(text: str, lang_code: str) -> str | None:
     """
-    Generate a TTS MP3 file using Microsoft Edge TTS (Azure Neural voices) in memory.
+    Generate a TTS MP3 using Microsoft Edge TTS (Azure Neural voices), streamed in memory
+    and served from the TTS cache when the same text was spoken before.
     Returns base64 encoded string or None on failure.
     """
     try:
@@ -497,173 +1235,555 @@ def _generate_audio(text: str, lang_code: str) -> str | None:
 
         # Select the best voice for the language
         voice = VOICE_MAP.get(lang_code, "hi-IN-MadhurNeural")
-        
-        async def _stream_edge_tts():
-            communicate = edge_tts.Communicate(capped, voice)
-            audio_bytes = b""
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    audio_bytes += chunk["data"]
-            return audio_bytes
-
-        audio_bytes = asyncio.run(_stream_edge_tts())
+
+        if TTS_PHRASES:
+            audio_bytes = await _phrase_speech(capped, voice)
+        else:
+            audio_bytes = await _cached_speech(capped, voice)
         return base64.b64encode(audio_bytes).decode("utf-8")
     except Exception as tts_err:
         _safe_print(f"[WARN] Edge TTS generation failed: {tts_err}")
         return None
 
 
-def _translate_text(text: str, target_language: str) -> str:
+# ========== TRANSLATION CACHE ==========
+# Summaries of common medicines repeat across users, so translations are kept in the
+# shared cache keyed by model, language and text, trimmed least-recently-used to
+# SANJEEVANI_TRANSLATION_CACHE_MB (0 disables it).
+TRANSLATION_CACHE_MAX_BYTES = int(float(os.getenv("SANJEEVANI_TRANSLATION_CACHE_MB", "32")) * 1_048_576)
+_TRANSLATION_NAMESPACE = "translate"
+
+
+def _translation_key(text: str, target_language: str) -> str:
+    return hashlib.sha256(f"{ANALYSIS_MODEL}\0{target_language}\0{text}".encode("utf-8")).hexdigest()
+
+
+async def _translate_text_async(text: str, target_language: str) -> str:
     """
     Translate an English medical summary to target_language.
-    Returns original text unchanged if target is English or translation fails.
+    Returns original text unchanged if target is English or translation fails, including
+    a translation still cut off by max_tokens after the retry at twice the budget.
     """
     if target_language == "English" or not text.strip():
         return text
+    key = _translation_key(text, target_language)
+    cached = await _cache_get(_TRANSLATION_NAMESPACE, key, TRANSLATION_CACHE_MAX_BYTES)
+    if cached is not None:
+        incr("translation_cache.hits")
+        return cached.decode("utf-8")
+    incr("translation_cache.misses")
     try:
-        response = client.chat.completions.create(
-            model=ANALYSIS_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        f"You are a certified medical translator. "
-                        f"Translate the following medical text to {target_language}. "
-                        f"Keep all medicine names, dosages, and medical terms accurate. "
-                        f"Return ONLY the translated text — no explanations, no English labels."
-                    )
-                },
-                {"role": "user", "content": text}
-            ],
-            temperature=0.1,
-            max_tokens=1200,
-        )
+        with _remote_stage("translate"):
+            response = await _chat(
+                "translate", token_budget.translation_budget(text),
+                model=ANALYSIS_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            f"You are a certified medical translator. "
+                            f"Translate the following medical text to {target_language}. "
+                            f"Keep all medicine names, dosages, and medical terms accurate. "
+                            f"Return ONLY the translated text — no explanations, no English labels."
+                        )
+                    },
+                    {"role": "user", "content": text}
+                ],
+                temperature=0.1,
+                whole=True,
+                tag=re.sub(r"\W+", "_", target_language.lower()),
+            )
         translated = response.choices[0].message.content.strip()
-        return translated if translated else text
+        if not translated:
+            return text
+        if _truncated(response):
+            # Half a medicine summary could drop a warning: better the whole of it in English
+            incr("translate.truncated_fallback")
+            _safe_print(f"[WARN] Translation to {target_language} cut off twice; using the English text")
+            return text
+        await _cache_put(_TRANSLATION_NAMESPACE, key, translated.encode("utf-8"), TRANSLATION_CACHE_MAX_BYTES)
+        return translated
     except Exception as te:
         _safe_print(f"[WARN] Translation failed: {te}")
         return text
 
 
+async def _translate_lines_async(lines: list[str], target_language: str) -> list[str]:
+    """
+    Translate several short texts in one call, sent as a numbered list. Falls back to one
+    call per text if the reply does not come back as the same numbered list.
+    """
+    if len(lines) <= 1 or target_language == "English":
+        return [await _translate_text_async(line, target_language) for line in lines]
+    numbered = "\n".join(f"{i}. {' '.join(line.split())}" for i, line in enumerate(lines, start=1))
+    reply = await _translate_text_async(numbered, target_language)
+    items = re.findall(r"(?m)^\s*(\d+)[.)]\s*(.+?)\s*$", reply)
+    if [int(n) for n, _ in items] == list(range(1, len(lines) + 1)):
+        return [text for _, text in items]
+    incr("translate.lines_fallback")
+    return list(await asyncio.gather(*(_translate_text_async(line, target_language) for line in lines)))
+
+
+async def _translate_med_summary(medicines: list[dict], parts_en: list[tuple[str, str]],
+                                 target_language: str) -> str:
+    """
+    The per-medicine summary in target_language. Schedules are rendered from the local
+    phrasebook; only free text (purposes, and schedules it cannot parse) goes to the LLM.
+    """
+    lang_code = LANG_MAP.get(target_language, "en")
+    pieces, sources = [], []
+    for med, (schedule_en, purpose_en) in zip(medicines, parts_en):
+        schedule = phrasebook.render_schedule(med, lang_code)
+        incr("phrasebook.rendered" if schedule else "phrasebook.fallback")
+        pieces.append(schedule)
+        sources.append(schedule_en)
+        if purpose_en:
+            pieces.append(None)
+            sources.append(purpose_en)
+    missing = [i for i, piece in enumerate(pieces) if piece is None]
+    for i, text in zip(missing, await _translate_lines_async([sources[i] for i in missing], target_language)):
+        pieces[i] = text
+    return " ".join(pieces)
+
+
+# ========== BRAND CACHE ==========
+# A few hundred brands make up most strip scans. warm_cache.py stores the English analysis
+# of each listed brand ("Dolo 650") in the shared cache, plus its translated summaries and
+# audio. A two-stage scan whose OCR text names exactly one warmed brand skips the analysis
+# call, and the translation and TTS caches then answer the rest. A brand followed by a
+# variant word ("Dolo 650 Plus"), or a name listed without a strength followed by one,
+# does not match. A hit is served only when the OCR text also names the cached salts and
+# no strength other than the cached one, so an unlisted "Dolo 500" strip misread into a
+# listed name gets a live analysis. Entries are keyed by model and prompt, so a prompt
+# change starts afresh.
+BRAND_CACHE_MAX_BYTES = int(float(os.getenv("SANJEEVANI_BRAND_CACHE_MB", "16")) * 1_048_576)
+BRAND_INDEX_TTL_S = 300
+_BRAND_NAMESPACE = "brand"
+# The list of warmed brands is kept apart from the analyses, which are evicted by LRU:
+# it is the only entry of its namespace per cache version, so trimming never drops it
+_BRAND_INDEX_NAMESPACE = "brand_index"
+BRAND_CACHE_VERSION = hashlib.sha256(
+    f"{ANALYSIS_MODEL}\0{MEDICINE_ANALYSIS_INSTRUCTION}\0{MEDICINE_ANALYSIS_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+_BRAND_VARIANTS = frozenset({
+    "plus", "forte", "sr", "er", "xr", "cr", "mr", "ds", "duo", "cv", "lc", "kid", "kids", "junior", "total",
+    "xl", "la", "cd", "od", "dsr", "sp", "gp", "p", "d", "m", "l", "h", "z", "o", "a", "t", "c", "max", "extra",
+})
+_brand_index_cache: tuple[float, dict[str, list[tuple[str, ...]]]] = (0.0, {})
+
+
+def brand_key(name: str) -> str:
+    """Normalised brand: lower-case words and numbers, e.g. "DOLO-650" → "dolo 650"."""
+    return " ".join(re.findall(r"[a-z]+|\d+(?:\.\d+)?", name.lower()))
+
+
+def _match_brand(text: str, index: dict[str, list[tuple[str, ...]]]) -> str | None:
+    """The single warmed brand named in ``text`` (longest match wins), else None."""
+    tokens = brand_key(text).split()
+    found = set()
+    for i, token in enumerate(tokens):
+        for brand in index.get(token, ()):
+            end = i + len(brand)
+            if tuple(tokens[i:end]) != brand:
+                continue
+            following = tokens[end] if end < len(tokens) else ""
+            if following in _BRAND_VARIANTS:
+                continue
+            if following[:1].isdigit() and not any(part[:1].isdigit() for part in brand):
+                continue  # "dolo" must not answer for "dolo 500"
+            found.add(brand)
+    # Drop brands contained in a longer match ("pan" inside "pan 40")
+    found = {b for b in found
+             if not any(o != b and any(o[j:j + len(b)] == b for j in range(len(o))) for o in found)}
+    return " ".join(found.pop()) if len(found) == 1 else None
+
+
+def _brand_entry_key(brand: str) -> str:
+    return f"{BRAND_CACHE_VERSION}:{brand}"
+
+
+async def _brand_index() -> dict[str, list[tuple[str, ...]]]:
+    """Warmed brands by first word, re-read from the cache every BRAND_INDEX_TTL_S."""
+    global _brand_index_cache
+    loaded_at, index = _brand_index_cache
+    if time.monotonic() - loaded_at < BRAND_INDEX_TTL_S:
+        return index
+    raw = await _cache_get(_BRAND_INDEX_NAMESPACE, BRAND_CACHE_VERSION, BRAND_CACHE_MAX_BYTES)
+    index = {}
+    for brand in json.loads(raw) if raw else []:
+        words = tuple(brand.split())
+        index.setdefault(words[0], []).append(words)
+    _brand_index_cache = (time.monotonic(), index)
+    return index
+
+
+_STRENGTH_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:mg|mcg|µg|gm|g|iu|%)(?![a-z])")
+
+
+def _brand_hit_matches(analysis: dict, text: str) -> bool:
+    """Whether ``text`` agrees with a cached analysis: its salts and only its strengths."""
+    tokens = set(brand_key(text).split())
+    cached = {float(n) for n in re.findall(r"\d+(?:\.\d+)?", str(analysis.get("dosage_strength") or ""))}
+    if not cached or not all(any(float(t) == n for t in tokens if t[:1].isdigit()) for n in cached):
+        return False
+    if any(float(n) not in cached for n in _STRENGTH_RE.findall(text.lower())):
+        return False  # "Paracetamol 500 mg" on the strip, 650 in the cache
+    salts = [re.findall(r"[a-z]+", str(salt).lower()) for salt in analysis.get("active_salts") or []]
+    return bool(salts) and all(words and words[0] in tokens for words in salts)
+
+
+async def _cached_brand_analysis(extracted_text: str) -> dict | None:
+    index = await _brand_index()
+    if not index:
+        return None
+    brand = _match_brand(extracted_text, index)
+    raw = brand and await _cache_get(_BRAND_NAMESPACE, _brand_entry_key(brand), BRAND_CACHE_MAX_BYTES)
+    if not raw:
+        incr("brand_cache.misses")
+        return None
+    analysis = json.loads(raw)
+    if not _brand_hit_matches(analysis, extracted_text):
+        incr("brand_cache.mismatches")
+        _safe_print(f"[INFO] Brand cache entry for {brand} does not match the label, analysing live")
+        return None
+    incr("brand_cache.hits")
+    _safe_print(f"[INFO] Analysis served from the brand cache: {brand}")
+    return analysis
+
+
+async def _store_brand_analysis(brand: str, analysis: dict):
+    """Cache ``analysis`` for ``brand`` and add it to the index (single writer: warm_cache.py)."""
+    await _cache_put(_BRAND_NAMESPACE, _brand_entry_key(brand),
+                     json.dumps(analysis, ensure_ascii=False).encode("utf-8"), BRAND_CACHE_MAX_BYTES)
+    await _index_brand(brand)
+
+
+async def _index_brand(brand: str):
+    """Add ``brand`` to the list of warmed brands, if it is not there yet."""
+    raw = await _cache_get(_BRAND_INDEX_NAMESPACE, BRAND_CACHE_VERSION, BRAND_CACHE_MAX_BYTES)
+    brands = set(json.loads(raw)) if raw else set()
+    if brand not in brands:
+        brands.add(brand)
+        await _cache_put(_BRAND_INDEX_NAMESPACE, BRAND_CACHE_VERSION,
+                         json.dumps(sorted(brands)).encode("utf-8"), BRAND_CACHE_MAX_BYTES)
+
+
 # ─────────────────────────────────────────────────────────────
 # PUBLIC API
 # ─────────────────────────────────────────────────────────────
 
-def analyze_medicine_image(image_bytes: bytes, target_language: str = "English") -> tuple[dict, str | None]:
-    """Two-stage pipeline for medicine strip images: Vision OCR → Medical Analysis."""
-    try:
-        # Stage 1: OCR — free-text mode for better accuracy on all image types
-        extracted_text = _call_vision_model_freetext(image_bytes, MEDICINE_OCR_INSTRUCTION, "Extract all visible text from this medicine image, including name, dosage, ingredients, and any other text. Write it line by line.")
-        _safe_print(f"[INFO] Medicine OCR extracted {len(extracted_text)} chars")
+# ========== SINGLE-FLIGHT ==========
+# A double-tapped upload or a proxy retry sends the same image and language again while
+# the first scan is still running. Identical concurrent requests share one pipeline run:
+# the first starts it, the rest await it and get their own copy of the result. Per
+# process and per event loop; unique traffic only pays for hashing the upload. The run
+# is cancelled only when every request waiting on it has been cancelled. A file upload
+# is copied while it is hashed and the run reads that copy: the request that started
+# it may go away (and its upload be closed) while duplicates still wait on the result.
+SINGLE_FLIGHT = os.getenv("SANJEEVANI_SINGLE_FLIGHT", "1") != "0"
+# Flight copies of an upload stay in memory up to this size, then move to a temp file
+FLIGHT_SPOOL_BYTES = 1 << 20
 
-        if not extracted_text or len(extracted_text.strip()) < 3:
-            return {
-                "error": "Could not read text from the image. Please ensure the medicine label is clearly visible and well-lit."
-            }, None
 
-        # Stage 2: Analysis — generate ALL fields in English for accuracy
-        analysis_prompt = """
-Based on the extracted medicine text below, provide a detailed medical analysis.
-Return ALL fields in English.
+class _Flight:
+    """One shared pipeline run and the number of requests awaiting it."""
+    __slots__ = ("task", "waiters")
 
-Return JSON structure:
-{
-    "is_medicine": true,
-    "medicine_name": "Name of the medicine",
-    "active_salts": ["salt1", "salt2"],
-    "dosage_strength": "e.g. 500mg, 10mg etc.",
-    "is_high_dosage": true or false,
-    "dosage_info": "Explain whether this is a high or normal dosage and why",
-    "conditions": ["list of medical conditions this medicine is used for"],
-    "what_it_does": "A clear explanation of what this medicine does in the body and how it works",
-    "suitable_age_group": "e.g. Adults (18+), Children (6-12), All ages, etc.",
-    "advice": "Comprehensive safety advice including dosage level, conditions, what it does, and age group suitability. Write in English."
-}
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
 
-If the image does not appear to be a medicine, return:
-{
-    "is_medicine": false,
-    "medicine_name": "Unknown",
-    "active_salts": [],
-    "dosage_strength": "N/A",
-    "is_high_dosage": false,
-    "dosage_info": "N/A",
-    "conditions": [],
-    "what_it_does": "N/A",
-    "suitable_age_group": "N/A",
-    "advice": "This does not appear to be a medicine."
-}
-"""
-        data = _call_analysis_model(extracted_text, MEDICINE_ANALYSIS_INSTRUCTION, analysis_prompt)
-
-        # Defaults for all required fields
-        data.setdefault("is_medicine", True)
-        data.setdefault("medicine_name", "Unknown")
-        data.setdefault("active_salts", [])
-        data.setdefault("dosage_strength", "N/A")
-        data.setdefault("is_high_dosage", False)
-        data.setdefault("dosage_info", "")
-        data.setdefault("conditions", [])
-        data.setdefault("what_it_does", "")
-        data.setdefault("suitable_age_group", "N/A")
-        data.setdefault("advice", "")
-
-        # Ensure list fields are actual lists
-        if isinstance(data.get("active_salts"), str):
-            data["active_salts"] = [s.strip() for s in data["active_salts"].split(",") if s.strip()]
-        if isinstance(data.get("conditions"), str):
-            data["conditions"] = [s.strip() for s in data["conditions"].split(",") if s.strip()]
-
-        # ── Build English summary from the validated structured fields ──
-        # This is the single source of truth — both displayed text and audio come from this.
-        name = data.get("medicine_name", "Unknown")
-        conditions_str = ", ".join(data.get("conditions", []))
-        what_it_does = data.get("what_it_does", "")
-        dosage_info = data.get("dosage_info", "")
-        age_group = data.get("suitable_age_group", "")
-        advice_en = data.get("advice", "")
-
-        parts_en = [f"{name}."]  
-        if conditions_str:
-            parts_en.append(f"Used for: {conditions_str}.")  
-        if dosage_info and dosage_info != "N/A":
-            parts_en.append(f"{dosage_info}.")
-        if what_it_does and what_it_does != "N/A":
-            parts_en.append(f"{what_it_does}.")
-        if age_group and age_group != "N/A":
-            parts_en.append(f"Suitable for: {age_group}.")
-        if advice_en:
-            parts_en.append(advice_en)
-        english_summary = _cap_text(" ".join(parts_en))
-
-        # ── Translate once → used for BOTH displayed advice text and TTS audio ──
-        translated_summary = _translate_text(english_summary, target_language)
-        lang_code = LANG_MAP.get(target_language, "en")
 
-        # Store both versions so the frontend can display them
-        data["advice"] = translated_summary        # shown in selected language
-        data["advice_en"] = english_summary        # shown in English for reference
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, _Flight]]" = weakref.WeakKeyDictionary()
 
-        audio_path = _generate_audio(translated_summary, lang_code)
-        return data, audio_path
+
+def _own_upload(image: bytes | BinaryIO) -> tuple[bytes | BinaryIO, str]:
+    """
+    A copy of the upload for a flight to read, and its SHA-256. A file is copied in chunks
+    into a spooled temp file, so a large photo is still never held in memory as bytes.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        data = bytes(image)
+        return data, hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    owned = tempfile.SpooledTemporaryFile(max_size=FLIGHT_SPOOL_BYTES, mode="w+b")
+    image.seek(0)
+    for chunk in iter(lambda: image.read(1 << 20), b""):
+        digest.update(chunk)
+        owned.write(chunk)
+    image.seek(0)
+    owned.seek(0)
+    return owned, digest.hexdigest()
+
+
+def _close_upload(image: bytes | BinaryIO):
+    if not isinstance(image, (bytes, bytearray, memoryview)):
+        image.close()
+
+
+async def _single_flight(key: tuple, run, upload: bytes | BinaryIO):
+    """
+    Await ``run()``, or the identical run already in flight for ``key``. ``upload`` is the
+    copy from _own_upload that ``run`` reads; it is closed once nothing can read it.
+    """
+    inflight = _inflight.setdefault(asyncio.get_running_loop(), {})
+    flight = inflight.get(key)
+    duplicate = flight is not None
+    if duplicate:
+        incr("singleflight.deduped")
+        incr(f"singleflight.deduped.{key[0]}")
+        _close_upload(upload)  # the run in flight reads its own copy
+    else:
+        flight = inflight[key] = _Flight(asyncio.ensure_future(run()))
+
+        def _landed(_):
+            if inflight.get(key) is flight:
+                inflight.pop(key)
+            _close_upload(upload)
+
+        flight.task.add_done_callback(_landed)
+    flight.waiters += 1
+    try:
+        # shield: one waiter giving up must not cancel the run the others wait on
+        result = await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        if flight.waiters == 1 and not flight.task.done():
+            if inflight.get(key) is flight:
+                del inflight[key]  # a new identical scan starts afresh
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+    return copy.deepcopy(result) if duplicate else result
+
+
+# "two-stage": OCR call, then analysis call (default). "fused": one vision call answering
+# the analysis schema, falling back to two-stage when its answer fails validation.
+MEDICINE_MODES = ("two-stage", "fused")
+MEDICINE_MODE = os.getenv("SANJEEVANI_MEDICINE_MODE", "two-stage")
+
+
+def analyze_medicine_image(image: bytes | BinaryIO, target_language: str = "English",
+                           mode: str | None = None, cancel: CancelToken | None = None) -> tuple[dict, str | None]:
+    """
+    Pipeline for medicine strip images: Vision OCR → Medical Analysis, or both in one call
+    with ``mode="fused"`` (default: SANJEEVANI_MEDICINE_MODE).
+    ``image`` is the upload as bytes or a seekable binary file. If ``cancel`` fires, the
+    remaining stages are abandoned and an error dict with ``"cancelled": True`` is returned.
+    """
+    try:
+        return _run_sync(analyze_medicine_image_async(image, target_language, mode), cancel)
+    except CancelledError:
+        return _cancelled_scan("medicine")
+
+
+def _valid_medicine_analysis(data) -> bool:
+    """Whether an analysis is complete enough to use (a fused answer, or one worth caching)."""
+    if not isinstance(data, dict) or data.get("is_medicine") is not True:
+        return False  # includes "not a medicine": let the dedicated OCR pass confirm it
+    name = data.get("medicine_name")
+    if not isinstance(name, str) or not name.strip() or name.strip().lower() in ("unknown", "n/a"):
+        return False
+    salts = data.get("active_salts")
+    if not salts or not isinstance(salts, (list, str)):
+        return False
+    strength = data.get("dosage_strength")
+    if not isinstance(strength, str) or not re.search(r"\d", strength):
+        return False
+    return all(isinstance(data.get(key), str) and data[key].strip() for key in ("what_it_does", "advice"))
+
+
+async def _analyze_medicine_fused(image: bytes | BinaryIO) -> dict | None:
+    """Fused mode: the analysis dict, or None when the caller should fall back to two stages."""
+    try:
+        data = await _call_vision_analysis_async(
+            image, MEDICINE_FUSED_INSTRUCTION,
+            "Read the medicine label in this image and analyze it.\n" + MEDICINE_ANALYSIS_SCHEMA
+        )
+    except Exception as e:
+        _safe_print(f"[WARN] Fused medicine analysis failed: {e}")
+        data = None
+    if _valid_medicine_analysis(data):
+        incr("medicine.fused_ok")
+        return data
+    incr("medicine.fused_fallback")
+    _safe_print("[INFO] Fused medicine answer failed validation; falling back to OCR + analysis")
+    return None
+
+
+async def _analyze_medicine_two_stage(image: bytes | BinaryIO) -> dict:
+    """OCR call, then analysis of the extracted text. Returns the analysis or an error dict."""
+    # Stage 1: OCR — free-text mode for better accuracy on all image types
+    extracted_text = await _call_vision_model_freetext_async(image, MEDICINE_OCR_INSTRUCTION, "Extract all visible text from this medicine image, including name, dosage, ingredients, and any other text. Write it line by line.", kind="medicine")
+    _safe_print(f"[INFO] Medicine OCR extracted {len(extracted_text)} chars")
+
+    if not extracted_text or len(extracted_text.strip()) < 3:
+        return {
+            "error": "Could not read text from the image. Please ensure the medicine label is clearly visible and well-lit."
+        }
+
+    # Common brands warmed by warm_cache.py skip the analysis call
+    cached = await _cached_brand_analysis(extracted_text)
+    if cached is not None:
+        return cached
+
+    # Stage 2: Analysis — generate ALL fields in English for accuracy
+    return await _call_analysis_model_async(extracted_text, MEDICINE_ANALYSIS_INSTRUCTION, MEDICINE_ANALYSIS_PROMPT)
+
+
+async def analyze_medicine_image_async(image: bytes | BinaryIO, target_language: str = "English",
+                                       mode: str | None = None) -> tuple[dict, str | None]:
+    """
+    Async form of analyze_medicine_image; preprocessing runs in the CPU pool. Identical
+    concurrent scans (same image, language and mode) share one run.
+    """
+    mode = mode or MEDICINE_MODE
+    if not SINGLE_FLIGHT:
+        return await _analyze_medicine_image(image, target_language, mode)
+    image, digest = await _run_cpu(_own_upload, image)
+    key = ("medicine", digest, target_language, mode)
+    return await _single_flight(key, lambda: _analyze_medicine_image(image, target_language, mode), image)
+
+
+async def _analyze_medicine_image(image: bytes | BinaryIO, target_language: str, mode: str) -> tuple[dict, str | None]:
+    try:
+        if mode not in MEDICINE_MODES:
+            raise ValueError(f"Unknown medicine analysis mode: {mode}")
+        retake = await _quality_gate(image)
+        if retake:
+            return retake, None
+        data = await _analyze_medicine_fused(image) if mode == "fused" else None
+        if data is None:
+            data = await _analyze_medicine_two_stage(image)
+            if "error" in data:
+                return data, None
+        return await _finish_medicine_analysis(data, target_language)
 
     except Exception as e:
         _safe_print(f"[ERROR] Medicine analysis exception: {e}")
         return {"error": f"Scan Failed: {str(e)}"}, None
 
 
-def analyze_prescription_image(image_bytes: bytes, target_language: str = "English") -> tuple[dict, str | None]:
+async def _finish_medicine_analysis(data: dict, target_language: str) -> tuple[dict, str | None]:
+    """Fill defaults, build the summary, translate it and speak it. Mutates ``data``."""
+    # Defaults for all required fields
+    data.setdefault("is_medicine", True)
+    data.setdefault("medicine_name", "Unknown")
+    data.setdefault("active_salts", [])
+    data.setdefault("dosage_strength", "N/A")
+    data.setdefault("is_high_dosage", False)
+    data.setdefault("dosage_info", "")
+    data.setdefault("conditions", [])
+    data.setdefault("what_it_does", "")
+    data.setdefault("suitable_age_group", "N/A")
+    data.setdefault("advice", "")
+
+    # Ensure list fields are actual lists
+    if isinstance(data.get("active_salts"), str):
+        data["active_salts"] = [s.strip() for s in data["active_salts"].split(",") if s.strip()]
+    if isinstance(data.get("conditions"), str):
+        data["conditions"] = [s.strip() for s in data["conditions"].split(",") if s.strip()]
+
+    # ── Build English summary from the validated structured fields ──
+    # This is the single source of truth — both displayed text and audio come from this.
+    name = data.get("medicine_name", "Unknown")
+    conditions_str = ", ".join(data.get("conditions", []))
+    what_it_does = data.get("what_it_does", "")
+    dosage_info = data.get("dosage_info", "")
+    age_group = data.get("suitable_age_group", "")
+    advice_en = data.get("advice", "")
+
+    parts_en = [f"{name}."]  
+    if conditions_str:
+        parts_en.append(f"Used for: {conditions_str}.")  
+    if dosage_info and dosage_info != "N/A":
+        parts_en.append(f"{dosage_info}.")
+    if what_it_does and what_it_does != "N/A":
+        parts_en.append(f"{what_it_does}.")
+    if age_group and age_group != "N/A":
+        parts_en.append(f"Suitable for: {age_group}.")
+    if advice_en:
+        parts_en.append(advice_en)
+    english_summary = _cap_text(" ".join(parts_en))
+
+    # ── Translate once → used for BOTH displayed advice text and TTS audio ──
+    translated_summary = await _translate_text_async(english_summary, target_language)
+    lang_code = LANG_MAP.get(target_language, "en")
+
+    # Store both versions so the frontend can display them
+    data["advice"] = translated_summary        # shown in selected language
+    data["advice_en"] = english_summary        # shown in English for reference
+
+    audio_path = await _generate_audio_async(translated_summary, lang_code)
+    return data, audio_path
+
+
+def warm_brand(brand: str, languages: list[str] | None = None):
+    """Blocking form of warm_brand_async (used by warm_cache.py)."""
+    return _run_sync(warm_brand_async(brand, languages))
+
+
+async def warm_brand_async(brand: str, languages: list[str] | None = None):
+    """
+    Precompute what a scan of ``brand`` needs: its analysis (brand cache), then its summary
+    translated into each of ``languages`` (default: every LANG_MAP language) and spoken
+    (translation and TTS caches). Steps already cached cost a lookup. Raises ValueError
+    when the model's analysis is incomplete, so nothing is cached for it.
+    """
+    key = brand_key(brand)
+    if not key:
+        raise ValueError(f"Not a brand name: {brand!r}")
+    raw = await _cache_get(_BRAND_NAMESPACE, _brand_entry_key(key), BRAND_CACHE_MAX_BYTES)
+    if raw:
+        analysis = json.loads(raw)
+        await _index_brand(key)  # so re-running warm_cache.py rebuilds a lost index
+    else:
+        analysis = await _call_analysis_model_async(brand, MEDICINE_ANALYSIS_INSTRUCTION, MEDICINE_ANALYSIS_PROMPT)
+        if not _valid_medicine_analysis(analysis):
+            raise ValueError(f"Incomplete analysis for {brand!r}; not cached")
+        await _store_brand_analysis(key, analysis)
+    for language in languages or list(LANG_MAP):
+        await _finish_medicine_analysis(copy.deepcopy(analysis), language)
+
+
+def analyze_prescription_image(image: bytes | BinaryIO, target_language: str = "English",
+                               cancel: CancelToken | None = None) -> tuple[dict, str | None]:
     """
     Two-stage pipeline for prescription images.
     Stage 1: Free-text OCR (no JSON constraint) for best handwriting transcription.
     Stage 2: Structured medical analysis from transcribed text.
+    ``cancel`` abandons the scan as in analyze_medicine_image.
     """
     try:
+        return _run_sync(analyze_prescription_image_async(image, target_language), cancel)
+    except CancelledError:
+        return _cancelled_scan("prescription")
+
+
+async def analyze_prescription_image_async(image: bytes | BinaryIO, target_language: str = "English") -> tuple[dict, str | None]:
+    """
+    Async form of analyze_prescription_image; translations and TTS overlap where possible.
+    Identical concurrent scans (same image and language) share one run.
+    """
+    if not SINGLE_FLIGHT:
+        return await _analyze_prescription_image(image, target_language)
+    image, digest = await _run_cpu(_own_upload, image)
+    key = ("prescription", digest, target_language)
+    return await _single_flight(key, lambda: _analyze_prescription_image(image, target_language), image)
+
+
+async def _analyze_prescription_image(image: bytes | BinaryIO, target_language: str) -> tuple[dict, str | None]:
+    try:
+        retake = await _quality_gate(image)
+        if retake:
+            return retake, None
+
         # ── Stage 1: Free-text OCR — NO JSON constraint for better handwriting accuracy ──
-        extracted_text = _call_vision_model_freetext(
-            image_bytes,
+        extracted_text = await _call_vision_model_freetext_async(
+            image,
             PRESCRIPTION_OCR_SYSTEM,
-            PRESCRIPTION_OCR_USER
+            PRESCRIPTION_OCR_USER,
+            kind="prescription"
         )
         _safe_print(f"[INFO] Prescription OCR extracted {len(extracted_text)} chars")
         _safe_print(f"[INFO] OCR preview: {extracted_text[:300].encode('ascii', errors='replace').decode('ascii')}")
@@ -675,7 +1795,7 @@ def analyze_prescription_image(image_bytes: bytes, target_language: str = "Engli
 
         # ── Stage 2: Structured Medical Analysis (dedicated call — text passed exactly once) ──
         lang_code = LANG_MAP.get(target_language, "en")
-        data = _call_prescription_analysis(extracted_text, target_language, lang_code)
+        data = await _call_prescription_analysis_async(extracted_text, target_language, lang_code)
 
         # ── Normalise medicines list ──
         medicines = data.get("medicines", []) or []
@@ -726,7 +1846,7 @@ def analyze_prescription_image(image_bytes: bytes, target_language: str = "Engli
 
         # ── Build English summary from validated structured fields ──
         # Single source of truth — both overall_advice display text and TTS audio come from this.
-        med_parts_en = []
+        parts_en = []  # (schedule sentence, first sentence of purpose) per medicine
         for med in medicines_sorted:
             m_name = med.get("name", "Unknown")
             m_dosage = med.get("dosage", "")
@@ -746,30 +1866,40 @@ def analyze_prescription_image(image_bytes: bytes, target_language: str = "Engli
                 sentence += f" for {m_duration}"
             sentence += "."
             # First sentence of purpose only
+            purpose = ""
             if m_purpose and m_purpose != "Not available":
                 first = m_purpose.split(".")[0].strip()
                 if first:
-                    sentence += f" {first}."
-            med_parts_en.append(sentence)
+                    purpose = f"{first}."
+            parts_en.append((sentence, purpose))
 
-        english_med_summary = _cap_text(" ".join(med_parts_en))
+        english_med_summary = _cap_text(" ".join(" ".join(filter(None, part)) for part in parts_en))
 
-        # ── Translate once → used for BOTH overall_advice display and TTS audio ──
+        # ── Summary in the target language → used for BOTH overall_advice display and TTS audio ──
+        # Schedules come from the phrasebook, so only the short purposes wait on the LLM.
+        # Audio starts as soon as the summary is ready, while the display fields
+        # (overall_advice daily schedule, diet_advice, follow_up) are still translating.
         lang_code = LANG_MAP.get(target_language, "en")
-        translated_summary = _translate_text(english_med_summary, target_language)
+
+        async def _summary_audio():
+            if target_language == "English":
+                translated = english_med_summary
+            else:
+                translated = await _translate_med_summary(medicines_sorted, parts_en, target_language)
+            return await _generate_audio_async(_cap_text(translated), lang_code)
 
         # Store English summary so the frontend can render bilingual output
         data["overall_advice_en"] = english_med_summary
 
-        # Translate overall_advice (daily schedule), diet_advice, follow_up for display
+        display_fields = []
         if target_language != "English":
-            for field in ("overall_advice", "diet_advice", "follow_up"):
-                val = data.get(field, "")
-                if val:
-                    data[field] = _translate_text(val, target_language)
-
-        audio_text = _cap_text(translated_summary)
-        audio_path = _generate_audio(audio_text, lang_code)
+            display_fields = [f for f in ("overall_advice", "diet_advice", "follow_up") if data.get(f, "")]
+        audio_path, *translated_fields = await asyncio.gather(
+            _summary_audio(),
+            *(_translate_text_async(data[f], target_language) for f in display_fields),
+        )
+        for field, translated in zip(display_fields, translated_fields):
+            data[field] = translated
         return data, audio_path
 
     except Exception as e:
@@ -1,8 +1,19 @@
 import { NextRequest, NextResponse } from "next/server";
+import { passThrough } from "@/lib/proxy";
 
 const PYTHON_API = process.env.PYTHON_API_URL || "http://127.0.0.1:5000";
+// Same cap as the Python server (SANJEEVANI_MAX_UPLOAD_MB); checked before buffering the body
+const MAX_UPLOAD_MB = Number(process.env.SANJEEVANI_MAX_UPLOAD_MB || "20");
 
 export async function POST(request: NextRequest) {
+  const contentLength = Number(request.headers.get("content-length") || "0");
+  if (contentLength > MAX_UPLOAD_MB * 1024 * 1024) {
+    return NextResponse.json(
+      { error: `Image is too large. Please upload a photo under ${MAX_UPLOAD_MB} MB.` },
+      { status: 413 }
+    );
+  }
+
   try {
     const incoming = await request.formData();
 
@@ -19,20 +30,24 @@ export async function POST(request: NextRequest) {
     outgoing.append("language", language);
 
     const cookie = request.headers.get("cookie") || "";
-    const response = await fetch(`${PYTHON_API}/api/analyze/medicine`, {
+    // e.g. fields= projections
+    const query = request.nextUrl.searchParams.toString();
+    // Let the Python admission layer rate-limit by real client IP and traffic class
+    const forwardedFor = request.headers.get("x-forwarded-for") || "";
+    const requestClass = request.headers.get("x-request-class") || "";
+    const response = await fetch(`${PYTHON_API}/api/analyze/medicine${query ? `?${query}` : ""}`, {
       method: "POST",
       body: outgoing,
-      headers: { cookie }
+      headers: { cookie, "x-forwarded-for": forwardedFor, "x-request-class": requestClass },
+      // Aborted when the browser goes away; Flask sees the closed connection and stops the scan
+      signal: request.signal
     });
 
-    const data = await response.json();
-
-    if (!response.ok) {
-      return NextResponse.json(data, { status: response.status });
-    }
-
-    return NextResponse.json(data);
+    return passThrough(response);
   } catch (error: any) {
+    if (error?.name === "AbortError") {
+      return new NextResponse(null, { status: 499 }); // the client has gone; nobody reads this
+    }
     return NextResponse.json(
       { error: error.message || "Failed to connect to analysis server. Make sure the Python server is running (python server.py)." },
       { status: 500 }
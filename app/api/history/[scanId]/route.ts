@@ -1,9 +1,30 @@
 import { NextRequest, NextResponse } from "next/server";
+import { passThrough } from "@/lib/proxy";
 
 export const dynamic = "force-dynamic";
 
 const PYTHON_API = process.env.PYTHON_API_URL || "http://127.0.0.1:5000";
 
+export async function GET(
+    request: NextRequest,
+    { params }: { params: Promise<{ scanId: string }> }
+) {
+    try {
+        const { scanId } = await params;
+        const cookie = request.headers.get("cookie") || "";
+        const query = request.nextUrl.searchParams.toString();
+        const response = await fetch(`${PYTHON_API}/api/history/${scanId}${query ? `?${query}` : ""}`, {
+            headers: { cookie }
+        });
+        return passThrough(response);
+    } catch (error: any) {
+        return NextResponse.json(
+            { success: false, message: "Failed to connect to server" },
+            { status: 500 }
+        );
+    }
+}
+
 export async function DELETE(
     request: NextRequest,
     { params }: { params: Promise<{ scanId: string }> }
@@ -18,8 +39,7 @@ export async function DELETE(
             headers: { cookie }
         });
 
-        const data = await response.json();
-        return NextResponse.json(data, { status: response.status });
+        return passThrough(response);
     } catch (error: any) {
         console.error(`[DELETE] Proxy error:`, error);
         return NextResponse.json(
@@ -0,0 +1,28 @@
+import { NextRequest, NextResponse } from "next/server";
+import { passThrough } from "@/lib/proxy";
+
+export const dynamic = "force-dynamic";
+
+const PYTHON_API = process.env.PYTHON_API_URL || "http://127.0.0.1:5000";
+
+// The export can be tens of thousands of scans: the body is streamed through as it
+// arrives, and aborting the download closes the upstream cursor.
+export async function GET(request: NextRequest) {
+    try {
+        const cookie = request.headers.get("cookie") || "";
+        const query = request.nextUrl.searchParams.toString();
+        const response = await fetch(`${PYTHON_API}/api/history/export${query ? `?${query}` : ""}`, {
+            headers: { cookie },
+            signal: request.signal
+        });
+        return passThrough(response);
+    } catch (error: any) {
+        if (error?.name === "AbortError") {
+            return new NextResponse(null, { status: 499 });
+        }
+        return NextResponse.json(
+            { success: false, message: "Failed to connect to server" },
+            { status: 500 }
+        );
+    }
+}
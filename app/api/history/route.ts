@@ -1,15 +1,16 @@
 import { NextRequest, NextResponse } from "next/server";
+import { passThrough } from "@/lib/proxy";
 
 const PYTHON_API = process.env.PYTHON_API_URL || "http://127.0.0.1:5000";
 
 export async function GET(request: NextRequest) {
     try {
         const cookie = request.headers.get("cookie") || "";
-        const response = await fetch(`${PYTHON_API}/api/history`, {
+        const query = request.nextUrl.searchParams.toString();
+        const response = await fetch(`${PYTHON_API}/api/history${query ? `?${query}` : ""}`, {
             headers: { cookie }
         });
-        const data = await response.json();
-        return NextResponse.json(data, { status: response.status });
+        return passThrough(response);
     } catch (error: any) {
         return NextResponse.json(
             { success: false, message: "Failed to connect to server" },
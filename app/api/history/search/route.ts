@@ -0,0 +1,22 @@
+import { NextRequest, NextResponse } from "next/server";
+import { passThrough } from "@/lib/proxy";
+
+export const dynamic = "force-dynamic";
+
+const PYTHON_API = process.env.PYTHON_API_URL || "http://127.0.0.1:5000";
+
+export async function GET(request: NextRequest) {
+    try {
+        const cookie = request.headers.get("cookie") || "";
+        const query = request.nextUrl.searchParams.toString();
+        const response = await fetch(`${PYTHON_API}/api/history/search?${query}`, {
+            headers: { cookie }
+        });
+        return passThrough(response);
+    } catch (error: any) {
+        return NextResponse.json(
+            { success: false, message: "Failed to connect to server" },
+            { status: 500 }
+        );
+    }
+}
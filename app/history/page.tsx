@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from "react";
 import { motion, AnimatePresence } from "framer-motion";
-import { ArrowLeft, Pill, FileText, Trash2, ChevronDown, ChevronUp, Inbox } from "lucide-react";
+import { ArrowLeft, Pill, FileText, Trash2, ChevronDown, ChevronUp, Inbox, Search } from "lucide-react";
 import { useRouter } from "next/navigation";
 import MandalaBackground from "@/components/MandalaBackground";
 
@@ -10,7 +10,8 @@ interface HistoryItem {
   id: number;
   scan_type: string;
   language: string;
-  result: any;
+  medicine_names: string[];
+  medicine_count: number;
   created_at: string;
 }
 
@@ -20,17 +21,66 @@ const ScanHistory = () => {
   const [loading, setLoading] = useState(true);
   const [expandedId, setExpandedId] = useState<number | null>(null);
   const [deletingId, setDeletingId] = useState<number | null>(null);
+  const [nextBefore, setNextBefore] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Full results are only fetched when a card is expanded
+  const [results, setResults] = useState<Record<number, any>>({});
+  const [query, setQuery] = useState("");
+  const [searchResults, setSearchResults] = useState<HistoryItem[] | null>(null);
 
-  useEffect(() => {
-    fetch(`/api/history`, { credentials: "include" })
+  const loadPage = (before: string | null) => {
+    const query = before ? `?before=${encodeURIComponent(before)}` : "";
+    return fetch(`/api/history${query}`, { credentials: "include" })
       .then((r) => r.json())
       .then((data) => {
-        if (data.success) setItems(data.history || []);
+        if (data.success) {
+          setItems((prev) => (before ? [...prev, ...(data.history || [])] : data.history || []));
+          setNextBefore(data.next_before || null);
+        }
       })
-      .catch(() => { })
-      .finally(() => setLoading(false));
+      .catch(() => { });
+  };
+
+  useEffect(() => {
+    loadPage(null).finally(() => setLoading(false));
   }, []);
 
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(() => {
+      fetch(`/api/history/search?q=${encodeURIComponent(q)}`, { credentials: "include" })
+        .then((r) => r.json())
+        .then((data) => {
+          if (data.success) setSearchResults(data.history || []);
+        })
+        .catch(() => { });
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  const visibleItems = searchResults ?? items;
+
+  const handleLoadMore = () => {
+    if (!nextBefore) return;
+    setLoadingMore(true);
+    loadPage(nextBefore).finally(() => setLoadingMore(false));
+  };
+
+  const handleExpand = (id: number) => {
+    setExpandedId(expandedId === id ? null : id);
+    if (expandedId === id || id in results) return;
+    fetch(`/api/history/${id}`, { credentials: "include" })
+      .then((r) => r.json())
+      .then((data) => {
+        if (data.success) setResults((prev) => ({ ...prev, [id]: data.scan.result }));
+      })
+      .catch(() => { });
+  };
+
   const handleDelete = (id: number) => {
     setDeletingId(id);
     fetch(`/api/history/${id}`, { method: "DELETE", credentials: "include" })
@@ -39,6 +89,7 @@ const ScanHistory = () => {
         if (data.success) {
           setTimeout(() => {
             setItems((prev) => prev.filter((i) => i.id !== id));
+            setSearchResults((prev) => prev && prev.filter((i) => i.id !== id));
             setDeletingId(null);
           }, 400);
         } else {
@@ -49,17 +100,17 @@ const ScanHistory = () => {
   };
 
   const getDisplayName = (item: HistoryItem) => {
-    const r = item.result;
+    const names = item.medicine_names || [];
     if (item.scan_type === "medicine") {
-      return r?.medicine_name || "Unknown Medicine";
+      return names[0] || "Unknown Medicine";
     }
-    const meds = r?.medicines || [];
-    if (meds.length > 0) return meds.map((m: any) => m.name).join(", ");
+    if (names.length > 0) return names.join(", ");
     return "Prescription";
   };
 
   const getDetails = (item: HistoryItem) => {
-    const r = item.result;
+    if (!(item.id in results)) return "Loading details...";
+    const r = results[item.id];
     if (item.scan_type === "medicine") {
       const parts = [];
       if (r?.active_salts?.length) parts.push(`Salts: ${r.active_salts.join(", ")}`);
@@ -91,6 +142,19 @@ const ScanHistory = () => {
           <h1 className="font-display text-2xl font-bold text-foreground">Scan History</h1>
         </motion.div>
 
+        {!loading && items.length > 0 && (
+          <div className="relative mb-8">
+            <Search size={16} className="absolute left-4 top-1/2 -translate-y-1/2 text-muted-foreground" />
+            <input
+              type="search"
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+              placeholder="Search by medicine, salt, diagnosis or doctor"
+              className="w-full pl-11 pr-4 py-3 bg-card border border-border rounded-xl text-sm text-foreground placeholder:text-muted-foreground focus:outline-none focus:ring-2 focus:ring-primary/40"
+            />
+          </div>
+        )}
+
         {loading ? (
           <div className="text-center py-20">
             <div className="w-8 h-8 border-2 border-primary border-t-transparent rounded-full animate-spin mx-auto mb-4" />
@@ -112,12 +176,14 @@ const ScanHistory = () => {
               Start Scanning
             </button>
           </motion.div>
+        ) : visibleItems.length === 0 ? (
+          <p className="text-center text-muted-foreground text-sm py-20">No scans match &ldquo;{query.trim()}&rdquo;.</p>
         ) : (
           <div className="relative">
             <div className="absolute left-5 top-0 bottom-0 w-px bg-border" />
 
             <AnimatePresence>
-              {items.map((item, idx) => (
+              {visibleItems.map((item, idx) => (
                 <motion.div
                   key={item.id}
                   initial={{ opacity: 0, x: -20 }}
@@ -154,7 +220,7 @@ const ScanHistory = () => {
                     </div>
 
                     <button
-                      onClick={() => setExpandedId(expandedId === item.id ? null : item.id)}
+                      onClick={() => handleExpand(item.id)}
                       className="flex items-center gap-1 text-secondary text-xs font-display font-semibold hover:underline"
                     >
                       Details
@@ -174,6 +240,18 @@ const ScanHistory = () => {
                 </motion.div>
               ))}
             </AnimatePresence>
+
+            {nextBefore && searchResults === null && (
+              <div className="relative pl-14">
+                <button
+                  onClick={handleLoadMore}
+                  disabled={loadingMore}
+                  className="px-6 py-2.5 bg-card border border-border text-foreground font-display font-semibold rounded-xl text-sm hover:bg-muted transition-colors disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -27,10 +27,13 @@ function ScanUploadContent() {
   const [capturedImage, setCapturedImage] = useState<string | null>(null);
 
   const fileInputRef = useRef<HTMLInputElement>(null);
+  // In-flight analyze request, aborted if the user leaves so the server stops the scan
+  const analyzeAbortRef = useRef<AbortController | null>(null);
 
-  // Cleanup camera stream on unmount
+  // Cleanup camera stream and any running analysis on unmount
   useEffect(() => {
     return () => {
+      analyzeAbortRef.current?.abort();
       if (streamRef.current) {
         streamRef.current.getTracks().forEach((t) => t.stop());
       }
@@ -174,7 +177,9 @@ function ScanUploadContent() {
       formData.append("language", lang);
 
       const endpoint = type === "prescription" ? "/api/analyze/prescription" : "/api/analyze/medicine";
-      const res = await fetch(endpoint, { method: "POST", credentials: "include", body: formData });
+      const controller = new AbortController();
+      analyzeAbortRef.current = controller;
+      const res = await fetch(endpoint, { method: "POST", credentials: "include", body: formData, signal: controller.signal });
       const data = await res.json();
 
       if (!res.ok || data.error) {
@@ -192,6 +197,7 @@ function ScanUploadContent() {
         router.push("/result/medicine");
       }
     } catch (err: any) {
+      if (err?.name === "AbortError") return; // left the page
       setError(err.message || "Network error. Is the Python server running?");
       setAnalyzing(false);
     }
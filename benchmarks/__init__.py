@@ -0,0 +1 @@
+# benchmarks — offline performance harnesses for the Sanjeevani backend
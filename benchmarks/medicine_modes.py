@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/medicine_modes.py — fused vs two-stage medicine analysis
+"""
+Run analyze_medicine_image in both modes over a set of strip photos and compare
+latency, model calls, fused fallbacks and field accuracy:
+
+    python -m benchmarks.medicine_modes --llm-latency 0.8
+    python -m benchmarks.medicine_modes --images photos/ --labels photos/labels.json --backend replay:session.json
+
+``--labels`` is a JSON object keyed by image file name, each value holding the expected
+``medicine_name``, ``active_salts``, ``dosage_strength`` and/or ``is_high_dosage``.
+Without labels, the two-stage answer is the reference and fused mode is scored
+against it (agreement rather than accuracy).
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+os.environ.setdefault("API_KEY", "offline-benchmark")
+os.environ.setdefault("SANJEEVANI_TTS_CACHE_MB", "0")
+os.environ.setdefault("SANJEEVANI_TRANSLATION_CACHE_MB", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from metrics import collect_stages, counters  # noqa: E402
+from benchmarks.stub_backend import RecordingBackend, ReplayBackend, install  # noqa: E402
+from benchmarks.pipeline import DEFAULT_IMAGE, _make_backend, _percentile  # noqa: E402
+
+MODES = ("two-stage", "fused")
+FIELDS = ("medicine_name", "active_salts", "dosage_strength", "is_high_dosage")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif")
+# Stages that are one Groq chat call each
+LLM_STAGES = ("vision_ocr", "vision_analysis", "analysis", "translate")
+
+
+def _norm(text) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(text).lower()).strip()
+
+
+def _salts(value) -> set[str]:
+    items = value.split(",") if isinstance(value, str) else (value or [])
+    return {_norm(item) for item in items if _norm(item)}
+
+
+def field_scores(result: dict, expected: dict) -> dict[str, float]:
+    """0..1 score per labelled field: name containment, salt Jaccard, exact strength and flag."""
+    scores = {}
+    for field in FIELDS:
+        if field not in expected:
+            continue
+        got, want = result.get(field), expected[field]
+        if field == "medicine_name":
+            got, want = _norm(got), _norm(want)
+            scores[field] = float(bool(got) and (want in got or got in want))
+        elif field == "active_salts":
+            got, want = _salts(got), _salts(want)
+            scores[field] = len(got & want) / len(got | want) if got | want else 1.0
+        elif field == "dosage_strength":
+            scores[field] = float(_norm(got).replace(" ", "") == _norm(want).replace(" ", ""))
+        else:
+            scores[field] = float(bool(got) == bool(want))
+    return scores
+
+
+def _images(paths: list[str]) -> list[str]:
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            found.append(path)
+    return found
+
+
+def run_mode(mode: str, images: dict[str, bytes], language: str, runs: int) -> tuple[dict, dict[str, dict]]:
+    """(summary, last result per image) for ``runs`` passes over ``images`` in one mode."""
+    import ai_engine
+
+    latencies, llm_calls, errors = [], 0, 0
+    results: dict[str, dict] = {}
+    before = counters()
+    for _ in range(runs):
+        for name, image in images.items():
+            with collect_stages() as stages:
+                start = time.perf_counter()
+                data, _ = ai_engine.analyze_medicine_image(image, target_language=language, mode=mode)
+                latencies.append(time.perf_counter() - start)
+            llm_calls += sum(1 for s in stages if s["stage"] in LLM_STAGES)
+            errors += "error" in data
+            results[name] = data
+    after = counters()
+    attempts = runs * len(images)
+    fallbacks = after.get("medicine.fused_fallback", 0) - before.get("medicine.fused_fallback", 0)
+    return {
+        "requests": attempts,
+        "errors": errors,
+        "p50_s": round(_percentile(latencies, 50), 4),
+        "p95_s": round(_percentile(latencies, 95), 4),
+        "llm_calls_per_request": round(llm_calls / attempts, 2),
+        "fallback_rate": round(fallbacks / attempts, 3) if mode == "fused" else None,
+    }, results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare fused and two-stage medicine analysis.")
+    parser.add_argument("--images", nargs="+", default=[DEFAULT_IMAGE], help="image files or directories")
+    parser.add_argument("--labels", metavar="FILE", help="expected fields per image file name (JSON)")
+    parser.add_argument("--backend", default="stub", help="stub | replay:<file> | record:<file>")
+    parser.add_argument("--language", default="English", help="target language name")
+    parser.add_argument("--runs", type=int, default=3, help="passes over the image set per mode")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="synthetic seconds per Groq call")
+    parser.add_argument("--tts-latency", type=float, default=0.0, help="synthetic seconds per Edge TTS call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--recorded-latency", action="store_true", help="replay recorded Groq round-trip times")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline log output")
+    args = parser.parse_args(argv)
+
+    images = {}
+    for path in _images(args.images):
+        with open(path, "rb") as f:
+            images[os.path.basename(path)] = f.read()
+    if not images:
+        parser.error("no images found")
+    labels = {}
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            labels = json.load(f)
+
+    backend = _make_backend(args.backend, args)
+    report: dict = {"images": len(images), "labelled": bool(labels), "modes": {}}
+    answers: dict[str, dict[str, dict]] = {}
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with install(backend), quiet:
+        for mode in MODES:
+            report["modes"][mode], answers[mode] = run_mode(mode, images, args.language, args.runs)
+
+    # Accuracy against labels, or fused agreement with the two-stage answer
+    for mode in MODES if labels else ("fused",):
+        per_field: dict[str, list[float]] = {}
+        for name, result in answers[mode].items():
+            expected = labels.get(name) if labels else answers["two-stage"].get(name, {})
+            for field, score in field_scores(result, expected or {}).items():
+                per_field.setdefault(field, []).append(score)
+        report["modes"][mode]["accuracy" if labels else "agreement"] = {
+            field: round(sum(s) / len(s), 3) for field, s in per_field.items()
+        }
+
+    if isinstance(backend, RecordingBackend):
+        backend.save()
+    if isinstance(backend, ReplayBackend) and backend.misses:
+        print(f"[WARN] {backend.misses} requests were not in the recording and used stub responses")
+
+    print(f"{'mode':<12}{'p50':>9}{'p95':>9}{'llm/req':>9}{'fallback':>10}{'errors':>8}")
+    for mode, r in report["modes"].items():
+        fallback = "-" if r["fallback_rate"] is None else f"{r['fallback_rate']:.0%}"
+        print(f"{mode:<12}{r['p50_s']:>9.3f}{r['p95_s']:>9.3f}{r['llm_calls_per_request']:>9.2f}"
+              f"{fallback:>10}{r['errors']:>8}")
+        scores = r.get("accuracy") or r.get("agreement")
+        if scores:
+            kind = "accuracy" if "accuracy" in r else "agreement with two-stage"
+            print(f"    {kind}: " + ", ".join(f"{k}={v:.2f}" for k, v in scores.items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/ocr_escalation.py — image bytes and accuracy of draft-first OCR
+"""
+Run the OCR stage over strip and prescription photos twice: once with a single
+full-resolution read (SANJEEVANI_OCR_ESCALATION=0 behaviour) and once with draft-first
+escalation. Report vision requests, image bytes and prompt tokens per scan, the
+escalation rate and how closely the final transcript matches the full-resolution one:
+
+    python -m benchmarks.ocr_escalation
+    python -m benchmarks.ocr_escalation --images photos/*.jpg --backend replay:session.json
+
+The default stub reads printed strips at any size but only returns a partial,
+"[illegible]" transcript of a handwritten prescription from a draft-sized image, so
+both the cheap path and the escalation path are exercised offline. Use a recorded or
+live backend for real accuracy numbers.
+"""
+import io
+import os
+import sys
+import base64
+import difflib
+import argparse
+import contextlib
+
+os.environ.setdefault("API_KEY", "offline-benchmark")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from metrics import counters  # noqa: E402
+from benchmarks.stub_backend import (  # noqa: E402
+    STUB_PRESCRIPTION_OCR, StubBackend, RecordingBackend, ReplayBackend, install, _make_response, _message_text,
+)
+from benchmarks.pipeline import _make_backend, _percentile  # noqa: E402
+from benchmarks.preprocess import DEFAULT_CORPUS_DIR, build_corpus  # noqa: E402
+
+COUNTERS = ("vision.requests", "vision.image_bytes", "vision.prompt_tokens", "vision.ocr_escalated")
+
+
+class ResolutionStub(StubBackend):
+    """StubBackend whose handwriting OCR degrades on images no bigger than the draft size."""
+
+    async def _create(self, **kwargs):
+        import ai_engine
+        from PIL import Image
+
+        system, user, has_image = _message_text(kwargs.get("messages", []))
+        if has_image and "prescription" in system.lower():
+            url = next(part["image_url"]["url"] for msg in kwargs["messages"] if isinstance(msg["content"], list)
+                       for part in msg["content"] if part.get("type") == "image_url")
+            size = Image.open(io.BytesIO(base64.b64decode(url.split(",", 1)[1]))).size
+            if max(size) <= ai_engine.OCR_DRAFT_DIM:
+                lines = STUB_PRESCRIPTION_OCR.splitlines()
+                partial = "\n".join(line if i % 2 else "[illegible]" for i, line in enumerate(lines))
+                return _make_response(partial, len(system) + len(user))
+        return await super()._create(**kwargs)
+
+
+def run_strategy(escalate: bool, images: dict[str, tuple[bytes, str]], runs: int) -> tuple[dict, dict[str, str]]:
+    """(summary, final transcript per image) for one strategy."""
+    import time
+    import ai_engine
+
+    ai_engine.OCR_ESCALATION = escalate
+    before = counters()
+    latencies, transcripts = [], {}
+    for _ in range(runs):
+        for name, (image, kind) in images.items():
+            system, user = ((ai_engine.PRESCRIPTION_OCR_SYSTEM, ai_engine.PRESCRIPTION_OCR_USER) if kind == "prescription"
+                            else (ai_engine.MEDICINE_OCR_INSTRUCTION, "Extract all visible text from this medicine image."))
+            start = time.perf_counter()
+            transcripts[name] = ai_engine._call_vision_model_freetext(image, system, user, kind)
+            latencies.append(time.perf_counter() - start)
+    after = counters()
+    scans = runs * len(images)
+    delta = {key: after.get(key, 0) - before.get(key, 0) for key in COUNTERS}
+    return {
+        "scans": scans,
+        "requests_per_scan": round(delta["vision.requests"] / scans, 2),
+        "image_kb_per_scan": round(delta["vision.image_bytes"] / scans / 1024, 1),
+        "prompt_tokens_per_scan": round(delta["vision.prompt_tokens"] / scans),
+        "escalation_rate": round(delta["vision.ocr_escalated"] / scans, 3) if escalate else None,
+        "p50_s": round(_percentile(latencies, 50), 3),
+        "p95_s": round(_percentile(latencies, 95), 3),
+    }, transcripts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare single-shot and draft-first OCR.")
+    parser.add_argument("--images", nargs="*", help="photos (names containing 'prescription' or 'rx' are read as prescriptions)")
+    parser.add_argument("--backend", default="resolution-stub", help="resolution-stub | stub | replay:<file> | record:<file>")
+    parser.add_argument("--runs", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="synthetic seconds per Groq call")
+    parser.add_argument("--tts-latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--recorded-latency", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="show pipeline log output")
+    args = parser.parse_args(argv)
+
+    paths = args.images or [os.path.join(ROOT, "test_medicine.jpg")] + build_corpus(
+        DEFAULT_CORPUS_DIR, ("strip", "prescription"), (4, 12), ("jpeg",))
+    images = {}
+    for path in paths:
+        name = os.path.basename(path)
+        kind = "prescription" if "prescription" in name.lower() or "rx" in name.lower() else "medicine"
+        with open(path, "rb") as f:
+            images[name] = (f.read(), kind)
+
+    if args.backend == "resolution-stub":
+        backend = ResolutionStub(llm_latency=args.llm_latency, jitter=args.jitter, seed=args.seed)
+    else:
+        backend = _make_backend(args.backend, args)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with install(backend), quiet:
+        single, reference = run_strategy(False, images, args.runs)
+        draft_first, transcripts = run_strategy(True, images, args.runs)
+    agreement = [difflib.SequenceMatcher(None, reference[name], transcripts[name]).ratio() for name in images]
+    draft_first["agreement_min"] = round(min(agreement), 3)
+    draft_first["agreement_mean"] = round(sum(agreement) / len(agreement), 3)
+
+    if isinstance(backend, RecordingBackend):
+        backend.save()
+    if isinstance(backend, ReplayBackend) and backend.misses:
+        print(f"[WARN] {backend.misses} requests were not in the recording and used stub responses")
+
+    print(f"{'strategy':<14}{'req/scan':>10}{'KB/scan':>10}{'tokens':>9}{'escalated':>11}{'p50':>8}{'p95':>8}")
+    for title, r in (("full-res", single), ("draft-first", draft_first)):
+        escalated = "-" if r["escalation_rate"] is None else f"{r['escalation_rate']:.0%}"
+        print(f"{title:<14}{r['requests_per_scan']:>10.2f}{r['image_kb_per_scan']:>10.1f}{r['prompt_tokens_per_scan']:>9}"
+              f"{escalated:>11}{r['p50_s']:>8.3f}{r['p95_s']:>8.3f}")
+    saved = 1 - draft_first["image_kb_per_scan"] / single["image_kb_per_scan"] if single["image_kb_per_scan"] else 0.0
+    print(f"\nimage bytes saved: {saved:.0%}; transcript agreement with full-res: "
+          f"mean {draft_first['agreement_mean']:.3f}, worst {draft_first['agreement_min']:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/passwords.py — login throughput at the configured KDF cost
+"""
+Measure how many logins one core can verify with the current scrypt/PBKDF2 parameters,
+then drive authenticate_user from many threads through the bounded KDF pool:
+
+    python -m benchmarks.passwords
+    SANJEEVANI_SCRYPT_N=32768 python -m benchmarks.passwords --logins 200 --threads 32
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Password verification throughput benchmark.")
+    parser.add_argument("--hashes", type=int, default=30, help="single-thread KDF runs for the per-core figure")
+    parser.add_argument("--logins", type=int, default=100, help="distinct users logging in through authenticate_user")
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("SANJEEVANI_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="sanjeevani-pwbench-"), "bench.db"))
+    os.environ.setdefault("SANJEEVANI_KDF_MAX_PENDING", str(max(args.threads, 64)))
+    import db
+    import passwords
+
+    kdf = (f"scrypt n={passwords.SCRYPT_N} r={passwords.SCRYPT_R} p={passwords.SCRYPT_P} "
+           f"({128 * passwords.SCRYPT_N * passwords.SCRYPT_R // 1_048_576} MiB)" if passwords.HAS_SCRYPT
+           else f"pbkdf2_sha256 iterations={passwords.PBKDF2_ITERATIONS}")
+    print(f"KDF: {kdf}, pool workers: {passwords.KDF_WORKERS}, CPUs: {os.cpu_count()}")
+
+    stored = passwords._hash_now("bench-password")
+    start = time.process_time()
+    for _ in range(args.hashes):
+        passwords._verify_now("bench-password", stored)
+    per_hash = (time.process_time() - start) / args.hashes
+    print(f"one verification: {per_hash * 1000:.1f} ms CPU  ->  {1 / per_hash:.1f} logins/s per core")
+
+    for i in range(args.logins):
+        db.register_user(f"bench_user_{i}", "bench-password")
+
+    def _login(i: int):
+        ok, _ = db.authenticate_user(f"bench_user_{i % args.logins}", "bench-password")
+        assert ok
+
+    def _run(count: int) -> float:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(_login, range(count)))
+        return time.perf_counter() - start
+
+    # Registration primed the verified cache: empty it so every user's first login runs the KDF
+    passwords._verified.clear()
+    cpu_start = time.process_time()
+    wall = _run(args.logins)
+    print(f"{'KDF (cold cache)':<18} {args.logins / wall:10.1f} logins/s   "
+          f"({(time.process_time() - cpu_start) / args.logins * 1000:.1f} ms CPU per login)")
+    wall = _run(args.logins * 10)
+    print(f"{'verified cache':<18} {args.logins * 10 / wall:10.1f} logins/s")
+    print("sizing: logins/s per core x cores given to SANJEEVANI_KDF_WORKERS = peak cold logins/s per node")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
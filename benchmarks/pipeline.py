@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/pipeline.py — offline end-to-end benchmark of the analysis pipeline
+"""
+Drive analyze_medicine_image / analyze_prescription_image and the Flask analyze
+endpoints at a fixed concurrency against a stub or replayed Groq/Edge TTS backend.
+
+    python -m benchmarks.pipeline --requests 40 --concurrency 8 --llm-latency 0.2
+    python -m benchmarks.pipeline --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline --baseline benchmarks/baseline.json   # exit 1 on regression
+
+Record a live session once (needs API_KEY and network), then replay it offline:
+
+    python -m benchmarks.pipeline --backend record:session.json --requests 2 --concurrency 1
+    python -m benchmarks.pipeline --backend replay:session.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+# The stub and replay backends stand in for the Groq client, so no API key is needed
+# (recording still reads the real one). The database is only opened when the endpoints
+# first touch it; keep that in a throwaway file rather than the working copy's.
+os.environ.setdefault("SANJEEVANI_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="sanjeevani-bench-"), "bench.db"))
+# The harness is a single anonymous client: measure the pipeline, not the rate limiter.
+os.environ.setdefault("SANJEEVANI_IP_SCANS_PER_MIN", "0")
+os.environ.setdefault("SANJEEVANI_USER_SCANS_PER_MIN", "0")
+# Every request repeats the same text, so the TTS and translation caches would hide the
+# synthesis and translation cost; run with SANJEEVANI_TTS_CACHE_MB=256 and
+# SANJEEVANI_TRANSLATION_CACHE_MB=32 to measure the warm-cache path instead.
+os.environ.setdefault("SANJEEVANI_TTS_CACHE_MB", "0")
+os.environ.setdefault("SANJEEVANI_TRANSLATION_CACHE_MB", "0")
+# Likewise every request sends the same image, which single-flight would coalesce into
+# one run; --duplicates turns it back on with a distinct image per logical request.
+os.environ.setdefault("SANJEEVANI_SINGLE_FLIGHT", "0")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from metrics import collect_stages, counters  # noqa: E402
+from benchmarks.stub_backend import StubBackend, RecordingBackend, ReplayBackend, install  # noqa: E402
+
+TARGETS = ("medicine", "prescription", "http-medicine", "http-prescription")
+DEFAULT_IMAGE = os.path.join(ROOT, "test_medicine.jpg")
+
+# Metrics compared against a saved baseline (lower is better for all of them)
+REGRESSION_KEYS = ("p50_s", "p95_s", "cpu_per_request_s")
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _make_backend(spec: str, args):
+    latency = dict(llm_latency=args.llm_latency, tts_latency=args.tts_latency, jitter=args.jitter, seed=args.seed)
+    kind, _, path = spec.partition(":")
+    if kind == "stub":
+        return StubBackend(**latency)
+    if kind == "replay":
+        return ReplayBackend(path, recorded_latency=args.recorded_latency, **latency)
+    if kind == "record":
+        import ai_engine
+        return RecordingBackend(ai_engine._make_client(), path, **latency)
+    raise SystemExit(f"Unknown backend '{spec}' (use stub, replay:<file> or record:<file>)")
+
+
+def _make_call(target: str, language: str):
+    """Return a callable that sends one request with the given image and returns True on success."""
+    if target in ("medicine", "prescription"):
+        import ai_engine
+        fn = ai_engine.analyze_medicine_image if target == "medicine" else ai_engine.analyze_prescription_image
+
+        def _call(image_bytes: bytes):
+            data, _ = fn(image_bytes, target_language=language)
+            return "error" not in data
+        return _call
+
+    import server
+    from server import LANG_CODE_MAP
+    lang_code = next((code for code, name in LANG_CODE_MAP.items() if name == language), "en")
+    endpoint = "/api/analyze/medicine" if target == "http-medicine" else "/api/analyze/prescription"
+
+    def _call(image_bytes: bytes):
+        with server.app.test_client() as http:
+            resp = http.post(
+                endpoint,
+                data={"image": (io.BytesIO(image_bytes), "scan.jpg"), "language": lang_code},
+                content_type="multipart/form-data",
+            )
+            return resp.status_code == 200
+    return _call
+
+
+def run_target(target: str, image_bytes: bytes, language: str, requests: int, concurrency: int,
+               duplicates: int = 1) -> dict:
+    """
+    Run ``requests`` calls of one target at the given concurrency and summarise them. With
+    ``duplicates`` > 1, each distinct image is sent that many times back to back (a
+    double-tapped upload), so concurrent copies can be coalesced.
+    """
+    call = _make_call(target, language)
+
+    def _one(i):
+        # Trailing bytes after the image data are ignored by the decoders but change the hash
+        image = image_bytes if duplicates == 1 else image_bytes + f"\0{target}-{i // duplicates}".encode()
+        with collect_stages() as stages:
+            start = time.perf_counter()
+            ok = call(image)
+            latency = time.perf_counter() - start
+        return ok, latency, stages
+
+    call(image_bytes)  # warm-up: imports, CLAHE/denoise kernels, Flask app context
+    deduped_before = counters().get("singleflight.deduped", 0)
+
+    # Work is spread over caller threads, the engine loop and the CPU pool, so
+    # per-request CPU is the whole process' CPU time divided by the request count.
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_one, range(requests)))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    latencies = [r[1] for r in results]
+    per_stage: dict[str, dict[str, float]] = {}
+    for _, _, stages in results:
+        for s in stages:
+            agg = per_stage.setdefault(s["stage"], {"calls": 0, "cpu_s": None, "wall_s": 0.0})
+            agg["calls"] += 1
+            if s["cpu_s"] is not None:  # None: a remote call, timed on the wall clock only
+                agg["cpu_s"] = (agg["cpu_s"] or 0.0) + s["cpu_s"]
+            agg["wall_s"] += s["wall_s"]
+    for agg in per_stage.values():
+        cpu_s = agg.pop("cpu_s")
+        agg["cpu_per_request_s"] = round(cpu_s / requests, 6) if cpu_s is not None else None
+        agg["wall_per_request_s"] = round(agg.pop("wall_s") / requests, 6)
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(1 for r in results if not r[0]),
+        "throughput_rps": round(requests / wall, 3) if wall else 0.0,
+        "p50_s": round(_percentile(latencies, 50), 6),
+        "p95_s": round(_percentile(latencies, 95), 6),
+        "p99_s": round(_percentile(latencies, 99), 6),
+        "cpu_per_request_s": round(cpu / requests, 6),
+        "deduped": counters().get("singleflight.deduped", 0) - deduped_before,
+        "stages": per_stage,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return human-readable regressions of ``report`` against ``baseline``."""
+    problems = []
+    for target, current in report["targets"].items():
+        base = baseline.get("targets", {}).get(target)
+        if not base:
+            continue
+        for key in REGRESSION_KEYS:
+            if base.get(key) and current[key] > base[key] * (1 + tolerance):
+                problems.append(f"{target}.{key}: {current[key]:.4f}s vs baseline {base[key]:.4f}s")
+        for name, stage in current["stages"].items():
+            base_stage = base.get("stages", {}).get(name)
+            if base_stage and base_stage["cpu_per_request_s"] and stage["cpu_per_request_s"] is not None and \
+                    stage["cpu_per_request_s"] > base_stage["cpu_per_request_s"] * (1 + tolerance):
+                problems.append(
+                    f"{target}.stages.{name}.cpu_per_request_s: {stage['cpu_per_request_s']:.4f}s "
+                    f"vs baseline {base_stage['cpu_per_request_s']:.4f}s"
+                )
+    return problems
+
+
+def _print_report(report: dict):
+    print(f"\n{'target':<20}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'cpu/req':>10}{'errors':>8}")
+    for target, r in report["targets"].items():
+        print(f"{target:<20}{r['throughput_rps']:>9.2f}{r['p50_s']:>10.4f}{r['p95_s']:>10.4f}"
+              f"{r['p99_s']:>10.4f}{r['cpu_per_request_s']:>10.4f}{r['errors']:>8}")
+        if r.get("deduped"):
+            print(f"    coalesced duplicates: {r['deduped']} of {r['requests']} requests")
+        for name, s in sorted(r["stages"].items()):
+            cpu = f"{s['cpu_per_request_s']:.4f}s" if s["cpu_per_request_s"] is not None else "-"
+            print(f"    {name:<24}calls={s['calls']:<5} cpu/req={cpu:<8}"
+                  f"wall/req={s['wall_per_request_s']:.4f}s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the Sanjeevani analysis pipeline.")
+    parser.add_argument("--backend", default="stub", help="stub | replay:<file> | record:<file>")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="image file sent with every request")
+    parser.add_argument("--language", default="Hindi", help="target language name, e.g. English, Hindi, Tamil")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duplicates", type=int, default=1,
+                        help="send each distinct image N times back to back, with single-flight on")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="synthetic seconds per Groq call")
+    parser.add_argument("--tts-latency", type=float, default=0.0, help="synthetic seconds per Edge TTS call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative +/- latency jitter, e.g. 0.2")
+    parser.add_argument("--recorded-latency", action="store_true", help="replay recorded Groq round-trip times")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", metavar="FILE", help="write the report as a baseline JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a baseline JSON and fail on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline log output")
+    args = parser.parse_args(argv)
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+
+    if args.duplicates > 1:
+        import ai_engine
+        ai_engine.SINGLE_FLIGHT = True
+
+    backend = _make_backend(args.backend, args)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "baseline", "verbose")},
+        "targets": {},
+    }
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with install(backend), quiet:
+        for target in targets:
+            report["targets"][target] = run_target(target, image_bytes, args.language, args.requests, args.concurrency,
+                                                   args.duplicates)
+
+    if isinstance(backend, RecordingBackend):
+        backend.save()
+    if isinstance(backend, ReplayBackend) and backend.misses:
+        print(f"[WARN] {backend.misses} requests were not in the recording and used stub responses")
+
+    _print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(report, baseline, args.tolerance)
+        if problems:
+            print(f"\nREGRESSIONS (tolerance {args.tolerance:.0%}):")
+            for p in problems:
+                print(f"  - {p}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/preprocess.py — per-stage microbenchmarks for ai_engine._preprocess_image
+"""
+Generate (or load) a corpus of synthetic medicine-strip and prescription photos in
+JPEG, PNG, WebP and HEIC at 1–48 MP, run _preprocess_image on each one in a fresh
+child process and report per-stage CPU time, peak memory and output size.
+
+    python -m benchmarks.preprocess                              # full corpus
+    python -m benchmarks.preprocess --mp 1,12 --formats jpeg,heic --save before.json
+    python -m benchmarks.preprocess --corpus-dir ~/photos --save real.json   # your own images
+    python -m benchmarks.preprocess --compare before.json after.json         # side by side
+"""
+import io
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import contextlib
+import multiprocessing
+
+os.environ.setdefault("API_KEY", "offline-benchmark")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DEFAULT_CORPUS_DIR = os.path.join(ROOT, "benchmarks", ".corpus")
+RESOLUTIONS_MP = (1, 4, 12, 24, 48)
+KINDS = ("strip", "prescription")
+# name → (PIL format, extension, save options)
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg", {"quality": 90}),
+    "png": ("PNG", ".png", {"compress_level": 6}),
+    "webp": ("WEBP", ".webp", {"quality": 85}),
+    "heic": ("HEIF", ".heic", {"quality": 85}),
+}
+STAGES = ("decode", "convert", "resize", "grayscale", "clahe", "denoise", "threshold", "encode", "fallback")
+
+_STRIP_LINES = ["DOLO-650", "Paracetamol Tablets IP 650 mg", "Mfd. by Micro Labs Ltd.",
+                "B.No. DOBS3975   EXP. 01/2028", "Store below 25°C"]
+_RX_LINES = ["Dr. A. Sharma  MBBS, MD", "Pt. Ramesh Kumar   45/M   12/03/25", "Rx",
+             "1. Tab Augmentin 625   1-0-1 x 5d  PC", "2. Tab Dolo 650   1-1-1 x 3d SOS",
+             "3. Cap Pan 40   1-0-0 x 7d  AC", "4. Syp Ascoril 10ml  TDS x 5d", "Review after 5 days"]
+
+
+# ─── Corpus ──────────────────────────────────────────────────
+def _dimensions(megapixels: float) -> tuple[int, int]:
+    """4:3 landscape dimensions for the requested megapixel count."""
+    width = int(math.sqrt(megapixels * 1_000_000 * 4 / 3))
+    return width, int(width * 3 / 4)
+
+
+def _font(size: int):
+    from PIL import ImageFont
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has no sized default font
+        return ImageFont.load_default()
+
+
+def synthesize(kind: str, megapixels: float, seed: int = 0):
+    """Render a synthetic strip or prescription photo as a PIL RGB image."""
+    from PIL import Image, ImageDraw
+
+    w, h = _dimensions(megapixels)
+    if kind == "strip":
+        img = Image.new("RGB", (w, h), (196, 200, 206))  # foil
+        draw = ImageDraw.Draw(img)
+        pocket = h // 5
+        for row in range(2):
+            for col in range(5):
+                cx, cy = (col + 0.5) * w / 5, h * (0.3 + 0.4 * row)
+                draw.ellipse([cx - pocket / 2, cy - pocket / 2, cx + pocket / 2, cy + pocket / 2],
+                             fill=(225, 228, 232), outline=(150, 150, 160), width=max(1, w // 800))
+        lines, ink, y = _STRIP_LINES, (20, 60, 140), h * 0.04
+    else:
+        img = Image.new("RGB", (w, h), (246, 242, 230))  # paper
+        draw = ImageDraw.Draw(img)
+        step = h // 16
+        for y_rule in range(step, h, step):
+            draw.line([(0, y_rule), (w, y_rule)], fill=(205, 215, 235), width=max(1, w // 1500))
+        lines, ink, y = _RX_LINES, (25, 35, 110), h * 0.05
+
+    font = _font(max(10, h // 22))
+    for i, line in enumerate(lines):
+        draw.text((w * 0.05 + (i % 3) * w * 0.01, y), line, fill=ink, font=font)
+        y += h / (len(lines) + 2)
+
+    # Sensor noise and uneven lighting so the codecs and the denoiser see realistic input
+    noise = Image.effect_noise((w, h), 18 + seed % 5).convert("RGB")
+    img = Image.blend(img, noise, 0.08)
+    shade = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    return Image.blend(img, shade, 0.12)
+
+
+def build_corpus(corpus_dir: str, kinds, resolutions, formats) -> list[str]:
+    """Create any missing corpus files and return their paths."""
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = []
+    for kind in kinds:
+        for mp in resolutions:
+            img = None
+            for fmt in formats:
+                pil_format, ext, options = FORMATS[fmt]
+                path = os.path.join(corpus_dir, f"{kind}_{mp:g}mp{ext}")
+                if not os.path.exists(path):
+                    if img is None:
+                        print(f"  generating {kind} {mp:g} MP ...", flush=True)
+                        img = synthesize(kind, mp)
+                    img.save(path, format=pil_format, **options)
+                paths.append(path)
+    return paths
+
+
+def load_corpus(corpus_dir: str) -> list[str]:
+    """All image files in a user-supplied corpus directory."""
+    exts = {ext for _, ext, _ in FORMATS.values()} | {".jpeg", ".heif"}
+    return sorted(
+        os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir)
+        if os.path.splitext(name)[1].lower() in exts
+    )
+
+
+# ─── Measurement ─────────────────────────────────────────────
+def _status_kb(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> int | None:
+    """Reset the kernel's RSS high-water mark (Linux) and return the current RSS in bytes."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    current = _status_kb("VmRSS")
+    return current * 1024 if current is not None else None
+
+
+def _peak_rss_bytes() -> int | None:
+    hwm = _status_kb("VmHWM")
+    if hwm is not None:
+        return hwm * 1024
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(path: str, repeat: int) -> dict:
+    """Runs in a fresh child process so peak RSS belongs to this one image."""
+    import tracemalloc
+    from metrics import collect_stages
+    with contextlib.redirect_stdout(io.StringIO()):
+        import ai_engine
+        ai_engine.init()  # load the imaging libraries up front, as a warmed-up server has
+
+    rss_before = _reset_peak_rss() or _peak_rss_bytes()
+    runs = []
+    for i in range(repeat):
+        if i == 0:
+            tracemalloc.start()
+        with collect_stages() as stages, contextlib.redirect_stdout(io.StringIO()):
+            cpu_start = time.thread_time()
+            wall_start = time.perf_counter()
+            # An open file, as the server passes its spooled upload; the peak includes reading it
+            with open(path, "rb") as image_file:
+                output, mime = ai_engine._preprocess_image(image_file)
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+        if i == 0:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        runs.append({"cpu_s": cpu, "wall_s": wall, "stages": {s["stage"].split(".", 1)[-1]: s["cpu_s"] for s in stages}})
+    rss_after = _peak_rss_bytes()
+
+    def _median(values):
+        values = sorted(values)
+        return values[len(values) // 2] if values else 0.0
+
+    stage_names = {name for run in runs for name in run["stages"]}
+    return {
+        "file": os.path.basename(path),
+        "input_bytes": os.path.getsize(path),
+        "output_bytes": len(output),
+        "output_mime": mime,
+        "fallback": "fallback" in stage_names,
+        "cpu_s": round(_median([r["cpu_s"] for r in runs]), 6),
+        "wall_s": round(_median([r["wall_s"] for r in runs]), 6),
+        "stages_cpu_s": {name: round(_median([r["stages"].get(name, 0.0) for r in runs]), 6) for name in stage_names},
+        "traced_peak_bytes": traced_peak,
+        "rss_peak_delta_bytes": (rss_after - rss_before) if rss_before is not None else None,
+    }
+
+
+def run(paths: list[str], repeat: int) -> list[dict]:
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for path in paths:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(_measure, (path, repeat)))
+        _print_row(results[-1])
+    return results
+
+
+# ─── Reporting ───────────────────────────────────────────────
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f}"
+
+
+def _mb(value: int | None) -> str:
+    return f"{value / 1_048_576:8.1f}" if value is not None else "     n/a"
+
+
+def _print_header():
+    stage_cols = "".join(f"{name[:8]:>9}" for name in STAGES[:-1])
+    print(f"{'file':<26}{stage_cols}{'total':>9}{'traceMB':>9}{'rssMB':>9}{'outKB':>8}")
+
+
+def _print_row(r: dict):
+    stage_cols = "".join(f" {_ms(r['stages_cpu_s'].get(name, 0.0))}" for name in STAGES[:-1])
+    flag = "  (fallback)" if r["fallback"] else ""
+    print(f"{r['file']:<26}{stage_cols} {_ms(r['cpu_s'])} {_mb(r['traced_peak_bytes'])} "
+          f"{_mb(r['rss_peak_delta_bytes'])}{r['output_bytes'] / 1024:8.0f}{flag}", flush=True)
+
+
+def compare(before_path: str, after_path: str):
+    """Print two saved reports side by side (CPU ms, peak RSS MB, output KB)."""
+    with open(before_path, encoding="utf-8") as f:
+        before = {r["file"]: r for r in json.load(f)["results"]}
+    with open(after_path, encoding="utf-8") as f:
+        after = {r["file"]: r for r in json.load(f)["results"]}
+
+    print(f"{'file':<26}{'cpu ms':>18}{'Δ':>8}{'rss MB':>18}{'Δ':>8}{'out KB':>16}")
+    for name in sorted(set(before) & set(after)):
+        a, b = before[name], after[name]
+        cpu_delta = (b["cpu_s"] - a["cpu_s"]) / a["cpu_s"] * 100 if a["cpu_s"] else 0.0
+        ra, rb = a.get("rss_peak_delta_bytes"), b.get("rss_peak_delta_bytes")
+        rss_delta = f"{(rb - ra) / ra * 100:+7.0f}%" if ra and rb is not None else "     n/a"
+        print(f"{name:<26}{a['cpu_s'] * 1000:9.1f}{b['cpu_s'] * 1000:9.1f}{cpu_delta:+7.0f}%"
+              f"{_mb(ra)}{_mb(rb)}{rss_delta}{a['output_bytes'] / 1024:8.0f}{b['output_bytes'] / 1024:8.0f}")
+        stages = sorted(set(a["stages_cpu_s"]) | set(b["stages_cpu_s"]), key=lambda s: STAGES.index(s) if s in STAGES else 99)
+        for stage_name in stages:
+            sa, sb = a["stages_cpu_s"].get(stage_name, 0.0), b["stages_cpu_s"].get(stage_name, 0.0)
+            print(f"    {stage_name:<22}{sa * 1000:9.1f}{sb * 1000:9.1f}")
+    missing = set(before) ^ set(after)
+    if missing:
+        print(f"\n(only in one report: {', '.join(sorted(missing))})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of ai_engine._preprocess_image.")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR,
+                        help="where the synthetic corpus is cached, or a directory of your own images with --load")
+    parser.add_argument("--load", action="store_true", help="benchmark the existing images in --corpus-dir as-is")
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--mp", default=",".join(str(mp) for mp in RESOLUTIONS_MP), help="megapixel sizes, e.g. 1,12,48")
+    parser.add_argument("--formats", default=",".join(FORMATS), help=f"subset of {', '.join(FORMATS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per image; the median is reported")
+    parser.add_argument("--include-fallback", action="store_true", help="also time a truncated file that takes the raw fallback")
+    parser.add_argument("--save", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="print two saved reports side by side")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    if args.load:
+        paths = load_corpus(args.corpus_dir)
+    else:
+        formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+        resolutions = [float(mp) for mp in args.mp.split(",") if mp.strip()]
+        kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+        paths = build_corpus(args.corpus_dir, kinds, resolutions, formats)
+    if args.include_fallback and paths:
+        truncated = os.path.join(args.corpus_dir, "truncated.jpg")
+        with open(paths[0], "rb") as src, open(truncated, "wb") as dst:
+            dst.write(src.read()[:2048])
+        paths.append(truncated)
+    if not paths:
+        parser.error(f"no images found in {args.corpus_dir}")
+
+    print("CPU milliseconds per stage (median of runs); peak memory of the first run\n")
+    _print_header()
+    results = run(paths, args.repeat)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/quality_gate.py — accuracy and cost of the image-quality gate
+"""
+Run ai_engine.assess_image_quality over a labelled corpus and report, per label, how
+many photos the gate rejects, which reasons it gives, the false-reject rate on good
+photos and the time per check:
+
+    python -m benchmarks.quality_gate                               # synthetic corpus
+    python -m benchmarks.quality_gate --corpus-dir ~/photos         # reads ~/photos/labels.json
+    python -m benchmarks.quality_gate --set min_sharpness=80 --sweep max_glare=0.03,0.06,0.1
+
+A corpus directory holds images plus labels.json mapping each file name to the reasons
+it should be rejected for ([] for a usable photo), e.g. {"IMG_01.jpg": ["blurry"]}.
+The synthetic corpus degrades strip and prescription renders (and test_medicine.jpg)
+with blur, under/over-exposure, glare and blank frames.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+os.environ.setdefault("API_KEY", "offline-benchmark")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.pipeline import _percentile  # noqa: E402
+from benchmarks.preprocess import synthesize  # noqa: E402
+
+DEFAULT_CORPUS_DIR = os.path.join(ROOT, "benchmarks", ".corpus", "quality")
+SOURCE_MP = 3
+
+
+# ─── Corpus ──────────────────────────────────────────────────
+def _degrade(img, label: str):
+    """Apply one labelled defect to an RGB photo, then sensor noise as a real camera would."""
+    from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+    w, h = img.size
+    if label == "blurry":
+        img = img.filter(ImageFilter.GaussianBlur(radius=max(w, h) / 250))
+    elif label == "too_dark":
+        img = ImageEnhance.Brightness(img).enhance(0.18)
+    elif label == "overexposed":
+        img = ImageEnhance.Contrast(ImageEnhance.Brightness(img).enhance(2.6)).enhance(0.5)
+    elif label == "glare":
+        spot = Image.new("L", (w, h), 0)
+        ImageDraw.Draw(spot).ellipse([w * 0.3, h * 0.25, w * 0.75, h * 0.7], fill=255)
+        spot = spot.filter(ImageFilter.GaussianBlur(radius=max(w, h) / 80))
+        img = Image.composite(Image.new("RGB", (w, h), "white"), img, spot)
+    elif label == "no_text":
+        img = img.filter(ImageFilter.GaussianBlur(radius=max(w, h) / 20))  # an empty surface
+    noise = Image.effect_noise((w, h), 10).convert("RGB")
+    return Image.blend(img, noise, 0.04)
+
+
+def build_corpus(corpus_dir: str) -> str:
+    """Create the synthetic labelled corpus if it is missing; returns its directory."""
+    from PIL import Image
+
+    labels_path = os.path.join(corpus_dir, "labels.json")
+    if os.path.exists(labels_path):
+        return corpus_dir
+    os.makedirs(corpus_dir, exist_ok=True)
+    print("  generating labelled quality corpus ...", flush=True)
+    sources = {kind: synthesize(kind, SOURCE_MP, seed=i) for i, kind in enumerate(("strip", "prescription"))}
+    sources["medicine"] = Image.open(os.path.join(ROOT, "test_medicine.jpg")).convert("RGB")
+    labels = {}
+    for name, img in sources.items():
+        for label in ("good", "blurry", "too_dark", "overexposed", "glare", "no_text"):
+            file_name = f"{name}_{label}.jpg"
+            _degrade(img, label).save(os.path.join(corpus_dir, file_name), format="JPEG", quality=90)
+            labels[file_name] = [] if label == "good" else [label]
+    with open(labels_path, "w", encoding="utf-8") as f:
+        json.dump(labels, f, indent=2)
+    return corpus_dir
+
+
+# ─── Evaluation ──────────────────────────────────────────────
+def evaluate(corpus: dict[str, tuple[bytes, list[str]]], thresholds: dict) -> dict:
+    """Gate every photo once; summarise rejections per label and the check latency."""
+    import ai_engine
+
+    per_label: dict[str, dict] = {}
+    timings, mistakes = [], []
+    for name, (image, expected) in corpus.items():
+        start = time.perf_counter()
+        report = ai_engine.assess_image_quality(image, thresholds)
+        timings.append(time.perf_counter() - start)
+        label = expected[0] if expected else "good"
+        row = per_label.setdefault(label, {"photos": 0, "rejected": 0, "reason_match": 0, "skipped": 0})
+        row["photos"] += 1
+        if report is None:
+            row["skipped"] += 1
+            continue
+        got = set(report["reasons"])
+        row["rejected"] += bool(got)
+        row["reason_match"] += bool(set(expected) & got) if expected else not got
+        if bool(got) != bool(expected):
+            mistakes.append((name, sorted(got), report["metrics"]))
+    good = per_label.get("good", {"photos": 0, "rejected": 0})
+    bad = [row for label, row in per_label.items() if label != "good"]
+    return {
+        "per_label": per_label,
+        "false_reject_rate": round(good["rejected"] / good["photos"], 3) if good["photos"] else None,
+        "catch_rate": round(sum(r["rejected"] for r in bad) / max(1, sum(r["photos"] for r in bad)), 3),
+        "p50_ms": round(_percentile(timings, 50) * 1000, 2),
+        "p95_ms": round(_percentile(timings, 95) * 1000, 2),
+        "mistakes": mistakes,
+    }
+
+
+def _parse_pairs(pairs: list[str]) -> dict:
+    parsed = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        parsed[key] = value
+    return parsed
+
+
+def _print_result(title: str, result: dict, verbose: bool):
+    print(f"\n{title}: catch rate {result['catch_rate']:.0%}, false rejects {result['false_reject_rate']:.0%}, "
+          f"check p50 {result['p50_ms']:.1f} ms / p95 {result['p95_ms']:.1f} ms")
+    print(f"    {'label':<14}{'photos':>8}{'rejected':>10}{'right reason':>14}{'skipped':>9}")
+    for label, row in sorted(result["per_label"].items()):
+        print(f"    {label:<14}{row['photos']:>8}{row['rejected']:>10}{row['reason_match']:>14}{row['skipped']:>9}")
+    if verbose:
+        for name, reasons, values in result["mistakes"]:
+            print(f"    wrong: {name} → {reasons or 'accepted'} {values}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate the image-quality gate on a labelled corpus.")
+    parser.add_argument("--corpus-dir", help="directory with images and labels.json (default: synthetic corpus)")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="threshold overrides")
+    parser.add_argument("--sweep", metavar="KEY=V1,V2,...", help="evaluate several values of one threshold")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="list misclassified photos with their metrics")
+    args = parser.parse_args(argv)
+
+    import ai_engine
+    ai_engine.init()
+
+    corpus_dir = args.corpus_dir or build_corpus(DEFAULT_CORPUS_DIR)
+    with open(os.path.join(corpus_dir, "labels.json"), encoding="utf-8") as f:
+        labels = json.load(f)
+    corpus = {}
+    for name, expected in labels.items():
+        with open(os.path.join(corpus_dir, name), "rb") as f:
+            corpus[name] = (f.read(), list(expected))
+
+    unknown = set(_parse_pairs(args.set)) - set(ai_engine.QUALITY_THRESHOLDS)
+    if unknown:
+        parser.error(f"unknown thresholds: {', '.join(sorted(unknown))}")
+    base = {**ai_engine.QUALITY_THRESHOLDS, **{k: float(v) for k, v in _parse_pairs(args.set).items()}}
+    runs = [("thresholds " + json.dumps(base), base)]
+    if args.sweep:
+        key, values = next(iter(_parse_pairs([args.sweep]).items()))
+        if key not in base:
+            parser.error(f"unknown threshold: {key}")
+        runs = [(f"{key}={value}", {**base, key: float(value)}) for value in values.split(",")]
+
+    results = {}
+    for title, thresholds in runs:
+        ai_engine.assess_image_quality(io.BytesIO(next(iter(corpus.values()))[0]), thresholds)  # warm-up
+        results[title] = evaluate(corpus, thresholds)
+        _print_result(title, results[title], args.verbose)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
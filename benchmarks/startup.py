@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/startup.py — cold-start cost of the backend modules
+"""
+Import each backend module in a fresh interpreter with ``python -X importtime`` and
+report its cumulative import time and the heaviest packages it pulls in, then time the
+deferred initialisation (db.init, ai_engine.warm_up) that serving processes run in the
+background after binding the port:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modules server,ai_engine --top 10 --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = "metrics,admission,passwords,storage,db,ai_engine,server,wsgi"
+
+# Runs in a fresh interpreter: time to a servable app, then the background warm-up
+_INIT_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import server
+t1 = time.perf_counter()
+status = server.app.test_client().get("/api/health").status_code
+t2 = time.perf_counter()
+server.db.init()
+t3 = time.perf_counter()
+server.ai_engine.warm_up()
+t4 = time.perf_counter()
+print(json.dumps({"import server": t1 - t0, "first /api/health": t2 - t1, "health_status": status,
+                  "db.init": t3 - t2, "ai_engine.warm_up": t4 - t3}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SANJEEVANI_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="sanjeevani-startup-"), "bench.db"))
+    return env
+
+
+def import_profile(module: str, env: dict) -> tuple[float, dict[str, float]]:
+    """(cumulative seconds for ``module``, self seconds per top-level package it imported)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    # Lines come in post-order, so the module's own import tree is the run of lines since
+    # the previous top-level import (which leaves out interpreter start-up: site, encodings)
+    total = 0.0
+    per_package: dict[str, float] = defaultdict(float)
+    subtree: list[tuple[str, int]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:  <self us> | <cumulative us> | <indent><name>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        subtree.append((name.strip(), int(self_us)))
+        if len(name) - len(name.lstrip()) > 1:
+            continue
+        if name.strip() == module:
+            total = int(cumulative_us) / 1e6
+            for imported, us in subtree:
+                per_package[imported.split(".")[0]] += us / 1e6
+        subtree = []
+    return total, dict(per_package)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time and warm-up benchmark.")
+    parser.add_argument("--modules", default=DEFAULT_MODULES, help="comma-separated modules to import")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=5, help="heaviest packages to list per module")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    env = _env()
+    results: dict = {"imports": {}, "init": {}}
+    print(f"{'module':<12} {'import (ms)':>12}   heaviest packages (self ms)")
+    for module in args.modules.split(","):
+        runs = [import_profile(module, env) for _ in range(args.runs)]
+        total = statistics.median(t for t, _ in runs)
+        packages = runs[-1][1]
+        heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        results["imports"][module] = {"ms": round(total * 1000, 1),
+                                      "heaviest": {k: round(v * 1000, 1) for k, v in heaviest}}
+        listing = ", ".join(f"{k} {v * 1000:.0f}" for k, v in heaviest)
+        print(f"{module:<12} {total * 1000:>12.1f}   {listing}")
+
+    proc = subprocess.run([sys.executable, "-c", _INIT_SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:], file=sys.stderr)
+        return 1
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    print()
+    for name, value in timings.items():
+        if name != "health_status":
+            print(f"{name:<20} {value * 1000:>9.1f} ms")
+            results["init"][name] = round(value * 1000, 1)
+    if timings["health_status"] != 200:
+        print(f"/api/health returned {timings['health_status']}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
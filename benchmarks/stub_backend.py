@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# benchmarks/stub_backend.py — offline stand-ins for the Groq client and Edge TTS
+"""
+Three interchangeable backends expose the same surface that ai_engine uses:
+
+* StubBackend     — canned responses with configurable synthetic latency
+* RecordingBackend — wraps the live Groq client and records every response
+* ReplayBackend   — serves a recording back without network access
+
+Each backend looks like an ``AsyncGroq`` client. Install one with
+``with install(backend): ...``; it becomes the client ai_engine creates for every
+event loop, ``edge_tts.Communicate`` is swapped too, and both are restored on exit.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from contextlib import contextmanager
+
+STUB_MEDICINE_OCR = """DOLO-650
+Paracetamol Tablets IP 650 mg
+Each uncoated tablet contains: Paracetamol IP 650 mg
+Mfd. by: Micro Labs Ltd., Bengaluru
+Batch No. DOBS3975  Mfg. 02/2025  Exp. 01/2028
+Store in a cool, dry place. Keep out of reach of children."""
+
+STUB_PRESCRIPTION_OCR = """Dr. A. Sharma MBBS, MD (Medicine)
+City Care Clinic, Reg. No. 45123
+Pt. Ramesh Kumar  Age 45/M  Date 12/03/2025
+Dx: Acute bronchitis
+Rx
+1. Tab. Augmentin 625mg  1-0-1 x 5d PC
+2. Tab. Dolo 650  1-1-1 x 3d SOS fever
+3. Cap. Pan 40  1-0-0 x 7d AC
+4. Syp. Ascoril 10ml  1-1-1 x 5d
+Plenty of fluids. Review after 5 days."""
+
+STUB_MEDICINE_ANALYSIS = {
+    "is_medicine": True,
+    "medicine_name": "Dolo 650",
+    "active_salts": ["Paracetamol"],
+    "dosage_strength": "650mg",
+    "is_high_dosage": False,
+    "dosage_info": "650mg is a standard adult dose of paracetamol",
+    "conditions": ["Fever", "Headache", "Body pain"],
+    "what_it_does": "Reduces fever and relieves mild to moderate pain",
+    "suitable_age_group": "Adults (18+)",
+    "advice": "Do not exceed 4 tablets in 24 hours. Avoid alcohol while taking this medicine.",
+}
+
+STUB_PRESCRIPTION_ANALYSIS = {
+    "patient_info": {"name": "Ramesh Kumar", "age": "45", "date": "12/03/2025"},
+    "doctor_info": {"name": "Dr. A. Sharma", "qualification": "MBBS, MD (Medicine)"},
+    "diagnosis": "Acute bronchitis",
+    "medicines": [
+        {
+            "order": 1, "name": "Amoxicillin + Clavulanic Acid (Augmentin 625)", "dosage": "625mg",
+            "form": "Tablet", "frequency": "twice a day", "timing": "after meals", "duration": "5 days",
+            "meal_relation": "after meals", "active_salts": ["Amoxicillin", "Clavulanic Acid"],
+            "alternatives": ["Clavam 625", "Moxikind-CV 625"],
+            "purpose": "Antibiotic for the bacterial chest infection. Stops bacterial growth.",
+            "side_effects": ["Diarrhoea", "Nausea"], "food_interaction": "Take with food.",
+            "warnings": "Complete the full course.", "is_antibiotic": True, "special_instructions": "",
+        },
+        {
+            "order": 2, "name": "Paracetamol (Dolo 650)", "dosage": "650mg", "form": "Tablet",
+            "frequency": "three times a day", "timing": "as needed", "duration": "3 days",
+            "meal_relation": "after meals", "active_salts": ["Paracetamol"], "alternatives": ["Crocin 650"],
+            "purpose": "Relieves fever and body ache.", "side_effects": ["Rarely liver damage in overdose"],
+            "food_interaction": "No specific food restrictions.", "warnings": "Max 4g per day.",
+            "is_antibiotic": False, "special_instructions": "Only if fever",
+        },
+        {
+            "order": 3, "name": "Pantoprazole (Pan 40)", "dosage": "40mg", "form": "Capsule",
+            "frequency": "once daily", "timing": "before meals", "duration": "7 days",
+            "meal_relation": "before meals", "active_salts": ["Pantoprazole"], "alternatives": ["Pantocid 40"],
+            "purpose": "Reduces stomach acid and protects the stomach.", "side_effects": ["Headache"],
+            "food_interaction": "Take on an empty stomach.", "warnings": "", "is_antibiotic": False,
+            "special_instructions": "",
+        },
+        {
+            "order": 4, "name": "Ambroxol + Salbutamol (Ascoril)", "dosage": "10ml", "form": "Syrup",
+            "frequency": "three times a day", "timing": "after meals", "duration": "5 days",
+            "meal_relation": "after meals", "active_salts": ["Salbutamol", "Ambroxol"], "alternatives": [],
+            "purpose": "Loosens mucus and opens the airways.", "side_effects": ["Tremor", "Palpitations"],
+            "food_interaction": "No specific food restrictions.", "warnings": "", "is_antibiotic": False,
+            "special_instructions": "",
+        },
+    ],
+    "interactions": [],
+    "overall_advice": "MORNING: Augmentin, Dolo, Pan, Ascoril. AFTERNOON: Dolo, Ascoril. NIGHT: Augmentin, Dolo, Ascoril.",
+    "diet_advice": "Drink plenty of warm fluids and eat light meals.",
+    "follow_up": "Review after 5 days or earlier if fever persists.",
+}
+
+# Roughly one MP3 frame per ~3 characters of speech at edge-tts' 48 kbit/s mono output
+_STUB_AUDIO_BYTES_PER_CHAR = 48
+
+
+def _make_response(content: str, prompt_chars: int, max_tokens: int | None = None) -> SimpleNamespace:
+    """Build an object shaped like a Groq ChatCompletion, cut off at ``max_tokens`` like the API."""
+    finish_reason = "stop"
+    if max_tokens and len(content) // 4 > max_tokens:
+        content, finish_reason = content[:max_tokens * 4], "length"
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_chars // 4,
+            completion_tokens=len(content) // 4,
+            total_tokens=(prompt_chars + len(content)) // 4,
+        ),
+    )
+
+
+def _message_text(messages: list[dict]) -> tuple[str, str, bool]:
+    """Return (system_prompt, user_text, has_image) for a chat request."""
+    system, user_parts, has_image = "", [], False
+    for msg in messages:
+        content = msg.get("content", "")
+        if msg.get("role") == "system":
+            system += content if isinstance(content, str) else ""
+            continue
+        if isinstance(content, str):
+            user_parts.append(content)
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                has_image = True
+            elif part.get("type") == "text":
+                user_parts.append(part.get("text", ""))
+    return system, "\n".join(user_parts), has_image
+
+
+def _request_key(kwargs: dict) -> str:
+    """
+    Stable hash of a chat request, with inline images reduced to their digest. max_tokens
+    is left out so a recording can be replayed under different token budgets.
+    """
+    def _strip(obj):
+        if isinstance(obj, dict):
+            return {k: _strip(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [_strip(v) for v in obj]
+        if isinstance(obj, str) and obj.startswith("data:"):
+            return "sha256:" + hashlib.sha256(obj.encode()).hexdigest()
+        return obj
+    request = {k: v for k, v in kwargs.items() if k != "max_tokens"}
+    payload = json.dumps(_strip(request), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _tts_key(text: str, voice: str) -> str:
+    return hashlib.sha256(f"{voice}|{text}".encode()).hexdigest()
+
+
+class _Completions:
+    def __init__(self, create):
+        self.create = create
+
+
+class _Backend:
+    """Common surface: ``chat.completions.create`` plus an Edge TTS ``Communicate`` factory."""
+
+    def __init__(self, llm_latency: float = 0.0, tts_latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.llm_latency = llm_latency
+        self.tts_latency = tts_latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self._create))
+
+    def _delay(self, base: float) -> float:
+        if base <= 0:
+            return 0.0
+        with self._rng_lock:
+            spread = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, base * (1.0 + spread))
+
+    async def _create(self, **kwargs):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def _audio_for(self, text: str, voice: str) -> bytes:
+        # Deterministic filler the size of a real clip; never decoded by the pipeline
+        seed = bytes.fromhex(_tts_key(text, voice))
+        size = max(1, len(text)) * _STUB_AUDIO_BYTES_PER_CHAR
+        return (seed * (size // len(seed) + 1))[:size]
+
+    def communicate_factory(self):
+        backend = self
+
+        class Communicate:
+            def __init__(self, text: str, voice: str, *args, **kwargs):
+                self.text = text
+                self.voice = voice
+
+            async def stream(self):
+                await asyncio.sleep(backend._delay(backend.tts_latency))
+                audio = backend._audio_for(self.text, self.voice)
+                for i in range(0, len(audio), 4096):
+                    yield {"type": "audio", "data": audio[i:i + 4096]}
+
+        return Communicate
+
+
+class StubBackend(_Backend):
+    """Canned Groq responses chosen by inspecting the prompt."""
+
+    async def _create(self, **kwargs):
+        system, user, has_image = _message_text(kwargs.get("messages", []))
+        await asyncio.sleep(self._delay(self.llm_latency))
+        if has_image and "Medical AI" in system:  # fused medicine mode: OCR and analysis at once
+            content = json.dumps(STUB_MEDICINE_ANALYSIS, ensure_ascii=False)
+        elif has_image:
+            content = STUB_PRESCRIPTION_OCR if "prescription" in system.lower() else STUB_MEDICINE_OCR
+        elif "Clinical Pharmacist" in system:
+            content = json.dumps(STUB_PRESCRIPTION_ANALYSIS, ensure_ascii=False)
+        elif "medical translator" in system:
+            content = re.sub(r"(?m)^(\d+\. )?", r"\1[translated] ", user)  # keeps numbered lists numbered
+        else:
+            content = json.dumps(STUB_MEDICINE_ANALYSIS, ensure_ascii=False)
+        return _make_response(content, len(system) + len(user), kwargs.get("max_tokens"))
+
+
+class RecordingBackend(_Backend):
+    """Pass requests through to a live AsyncGroq client and record the responses to ``path``."""
+
+    def __init__(self, live_client, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self._live = live_client
+        self._path = path
+        self._lock = threading.Lock()
+        self._records: dict[str, dict] = {"chat": {}, "tts": {}}
+
+    async def _create(self, **kwargs):
+        start = time.perf_counter()
+        response = await self._live.chat.completions.create(**kwargs)
+        content = response.choices[0].message.content
+        with self._lock:
+            self._records["chat"][_request_key(kwargs)] = {
+                "content": content,
+                "latency_s": round(time.perf_counter() - start, 4),
+            }
+        return response
+
+    def communicate_factory(self):
+        import edge_tts
+        live_communicate = edge_tts.Communicate
+        recorder = self
+
+        class Communicate(live_communicate):
+            def __init__(self, text: str, voice: str, *args, **kwargs):
+                super().__init__(text, voice, *args, **kwargs)
+                self._record_key = _tts_key(text, voice)
+
+            async def stream(self):
+                size = 0
+                async for chunk in super().stream():
+                    if chunk["type"] == "audio":
+                        size += len(chunk["data"])
+                    yield chunk
+                with recorder._lock:
+                    recorder._records["tts"][self._record_key] = size
+
+        return Communicate
+
+    def save(self):
+        with self._lock:
+            with open(self._path, "w", encoding="utf-8") as f:
+                json.dump(self._records, f, ensure_ascii=False, indent=1)
+
+
+class ReplayBackend(_Backend):
+    """
+    Serve responses recorded by RecordingBackend; unknown requests fall back to the stub.
+    With ``recorded_latency=True`` each response is delayed by its recorded round-trip time.
+    """
+
+    def __init__(self, path: str, recorded_latency: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        with open(path, encoding="utf-8") as f:
+            self._records = json.load(f)
+        self._recorded_latency = recorded_latency
+        self._fallback = StubBackend()
+        self.misses = 0
+
+    async def _create(self, **kwargs):
+        record = self._records.get("chat", {}).get(_request_key(kwargs))
+        if record is None:
+            self.misses += 1
+            await asyncio.sleep(self._delay(self.llm_latency))
+            return await self._fallback._create(**kwargs)
+        if self._recorded_latency:
+            await asyncio.sleep(record.get("latency_s", 0.0))
+        else:
+            await asyncio.sleep(self._delay(self.llm_latency))
+        system, user, _ = _message_text(kwargs.get("messages", []))
+        return _make_response(record["content"], len(system) + len(user), kwargs.get("max_tokens"))
+
+    def _audio_for(self, text: str, voice: str) -> bytes:
+        size = self._records.get("tts", {}).get(_tts_key(text, voice))
+        audio = super()._audio_for(text, voice)
+        if not size:
+            return audio
+        return (audio * (size // len(audio) + 1))[:size]
+
+
+@contextmanager
+def install(backend: _Backend):
+    """Route ai_engine's Groq and Edge TTS calls through ``backend`` for the duration of the block."""
+    import ai_engine
+    import edge_tts
+
+    original_make_client = ai_engine._make_client
+    original_communicate = edge_tts.Communicate
+    ai_engine._make_client = lambda: backend
+    ai_engine._clients.clear()
+    edge_tts.Communicate = backend.communicate_factory()
+    try:
+        yield backend
+    finally:
+        ai_engine._make_client = original_make_client
+        ai_engine._clients.clear()
+        edge_tts.Communicate = original_communicate
@@ -1,52 +1,60 @@
 #!/usr/bin/env python3
-# db.py — SQLite database for user authentication and scan history
-import sqlite3
-import hashlib
-import json
+# db.py — user authentication, scan history and shared caches
+"""
+The functions here are what the server uses. Where the data lives is pluggable (see
+storage/): a local SQLite file by default, or PostgreSQL when SANJEEVANI_DATABASE_URL
+is a postgresql:// URL, so several API nodes behind a load balancer can share it.
+
+The store is opened, and its schema migrated, on first use or through init(), not at
+import. With several nodes, set SANJEEVANI_DB_AUTO_MIGRATE=0 and run
+``python db.py migrate`` once per release instead.
+"""
 import os
-from datetime import datetime
+import threading
+from typing import Iterator
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "sanjeevani.db")
+import passwords
+from storage import open_storage
+from storage.base import search_words
 
+DB_PATH = os.getenv("SANJEEVANI_DB_PATH", os.path.join(os.path.dirname(__file__), "sanjeevani.db"))
+DATABASE_URL = os.getenv("SANJEEVANI_DATABASE_URL") or DB_PATH
+AUTO_MIGRATE = os.getenv("SANJEEVANI_DB_AUTO_MIGRATE", "1") != "0"
 
-def _get_conn():
-    """Get a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+_store = None
+_store_lock = threading.Lock()
+
+
+def _storage():
+    """The configured backend, opened (and migrated, with AUTO_MIGRATE) on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = open_storage(DATABASE_URL)
+                if AUTO_MIGRATE:
+                    store.migrate()
+                _store = store
+    return _store
+
+
+def init():
+    """Open the store now instead of on the first request."""
+    _storage()
+
+
+def close():
+    """Flush pending writes and close the store (e.g. when a worker exits); reopened on next use."""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
 
 
 def init_db():
-    """Create tables if they don't exist."""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TEXT NOT NULL
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS scan_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            scan_type TEXT NOT NULL,
-            language TEXT NOT NULL,
-            result_json TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-
-def _hash_password(password: str) -> str:
-    """Hash a password using SHA-256 with a static salt."""
-    salted = f"sanjeevani_{password}_salt"
-    return hashlib.sha256(salted.encode()).hexdigest()
+    """Create tables if they don't exist and apply pending migrations."""
+    _storage().migrate()
 
 
 def register_user(username: str, password: str) -> tuple[bool, str]:
@@ -56,81 +64,119 @@ def register_user(username: str, password: str) -> tuple[bool, str]:
     if len(password) < 4:
         return False, "Password must be at least 4 characters."
 
-    conn = _get_conn()
-    try:
-        conn.execute(
-            "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
-            (username.strip().lower(), _hash_password(password), datetime.now().isoformat())
-        )
-        conn.commit()
+    password_hash = passwords.hash_password(password)
+    if _storage().create_user(username.strip().lower(), password_hash):
+        # The server logs the new user straight in: let that skip a second KDF run
+        passwords.remember(password, password_hash)
         return True, "Account created successfully!"
-    except sqlite3.IntegrityError:
-        return False, "Username already exists. Please choose a different one."
-    finally:
-        conn.close()
+    return False, "Username already exists. Please choose a different one."
 
 
 def authenticate_user(username: str, password: str) -> tuple[bool, int | None]:
-    """Authenticate a user. Returns (success, user_id)."""
-    conn = _get_conn()
-    row = conn.execute(
-        "SELECT id, password_hash FROM users WHERE username = ?",
-        (username.strip().lower(),)
-    ).fetchone()
-    conn.close()
-
-    if row is None:
+    """
+    Authenticate a user. Returns (success, user_id). Old-style or outdated hashes are
+    upgraded on a successful login. Raises passwords.KdfBusy under a login storm.
+    """
+    row = _storage().get_user(username.strip().lower())
+    user_id, password_hash = row if row else (None, None)
+    ok, needs_rehash = passwords.verify_password(password, password_hash)
+    if not ok:
         return False, None
-    if row["password_hash"] == _hash_password(password):
-        return True, row["id"]
-    return False, None
+    if needs_rehash:
+        new_hash = passwords.hash_password(password)
+        _storage().set_password_hash(user_id, new_hash)
+        passwords.remember(password, new_hash)
+    return True, user_id
 
 
 def save_scan(user_id: int, scan_type: str, language: str, result_data: dict):
-    """Save a scan result for a user."""
-    conn = _get_conn()
-    conn.execute(
-        "INSERT INTO scan_history (user_id, scan_type, language, result_json, created_at) VALUES (?, ?, ?, ?, ?)",
-        (user_id, scan_type, language, json.dumps(result_data, ensure_ascii=False), datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
-
-
-def get_user_history(user_id: int, limit: int = 50) -> list[dict]:
-    """Get scan history for a user, most recent first."""
-    conn = _get_conn()
-    rows = conn.execute(
-        "SELECT id, scan_type, language, result_json, created_at FROM scan_history WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
-        (user_id, limit)
-    ).fetchall()
-    conn.close()
-
-    history = []
-    for row in rows:
-        entry = {
-            "id": row["id"],
-            "scan_type": row["scan_type"],
-            "language": row["language"],
-            "result": json.loads(row["result_json"]),
-            "created_at": row["created_at"]
-        }
-        history.append(entry)
-    return history
+    """Save a scan result for a user. Returns the new scan id."""
+    return _storage().save_scan(user_id, scan_type, language, result_data)
+
+
+def history_cursor(entry: dict) -> str:
+    """Opaque keyset cursor pointing just past ``entry``; pass it back as ``before``."""
+    return f"{entry['created_at']}|{entry['id']}"
+
+
+def get_user_history(user_id: int, limit: int = 50, before: str | None = None) -> list[dict]:
+    """
+    One page of a user's scan history, most recent first, as summaries without the full
+    result (fetch that with get_scan). ``before`` is a cursor from history_cursor().
+    """
+    cursor = None
+    if before:
+        created_at, _, scan_id = before.rpartition("|")
+        if not created_at or not scan_id.isdigit():
+            raise ValueError("Invalid history cursor")
+        cursor = (created_at, int(scan_id))
+    return _storage().list_scans(user_id, limit, cursor)
+
+
+def search_history(user_id: int, query: str, limit: int = 20) -> list[dict]:
+    """
+    Search a user's scans by medicine name, salt, diagnosis or doctor. Every word in
+    ``query`` must match the start of an indexed word; best matches come first.
+    """
+    words = search_words(query)[:8]
+    if not words:
+        return []
+    return _storage().search_scans(user_id, words, limit)
+
+
+def get_scan(user_id: int, scan_id: int) -> dict | None:
+    """Get one scan with its full result, or None if it doesn't belong to the user."""
+    return _storage().get_scan(user_id, scan_id)
+
+
+def export_history(user_id: int) -> Iterator[dict]:
+    """
+    Every scan of a user with its full result, oldest first, streamed from a database
+    cursor so memory stays flat however long the history is. Close the iterator (or
+    exhaust it) to give its connection back.
+    """
+    return _storage().iter_scans(user_id)
 
 
 def delete_scan(user_id: int, scan_id: int) -> bool:
     """Delete a specific scan entry for a user."""
-    conn = _get_conn()
-    cursor = conn.execute(
-        "DELETE FROM scan_history WHERE id = ? AND user_id = ?",
-        (scan_id, user_id)
-    )
-    conn.commit()
-    deleted = cursor.rowcount > 0
-    conn.close()
-    return deleted
-
-
-# Initialize database on import
-init_db()
+    return _storage().delete_scan(user_id, scan_id)
+
+
+def cache_get(namespace: str, key: str) -> bytes | None:
+    """Look up a shared cache entry (e.g. generated audio)."""
+    return _storage().cache_get(namespace, key)
+
+
+def cache_put(namespace: str, key: str, value: bytes):
+    _storage().cache_put(namespace, key, value)
+
+
+def cache_trim(namespace: str, max_bytes: int) -> int:
+    """Evict least recently used entries of a namespace down to ``max_bytes``."""
+    return _storage().cache_trim(namespace, max_bytes)
+
+
+def compact_results():
+    """Retrain the result compression dictionary and re-encode stored scans (SQLite only)."""
+    store = _storage()
+    if not hasattr(store, "compact"):
+        raise NotImplementedError("compact is only needed for SQLite; PostgreSQL compresses results itself")
+    return store.compact()
+
+
+if __name__ == "__main__":
+    import sys
+    command = sys.argv[1:]
+    if command == ["migrate"]:
+        init_db()
+        print("Database schema is up to date.")
+    elif command == ["compact"]:
+        try:
+            trained = compact_results()
+        except NotImplementedError as e:
+            sys.exit(f"Nothing to compact: {e}.")
+        print(f"Results re-encoded with {'dictionary ' + str(trained) if trained else 'zlib'}; "
+              f"database is now {os.path.getsize(_storage().path) / 1_048_576:.1f} MB")
+    else:
+        print("usage: python db.py migrate | compact")
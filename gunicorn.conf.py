@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# gunicorn.conf.py — production serving config for wsgi:app
+"""
+Every analyze request spends 10-30s waiting on Groq and Edge TTS, so throughput comes
+from many concurrent waits per process rather than many processes:
+
+  * gthread (default): a few workers × many threads
+  * gevent:            set SANJEEVANI_WORKER_CLASS=gevent (pip install gevent) for
+                       hundreds of cooperative connections per worker
+
+All knobs can be overridden through environment variables.
+"""
+import os
+import multiprocessing
+
+bind = os.getenv("SANJEEVANI_BIND", "0.0.0.0:5000")
+worker_class = os.getenv("SANJEEVANI_WORKER_CLASS", "gthread")
+workers = int(os.getenv("SANJEEVANI_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+threads = int(os.getenv("SANJEEVANI_THREADS", "32"))
+worker_connections = int(os.getenv("SANJEEVANI_WORKER_CONNECTIONS", "500"))  # gevent / gthread
+backlog = int(os.getenv("SANJEEVANI_BACKLOG", "256"))
+
+# Long LLM-bound requests: don't kill a worker mid-analysis, and let in-flight scans
+# finish on SIGTERM before the worker exits.
+timeout = int(os.getenv("SANJEEVANI_WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("SANJEEVANI_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+# Import the app once in the master, then fork. The import is kept light; the heavy
+# libraries are loaded per worker by post_worker_init, because threads must not be
+# started in the master before it forks.
+preload_app = True
+
+# Recycle workers periodically to bound any slow memory growth from image decoding.
+max_requests = int(os.getenv("SANJEEVANI_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    cfg = server.cfg
+    server.log.info(
+        "Sanjeevani API ready on %s (%s × %d workers, %d threads each)",
+        ", ".join(cfg.bind), cfg.worker_class_str, cfg.workers, cfg.threads,
+    )
+
+
+def post_worker_init(worker):
+    # The worker is about to accept connections; finish loading in the background
+    from server import warm_up_in_background
+    warm_up_in_background()
+
+
+def worker_exit(server, worker):
+    # Close pooled HTTPS connections to Groq and stop the engine loop on graceful shutdown
+    try:
+        import ai_engine
+        ai_engine.shutdown()
+    except Exception as e:
+        worker.log.warning("Could not close Groq client: %s", e)
+    # Commit writes still queued for the database writer (e.g. cache access times)
+    try:
+        import db
+        db.close()
+    except Exception as e:
+        worker.log.warning("Could not close the database: %s", e)
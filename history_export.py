@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# history_export.py — a user's whole scan history as NDJSON or CSV, streamed
+"""
+Clinics export a patient's full history, which can run to tens of thousands of scans.
+The exporters here take the iterator from db.export_history() and yield encoded chunks
+of a few hundred scans each, so a response of any length is produced with one batch in
+memory at a time:
+
+  * ndjson: one line per scan with its full result, lossless
+  * csv:    one row per medicine (a strip scan is one medicine, a prescription one row
+            per line item), with the scan's patient, doctor and diagnosis repeated on
+            each row. A scan with no medicines still gets one row.
+
+CSV is written with pandas when it is installed and the standard csv module otherwise;
+the output is the same. It starts with a UTF-8 byte order mark so Excel shows Indic
+text correctly. Cells come from OCR and model output, so a CSV cell that a spreadsheet
+would read as a formula is prefixed with an apostrophe; NDJSON is written unchanged.
+"""
+import io
+import csv
+import json
+from typing import Iterable, Iterator
+
+from metrics import incr
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Scans encoded per yielded chunk
+CHUNK_SCANS = 200
+
+CSV_COLUMNS = (
+    "scan_id", "created_at", "scan_type", "language",
+    "patient_name", "patient_age", "doctor_name", "diagnosis",
+    "medicine_order", "medicine_name", "active_salts", "dosage", "form",
+    "frequency", "timing", "duration", "purpose", "warnings",
+)
+
+
+def _text(value) -> str:
+    """A cell value: lists are joined, missing values are empty."""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "; ".join(str(v) for v in value if v not in (None, ""))
+    return str(value)
+
+
+# Leading characters that make Excel, LibreOffice and Sheets evaluate a cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value) -> str:
+    """A CSV cell: _text() with formula-like values neutralised."""
+    text = _text(value)
+    return "'" + text if text.startswith(_FORMULA_PREFIXES) else text
+
+
+# ─── Flattening ──────────────────────────────────────────────
+def medicine_rows(scan: dict) -> list[dict]:
+    """CSV rows for one scan from db.export_history()."""
+    result = scan.get("result") or {}
+    base = {
+        "scan_id": scan["id"],
+        "created_at": scan["created_at"],
+        "scan_type": scan["scan_type"],
+        "language": scan["language"],
+    }
+    if scan["scan_type"] == "medicine":
+        medicines = [{
+            "medicine_name": result.get("medicine_name"),
+            "active_salts": result.get("active_salts"),
+            "dosage": result.get("dosage_strength"),
+            "purpose": result.get("what_it_does"),
+            "warnings": result.get("advice"),
+        }] if result.get("medicine_name") else []
+    else:
+        patient = result.get("patient_info") or {}
+        doctor = result.get("doctor_info") or {}
+        base.update(
+            patient_name=patient.get("name"), patient_age=patient.get("age"),
+            doctor_name=doctor.get("name"), diagnosis=result.get("diagnosis"),
+        )
+        medicines = [{
+            "medicine_order": med.get("order"),
+            "medicine_name": med.get("name"),
+            "active_salts": med.get("active_salts"),
+            "dosage": med.get("dosage"),
+            "form": med.get("form"),
+            "frequency": med.get("frequency"),
+            "timing": med.get("timing"),
+            "duration": med.get("duration"),
+            "purpose": med.get("purpose"),
+            "warnings": med.get("warnings"),
+        } for med in result.get("medicines") or [] if isinstance(med, dict)]
+    return [{col: _cell({**base, **med}.get(col)) for col in CSV_COLUMNS} for med in medicines or [{}]]
+
+
+def _chunks(scans: Iterable[dict]) -> Iterator[list[dict]]:
+    batch = []
+    for scan in scans:
+        batch.append(scan)
+        if len(batch) == CHUNK_SCANS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ─── Encoders ────────────────────────────────────────────────
+def ndjson_chunks(scans: Iterable[dict]) -> Iterator[bytes]:
+    for batch in _chunks(scans):
+        incr("history_export.scans", len(batch))
+        yield "".join(json.dumps(scan, ensure_ascii=False) + "\n" for scan in batch).encode("utf-8")
+
+
+def _csv_text(rows: list[dict], header: bool) -> str:
+    try:
+        import pandas as pd
+    except ImportError:  # optional: the csv module writes the same output
+        pd = None
+    if pd is not None:
+        return pd.DataFrame(rows, columns=list(CSV_COLUMNS)).to_csv(index=False, header=header, lineterminator="\r\n")
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def csv_chunks(scans: Iterable[dict]) -> Iterator[bytes]:
+    yield "\ufeff".encode("utf-8") + _csv_text([], header=True).encode("utf-8")
+    for batch in _chunks(scans):
+        rows = [row for scan in batch for row in medicine_rows(scan)]
+        incr("history_export.scans", len(batch))
+        incr("history_export.csv_rows", len(rows))
+        yield _csv_text(rows, header=False).encode("utf-8")
+
+
+def export_chunks(scans: Iterator[dict], fmt: str) -> Iterator[bytes]:
+    """Encoded chunks of ``scans`` in ``fmt`` (a FORMATS key). Closing this closes ``scans``."""
+    encode = ndjson_chunks if fmt == "ndjson" else csv_chunks
+    try:
+        yield from encode(scans)
+    finally:
+        close = getattr(scans, "close", None)
+        if close is not None:
+            close()  # hands the database connection back if the client went away early
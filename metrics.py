@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# metrics.py — in-process counters and per-stage timings for the analysis pipeline
+"""
+Stages are timed with ``stage("name")``. Timings are only recorded while a
+collector opened by ``collect_stages()`` is active in the current context, so
+the instrumentation costs a single ContextVar lookup in normal operation.
+A stage listener (the sampling profiler, while it runs) is also told when each
+stage is entered and left.
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+_counters: dict[str, int] = {}
+_counters_lock = threading.Lock()
+
+# Active stage collector for the current request/benchmark iteration (or None)
+_stage_sink: contextvars.ContextVar[list | None] = contextvars.ContextVar("stage_sink", default=None)
+
+# Object with stage_entered(name) -> token and stage_exited(token), or None
+_stage_listener = None
+
+
+def incr(name: str, amount: int = 1):
+    """Increment a named counter."""
+    with _counters_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def counters() -> dict[str, int]:
+    """Return a snapshot of all counters."""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def set_stage_listener(listener):
+    """Report stage entry and exit to ``listener`` from now on (None to stop)."""
+    global _stage_listener
+    _stage_listener = listener
+
+
+@contextmanager
+def stage(name: str, cpu: bool = True):
+    """
+    Time a pipeline stage: wall seconds, and CPU seconds of the running thread. Pass
+    cpu=False for a stage awaited on an event loop, whose thread runs other tasks in the
+    meantime; its "cpu_s" is None.
+    """
+    sink = _stage_sink.get()
+    listener = _stage_listener
+    if sink is None and listener is None:
+        yield
+        return
+    token = listener.stage_entered(name) if listener is not None else None
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time() if cpu else None
+    try:
+        yield
+    finally:
+        if listener is not None:
+            listener.stage_exited(token)
+        if sink is not None:
+            sink.append({
+                "stage": name,
+                "wall_s": time.perf_counter() - wall_start,
+                "cpu_s": time.thread_time() - cpu_start if cpu else None,
+            })
+
+
+@contextmanager
+def collect_stages():
+    """Collect stage timings recorded in this context. Yields the list being filled."""
+    sink: list[dict] = []
+    token = _stage_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _stage_sink.reset(token)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# passwords.py — password hashing with an adaptive KDF
+"""
+Passwords are hashed with scrypt (PBKDF2-SHA256 where OpenSSL lacks scrypt) and a random
+salt per user, stored as ``scrypt$<n>$<r>$<p>$<salt>$<hash>``. Hashes from the old
+static-salt SHA-256 scheme still verify and are replaced on the next successful login.
+
+Each hash costs tens of milliseconds of CPU on purpose, so:
+
+- the KDF runs on a small dedicated pool (SANJEEVANI_KDF_WORKERS) and callers beyond
+  SANJEEVANI_KDF_MAX_PENDING get ``KdfBusy`` instead of piling up behind it, which keeps
+  login storms from eating the cores the analysis pipeline needs;
+- a successful verification is remembered for a few minutes (keyed by an HMAC under a
+  per-process secret, never the password itself), so repeated logins from the same
+  user skip the KDF until the stored hash changes.
+"""
+import os
+import hmac
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+SCRYPT_N = int(os.getenv("SANJEEVANI_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("SANJEEVANI_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SANJEEVANI_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("SANJEEVANI_PBKDF2_ITERATIONS", "600000"))
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+KDF_WORKERS = int(os.getenv("SANJEEVANI_KDF_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+KDF_MAX_PENDING = int(os.getenv("SANJEEVANI_KDF_MAX_PENDING", "64"))
+
+VERIFIED_CACHE_TTL_S = float(os.getenv("SANJEEVANI_VERIFIED_CACHE_TTL", "600"))
+VERIFIED_CACHE_SIZE = 10_000
+
+HAS_SCRYPT = hasattr(hashlib, "scrypt")
+
+
+class KdfBusy(Exception):
+    """Too many password checks are already waiting; the caller should retry shortly."""
+
+
+# ─── KDF ─────────────────────────────────────────────────────
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # OpenSSL needs ~128 * n * r * p bytes of scratch memory; leave headroom
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=HASH_BYTES)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=HASH_BYTES)
+
+
+def _legacy_sha256(password: str) -> str:
+    """The original static-salt scheme, kept only to verify old hashes."""
+    return hashlib.sha256(f"sanjeevani_{password}_salt".encode()).hexdigest()
+
+
+def _hash_now(password: str) -> str:
+    salt = os.urandom(SALT_BYTES)
+    if HAS_SCRYPT:
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+    digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+
+
+def _verify_now(password: str, stored: str) -> tuple[bool, bool]:
+    """(matches, needs_rehash) for a stored hash in any supported format."""
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            ok = hmac.compare_digest(_scrypt(password, _unb64(parts[4]), n, r, p), _unb64(parts[5]))
+            return ok, (not HAS_SCRYPT) or (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            iterations = int(parts[1])
+            ok = hmac.compare_digest(_pbkdf2(password, _unb64(parts[2]), iterations), _unb64(parts[3]))
+            return ok, HAS_SCRYPT or iterations != PBKDF2_ITERATIONS
+    except ValueError:  # corrupt hash (bad number or base64): treat as a mismatch
+        return False, False
+    if len(stored) == 64:
+        return hmac.compare_digest(_legacy_sha256(password), stored), True
+    return False, False
+
+
+# Verified against for unknown usernames, so a miss costs as much as a wrong password
+_dummy_hash: str | None = None
+
+# ─── Worker pool ─────────────────────────────────────────────
+_pool: ThreadPoolExecutor | None = None
+_pool_pid: int | None = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(KDF_MAX_PENDING)
+
+
+def _run(fn, *args):
+    """Run a KDF call on the bounded pool and wait for it."""
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix="kdf")
+                _pool_pid = os.getpid()
+    if not _pending.acquire(blocking=False):
+        metrics.incr("passwords.rejected_busy")
+        raise KdfBusy()
+    try:
+        return _pool.submit(fn, *args).result()
+    finally:
+        _pending.release()
+
+
+# ─── Verified cache ──────────────────────────────────────────
+_cache_secret = os.urandom(32)
+_verified: OrderedDict[bytes, float] = OrderedDict()
+_verified_lock = threading.Lock()
+
+
+def _cache_key(password: str, stored: str) -> bytes:
+    # Includes the stored hash, so a password change or rehash invalidates the entry
+    return hmac.new(_cache_secret, f"{stored}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+
+def remember(password: str, stored: str):
+    """Record that ``password`` matches ``stored`` (after a verification or a fresh hash)."""
+    key = _cache_key(password, stored)
+    with _verified_lock:
+        _verified[key] = time.monotonic() + VERIFIED_CACHE_TTL_S
+        _verified.move_to_end(key)
+        while len(_verified) > VERIFIED_CACHE_SIZE:
+            _verified.popitem(last=False)
+
+
+def _recently_verified(password: str, stored: str) -> bool:
+    key = _cache_key(password, stored)
+    with _verified_lock:
+        expires = _verified.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _verified[key]
+            return False
+        return True
+
+
+# ─── Public API ──────────────────────────────────────────────
+def hash_password(password: str) -> str:
+    """Hash a new password with the current KDF and cost parameters."""
+    return _run(_hash_now, password)
+
+
+def verify_password(password: str, stored: str | None) -> tuple[bool, bool]:
+    """
+    Check ``password`` against a stored hash (None for an unknown user).
+    Returns (matches, needs_rehash). Raises KdfBusy when the pool is saturated.
+    """
+    global _dummy_hash
+    if stored is None:
+        if _dummy_hash is None:
+            _dummy_hash = _run(_hash_now, "sanjeevani-dummy-password")
+        _run(_verify_now, password, _dummy_hash)
+        return False, False
+    if _recently_verified(password, stored):
+        metrics.incr("passwords.verified_cached")
+        return True, False
+    ok, needs_rehash = _run(_verify_now, password, stored)
+    metrics.incr("passwords.verified_kdf")
+    if ok and not needs_rehash:
+        remember(password, stored)
+    return ok, needs_rehash
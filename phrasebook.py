@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# phrasebook.py — local rendering of medication schedules in every supported language
+"""
+The prescription summary says, for each medicine, how much to take, how often, in what
+relation to meals and for how long. Those fields come back from the analysis model as
+short English phrases ("twice a day", "after meals", "5 days"), so instead of sending
+the sentence to the translator they are parsed into a closed vocabulary and rendered
+from a phrasebook:
+
+    render_schedule({"name": "Pan 40", "dosage": "40mg", "frequency": "once daily",
+                     "meal_relation": "before meals", "duration": "7 days"}, "hi")
+    → "Pan 40, 40mg। 7 दिन तक खाने से पहले दिन में एक बार लें।"
+
+Parsing is strict: a phrase outside the vocabulary makes render_schedule return None,
+and the caller translates that medicine's English sentence instead. Medicine names
+and dosages (numbers with mg/ml/… units) are kept as written, as the translator does.
+"""
+import re
+
+# ─── Vocabulary ──────────────────────────────────────────────
+# English phrases the analysis model uses, matched whole (after lower-casing, collapsing
+# spaces and spelling number words as digits, so "one time a day" is matched as
+# "1 time a day") to a key; "{n}" in a phrase is filled from the captured number.
+_COUNT = r"(?:once|twice|thrice|[1-4] ?(?:times?|x))"
+_COUNT_KEYS = {"once": "once_daily", "1": "once_daily", "twice": "twice_daily", "2": "twice_daily",
+               "thrice": "thrice_daily", "3": "thrice_daily", "4": "four_times_daily"}
+
+FREQUENCIES = [
+    (rf"(?P<count>{_COUNT})(?: (?:a|per|every|in a) day| daily)?", None),
+    (r"od|q\.?d\.?|daily|every day|1-0-0-0", "once_daily"),
+    (r"bd|b\.?i\.?d\.?", "twice_daily"),
+    (r"tds|t\.?i\.?d\.?|1-1-1", "thrice_daily"),
+    (r"qid|qds|q\.?i\.?d\.?|1-1-1-1", "four_times_daily"),
+    (r"(?:every |daily |once )?(?:in the )?morning|1-0-0", "morning"),
+    (r"(?:every |daily |once )?(?:at |in the )?(?:night|bedtime)|hs|0-0-1", "night"),
+    (r"(?:in the )?morning and (?:at )?(?:night|evening|bedtime)|1-0-1", "morning_night"),
+    (r"every (?P<n>\d+) ?(?:hours|hrs|hr|h)|(?P<n2>\d+) ?hourly|q(?P<n3>\d+)h", "every_n_hours"),
+    (r"(?:only )?(?:as needed|when needed|if needed|as required|when required|sos|prn)", "as_needed"),
+    (r"(?:once )?(?:a |per |every )?week|weekly", "weekly"),
+    (r"(?:on )?alternate days|every other day", "alternate_days"),
+    (r"as directed|as advised|as directed by (?:the |your )?(?:doctor|physician)", "as_directed"),
+]
+
+MEAL_RELATIONS = [
+    (r"ac|before (?:meals?|food|eating)", "before_food"),
+    (r"pc|after (?:meals?|food|eating)", "after_food"),
+    (r"with (?:meals?|food)", "with_food"),
+    (r"(?:on )?(?:an )?empty stomach", "empty_stomach"),
+    (r"(?:at )?bedtime|before (?:sleep|sleeping|bed)", "bedtime"),
+    (r"anytime|any time|as directed|none|n/a|-", ""),  # nothing to say
+]
+
+DURATIONS = [
+    (r"(?:for )?(?P<n>\d+(?: ?(?:-|to) ?\d+)?) ?(?:days?|d)", "days"),
+    (r"(?:for )?(?P<n>\d+(?: ?(?:-|to) ?\d+)?) ?(?:weeks?|wks?)", "weeks"),
+    (r"(?:for )?(?P<n>\d+(?: ?(?:-|to) ?\d+)?) ?(?:months?)", "months"),
+    (r"long[- ]term|ongoing|continue|continuous(?:ly)?|until further notice|lifelong", "ongoing"),
+    (r"as prescribed|as directed|as advised", "as_prescribed"),
+]
+
+_NUMBER_WORDS = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7",
+                 "eight": "8", "nine": "9", "ten": "10", "fourteen": "14", "fifteen": "15", "thirty": "30"}
+
+# "650mg", "10 ml", "500mg + 125mg", "0.5%": spoken and written the same way in every language
+_DOSAGE = re.compile(r"\d+(?:\.\d+)? ?(?:mg|mcg|µg|g|ml|iu|%)(?: ?[+/] ?\d+(?:\.\d+)? ?(?:mg|mcg|µg|g|ml|iu|%))*",
+                     re.IGNORECASE)
+
+# ─── Phrasebook ──────────────────────────────────────────────
+# Per language: the phrase for every key, the order of the frequency/meal/duration
+# slots, the verb ("Take") and where it goes, and the sentence terminator. A duration
+# given as a pair is (singular, plural), chosen by n == "1".
+PHRASES = {
+    "en": {
+        "once_daily": "once a day", "twice_daily": "twice a day", "thrice_daily": "three times a day",
+        "four_times_daily": "four times a day", "morning": "every morning", "night": "every night",
+        "morning_night": "in the morning and at night", "every_n_hours": "every {n} hours",
+        "as_needed": "only when needed", "weekly": "once a week", "alternate_days": "on alternate days",
+        "as_directed": "as the doctor advised",
+        "before_food": "before meals", "after_food": "after meals", "with_food": "with meals",
+        "empty_stomach": "on an empty stomach", "bedtime": "at bedtime",
+        "days": ("for {n} day", "for {n} days"), "weeks": ("for {n} week", "for {n} weeks"),
+        "months": ("for {n} month", "for {n} months"), "ongoing": "regularly, without stopping",
+        "as_prescribed": "for as long as the doctor advised",
+        "order": ("freq", "meal", "duration"), "verb": "Take", "verb_first": True, "stop": ".",
+    },
+    "hi": {
+        "once_daily": "दिन में एक बार", "twice_daily": "दिन में दो बार", "thrice_daily": "दिन में तीन बार",
+        "four_times_daily": "दिन में चार बार", "morning": "रोज़ सुबह", "night": "रोज़ रात को",
+        "morning_night": "सुबह और रात को", "every_n_hours": "हर {n} घंटे में",
+        "as_needed": "केवल ज़रूरत पड़ने पर", "weekly": "हफ़्ते में एक बार", "alternate_days": "एक दिन छोड़कर",
+        "as_directed": "डॉक्टर के बताए अनुसार",
+        "before_food": "खाने से पहले", "after_food": "खाने के बाद", "with_food": "खाने के साथ",
+        "empty_stomach": "खाली पेट", "bedtime": "सोने से पहले",
+        "days": "{n} दिन तक", "weeks": "{n} हफ़्ते तक", "months": "{n} महीने तक", "ongoing": "नियमित रूप से",
+        "as_prescribed": "डॉक्टर के बताए समय तक",
+        "order": ("duration", "meal", "freq"), "verb": "लें", "verb_first": False, "stop": "।",
+    },
+    "mr": {
+        "once_daily": "दिवसातून एकदा", "twice_daily": "दिवसातून दोनदा", "thrice_daily": "दिवसातून तीनदा",
+        "four_times_daily": "दिवसातून चार वेळा", "morning": "रोज सकाळी", "night": "रोज रात्री",
+        "morning_night": "सकाळी आणि रात्री", "every_n_hours": "दर {n} तासांनी",
+        "as_needed": "फक्त गरज असल्यास", "weekly": "आठवड्यातून एकदा", "alternate_days": "एक दिवसाआड",
+        "as_directed": "डॉक्टरांनी सांगितल्याप्रमाणे",
+        "before_food": "जेवणापूर्वी", "after_food": "जेवणानंतर", "with_food": "जेवणासोबत",
+        "empty_stomach": "उपाशीपोटी", "bedtime": "झोपण्यापूर्वी",
+        "days": "{n} दिवस", "weeks": ("{n} आठवडा", "{n} आठवडे"), "months": ("{n} महिना", "{n} महिने"),
+        "ongoing": "नियमितपणे",
+        "as_prescribed": "डॉक्टरांनी सांगितलेल्या कालावधीपर्यंत",
+        "order": ("duration", "meal", "freq"), "verb": "घ्या", "verb_first": False, "stop": ".",
+    },
+    "bn": {
+        "once_daily": "দিনে একবার", "twice_daily": "দিনে দুবার", "thrice_daily": "দিনে তিনবার",
+        "four_times_daily": "দিনে চারবার", "morning": "প্রতিদিন সকালে", "night": "প্রতিদিন রাতে",
+        "morning_night": "সকালে ও রাতে", "every_n_hours": "প্রতি {n} ঘণ্টা অন্তর",
+        "as_needed": "শুধু প্রয়োজন হলে", "weekly": "সপ্তাহে একবার", "alternate_days": "একদিন অন্তর",
+        "as_directed": "ডাক্তারের পরামর্শ অনুযায়ী",
+        "before_food": "খাবারের আগে", "after_food": "খাবারের পরে", "with_food": "খাবারের সাথে",
+        "empty_stomach": "খালি পেটে", "bedtime": "ঘুমানোর আগে",
+        "days": "{n} দিন ধরে", "weeks": "{n} সপ্তাহ ধরে", "months": "{n} মাস ধরে", "ongoing": "নিয়মিত",
+        "as_prescribed": "ডাক্তারের বলা সময় পর্যন্ত",
+        "order": ("duration", "meal", "freq"), "verb": "খান", "verb_first": False, "stop": "।",
+    },
+    "ta": {
+        "once_daily": "தினமும் ஒரு முறை", "twice_daily": "தினமும் இரண்டு முறை",
+        "thrice_daily": "தினமும் மூன்று முறை", "four_times_daily": "தினமும் நான்கு முறை",
+        "morning": "தினமும் காலையில்", "night": "தினமும் இரவில்", "morning_night": "காலையிலும் இரவிலும்",
+        "every_n_hours": "ஒவ்வொரு {n} மணி நேரத்திற்கும்", "as_needed": "தேவைப்படும்போது மட்டும்",
+        "weekly": "வாரத்திற்கு ஒரு முறை", "alternate_days": "ஒரு நாள் விட்டு ஒரு நாள்",
+        "as_directed": "மருத்துவர் கூறியபடி",
+        "before_food": "உணவுக்கு முன்", "after_food": "உணவுக்குப் பின்", "with_food": "உணவுடன்",
+        "empty_stomach": "வெறும் வயிற்றில்", "bedtime": "தூங்குவதற்கு முன்",
+        "days": ("{n} நாள்", "{n} நாட்கள்"), "weeks": ("{n} வாரம்", "{n} வாரங்கள்"),
+        "months": ("{n} மாதம்", "{n} மாதங்கள்"), "ongoing": "தொடர்ந்து",
+        "as_prescribed": "மருத்துவர் கூறிய காலம் வரை",
+        "order": ("duration", "meal", "freq"), "verb": "எடுத்துக்கொள்ளுங்கள்", "verb_first": False, "stop": ".",
+    },
+    "te": {
+        "once_daily": "రోజుకు ఒకసారి", "twice_daily": "రోజుకు రెండుసార్లు", "thrice_daily": "రోజుకు మూడుసార్లు",
+        "four_times_daily": "రోజుకు నాలుగుసార్లు", "morning": "ప్రతిరోజు ఉదయం", "night": "ప్రతిరోజు రాత్రి",
+        "morning_night": "ఉదయం మరియు రాత్రి", "every_n_hours": "ప్రతి {n} గంటలకు",
+        "as_needed": "అవసరమైనప్పుడు మాత్రమే", "weekly": "వారానికి ఒకసారి", "alternate_days": "రోజు విడిచి రోజు",
+        "as_directed": "డాక్టర్ చెప్పినట్లు",
+        "before_food": "భోజనానికి ముందు", "after_food": "భోజనం తర్వాత", "with_food": "భోజనంతో పాటు",
+        "empty_stomach": "ఖాళీ కడుపుతో", "bedtime": "నిద్రపోయే ముందు",
+        "days": ("{n} రోజు", "{n} రోజులు"), "weeks": ("{n} వారం", "{n} వారాలు"),
+        "months": ("{n} నెల", "{n} నెలలు"), "ongoing": "క్రమం తప్పకుండా",
+        "as_prescribed": "డాక్టర్ చెప్పినంత కాలం",
+        "order": ("duration", "meal", "freq"), "verb": "తీసుకోండి", "verb_first": False, "stop": ".",
+    },
+    "kn": {
+        "once_daily": "ದಿನಕ್ಕೆ ಒಮ್ಮೆ", "twice_daily": "ದಿನಕ್ಕೆ ಎರಡು ಬಾರಿ", "thrice_daily": "ದಿನಕ್ಕೆ ಮೂರು ಬಾರಿ",
+        "four_times_daily": "ದಿನಕ್ಕೆ ನಾಲ್ಕು ಬಾರಿ", "morning": "ಪ್ರತಿದಿನ ಬೆಳಿಗ್ಗೆ", "night": "ಪ್ರತಿದಿನ ರಾತ್ರಿ",
+        "morning_night": "ಬೆಳಿಗ್ಗೆ ಮತ್ತು ರಾತ್ರಿ", "every_n_hours": "ಪ್ರತಿ {n} ಗಂಟೆಗೊಮ್ಮೆ",
+        "as_needed": "ಅಗತ್ಯವಿದ್ದಾಗ ಮಾತ್ರ", "weekly": "ವಾರಕ್ಕೆ ಒಮ್ಮೆ", "alternate_days": "ದಿನ ಬಿಟ್ಟು ದಿನ",
+        "as_directed": "ವೈದ್ಯರು ಹೇಳಿದಂತೆ",
+        "before_food": "ಊಟಕ್ಕೆ ಮುಂಚೆ", "after_food": "ಊಟದ ನಂತರ", "with_food": "ಊಟದೊಂದಿಗೆ",
+        "empty_stomach": "ಖಾಲಿ ಹೊಟ್ಟೆಯಲ್ಲಿ", "bedtime": "ಮಲಗುವ ಮುನ್ನ",
+        "days": ("{n} ದಿನದ ಕಾಲ", "{n} ದಿನಗಳ ಕಾಲ"), "weeks": ("{n} ವಾರದ ಕಾಲ", "{n} ವಾರಗಳ ಕಾಲ"),
+        "months": "{n} ತಿಂಗಳ ಕಾಲ", "ongoing": "ನಿಯಮಿತವಾಗಿ",
+        "as_prescribed": "ವೈದ್ಯರು ಹೇಳಿದಷ್ಟು ಕಾಲ",
+        "order": ("duration", "meal", "freq"), "verb": "ತೆಗೆದುಕೊಳ್ಳಿ", "verb_first": False, "stop": ".",
+    },
+    "ml": {
+        "once_daily": "ദിവസം ഒരു തവണ", "twice_daily": "ദിവസം രണ്ടു തവണ", "thrice_daily": "ദിവസം മൂന്നു തവണ",
+        "four_times_daily": "ദിവസം നാലു തവണ", "morning": "ദിവസവും രാവിലെ", "night": "ദിവസവും രാത്രി",
+        "morning_night": "രാവിലെയും രാത്രിയും", "every_n_hours": "ഓരോ {n} മണിക്കൂറിലും",
+        "as_needed": "ആവശ്യമുള്ളപ്പോൾ മാത്രം", "weekly": "ആഴ്ചയിൽ ഒരിക്കൽ", "alternate_days": "ഒന്നിടവിട്ട ദിവസങ്ങളിൽ",
+        "as_directed": "ഡോക്ടർ നിർദ്ദേശിച്ചതുപോലെ",
+        "before_food": "ഭക്ഷണത്തിന് മുമ്പ്", "after_food": "ഭക്ഷണത്തിന് ശേഷം", "with_food": "ഭക്ഷണത്തോടൊപ്പം",
+        "empty_stomach": "വെറും വയറ്റിൽ", "bedtime": "ഉറങ്ങുന്നതിന് മുമ്പ്",
+        "days": "{n} ദിവസം", "weeks": "{n} ആഴ്ച", "months": "{n} മാസം", "ongoing": "മുടങ്ങാതെ",
+        "as_prescribed": "ഡോക്ടർ പറഞ്ഞ കാലം വരെ",
+        "order": ("duration", "meal", "freq"), "verb": "കഴിക്കുക", "verb_first": False, "stop": ".",
+    },
+}
+
+_FREQUENCIES = [(re.compile(p), key) for p, key in FREQUENCIES]
+_MEAL_RELATIONS = [(re.compile(p), key) for p, key in MEAL_RELATIONS]
+_DURATIONS = [(re.compile(p), key) for p, key in DURATIONS]
+
+
+# ─── Parsing ─────────────────────────────────────────────────
+def _normalize(text) -> str:
+    text = re.sub(r"\s+", " ", str(text or "").lower()).strip(" .;,")
+    return re.sub(r"\b(" + "|".join(_NUMBER_WORDS) + r")\b", lambda m: _NUMBER_WORDS[m.group(1)], text)
+
+
+def _match(table, text) -> tuple[str, str | None] | None:
+    """(key, number or None) for the first pattern matching the whole text, else None."""
+    for pattern, key in table:
+        m = pattern.fullmatch(text)
+        if m is None:
+            continue
+        groups = {k: v for k, v in m.groupdict().items() if v}
+        if key is None:  # "<count> a day"
+            key = _COUNT_KEYS[re.sub(r" ?(?:times?|x)$", "", groups["count"])]
+        number = next((v for k, v in groups.items() if k.startswith("n")), None)
+        return key, number and re.sub(r" ?(?:-|to) ?", "-", number)
+    return None
+
+
+def parse_frequency(text) -> tuple[str, str | None] | None:
+    return _match(_FREQUENCIES, _normalize(text))
+
+
+def parse_meal_relation(text) -> tuple[str, str | None] | None:
+    return _match(_MEAL_RELATIONS, _normalize(text))
+
+
+def parse_duration(text) -> tuple[str, str | None] | None:
+    return _match(_DURATIONS, _normalize(text))
+
+
+# ─── Rendering ───────────────────────────────────────────────
+def _phrase(phrases: dict, key: str, number: str | None) -> str:
+    phrase = phrases[key]
+    if isinstance(phrase, tuple):
+        phrase = phrase[0] if number == "1" else phrase[1]
+    return phrase.format(n=number)
+
+
+def render_schedule(med: dict, lang_code: str) -> str | None:
+    """
+    The "name, dosage. Take <frequency> <meal relation> for <duration>." sentence for one
+    medicine in ``lang_code``, or None when a field is outside the phrasebook.
+    """
+    phrases = PHRASES.get(lang_code)
+    if phrases is None:
+        return None
+    name = str(med.get("name") or "").strip()
+    dosage = str(med.get("dosage") or "").strip()
+    if not name or (dosage and not _DOSAGE.fullmatch(dosage)):
+        return None
+
+    slots = {}
+    for slot, field, parse in (("freq", "frequency", parse_frequency),
+                               ("meal", "meal_relation", parse_meal_relation),
+                               ("duration", "duration", parse_duration)):
+        value = med.get(field)
+        if not value:
+            continue
+        parsed = parse(value)
+        if parsed is None:
+            return None
+        key, number = parsed
+        if key:
+            slots[slot] = _phrase(phrases, key, number)
+
+    sentence = f"{name}, {dosage}{phrases['stop']}" if dosage else f"{name}{phrases['stop']}"
+    if slots:
+        words = [slots[slot] for slot in phrases["order"] if slot in slots]
+        words = [phrases["verb"], *words] if phrases["verb_first"] else [*words, phrases["verb"]]
+        sentence += " " + " ".join(words) + phrases["stop"]
+    return sentence
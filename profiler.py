@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# profiler.py — on-demand wall-clock sampling profiler for the API server
+"""
+When a profile is started (server.py's admin endpoints), a thread snapshots every
+thread's Python stack with sys._current_frames() every few milliseconds, for N seconds
+or until N requests have finished, and counts identical stacks. Nothing is installed
+while no profile runs: no tracing hooks, no signal receivers, no sampler thread.
+
+Samples are attributed to the request that caused them, on whichever thread they ran:
+
+  * request threads are bound to their endpoint through Flask's request signals;
+  * metrics.stage() reports every ai_engine stage entered while profiling, with the
+    request it belongs to (the request context follows a scan onto the engine loop and
+    the CPU pool). The stage appears as a "[stage] name" frame under the frame that
+    opened it, and a request thread blocked on the engine loop gets a
+    "[waiting on] name" leaf for the stage its scan is in;
+  * the rest of an engine-loop task (e.g. JSON parsing between stages) is attributed
+    through the outermost coroutine of a task that has entered a stage.
+
+Every stack is rooted at "[METHOD /rule]", or "[thread name]" for work that belongs to
+no request. Threads parked idle outside any request are left out. Profiles download as
+collapsed stacks (flamegraph.pl, speedscope, inferno) or as a speedscope file with one
+profile per endpoint. Each worker process profiles itself only.
+"""
+import os
+import re
+import sys
+import json
+import time
+import inspect
+import threading
+import contextlib
+from collections import Counter
+
+import metrics
+
+INTERVAL_MS = float(os.getenv("SANJEEVANI_PROFILE_INTERVAL_MS", "10"))
+MAX_SECONDS = float(os.getenv("SANJEEVANI_PROFILE_MAX_S", "300"))
+MAX_DEPTH = 128
+TOP_FRAMES = 20
+
+_THREAD_NUMBER = re.compile(r"[-_]?\d+(\s*\(.*\))?$")
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_CONTEXTLIB = contextlib.__file__
+# Leaf functions of threads that are parked waiting for work
+_IDLE_LEAVES = {
+    ("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"),
+    ("thread.py", "_worker"), ("socket.py", "accept"), ("socketserver.py", "serve_forever"),
+}
+
+
+def _short_path(path: str) -> str:
+    if path.startswith(_ROOT + os.sep):
+        return os.path.relpath(path, _ROOT)
+    return os.sep.join(path.split(os.sep)[-2:])
+
+
+def _thread_label(ident: int) -> str:
+    thread = threading._active.get(ident)
+    name = thread.name if thread is not None else "unknown"
+    # "ai-engine-cpu_3" and "Thread-7 (process_request_thread)" pool as one thread kind
+    return f"[thread {_THREAD_NUMBER.sub('', name)}]"
+
+
+class _Session:
+    def __init__(self, seconds: float, requests: int | None, interval_s: float):
+        self.seconds = seconds
+        self.max_requests = requests
+        self.interval_s = interval_s
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.ticks = 0
+        self.requests_done = 0
+        self.started = time.time()
+        self.stopped: float | None = None
+        self.stop_reason: str | None = None
+        self.stop_event = threading.Event()
+        self.done = threading.Event()
+
+    def status(self) -> dict:
+        end = self.stopped or time.time()
+        return {
+            "running": self.stopped is None,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "elapsed_s": round(end - self.started, 2),
+            "seconds": self.seconds,
+            "requests": self.max_requests,
+            "requests_done": self.requests_done,
+            "interval_ms": round(self.interval_s * 1000, 2),
+            "ticks": self.ticks,
+            "samples": sum(self.stacks.values()),
+            "stop_reason": self.stop_reason,
+        }
+
+
+class SamplingProfiler:
+    """
+    One profile at a time per process. ``context`` returns (request key, endpoint label)
+    for the request running in the caller's context, or None; ``on_stop`` runs when a
+    profile ends, to detach whatever the server attached for it.
+    """
+
+    def __init__(self, context, on_stop=None):
+        self._context = context
+        self._on_stop = on_stop
+        self._lock = threading.Lock()
+        self._session: _Session | None = None
+        self._names: dict = {}
+        self._reset_tables()
+
+    def _reset_tables(self):
+        self._threads: dict[int, tuple[int, str]] = {}     # request thread → (request key, label)
+        self._frame_stages: dict = {}                      # frame → [(stage, request)] opened in it
+        self._open: dict[int, list[str]] = {}              # request key → open stages, oldest first
+        self._roots: dict = {}                             # outermost coroutine frame → request
+        self._roots_by_request: dict[int, list] = {}
+
+    @property
+    def running(self) -> bool:
+        session = self._session
+        return session is not None and session.stopped is None
+
+    # ─── Control ─────────────────────────────────────────────
+    def start(self, seconds: float, requests: int | None = None, interval_ms: float = INTERVAL_MS) -> dict:
+        """Start profiling; raises RuntimeError if a profile is already running."""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("A profile is already running")
+            self._reset_tables()
+            session = self._session = _Session(min(seconds, MAX_SECONDS), requests, max(interval_ms, 1.0) / 1000)
+        metrics.set_stage_listener(self)
+        threading.Thread(target=self._run, args=(session,), name="profiler", daemon=True).start()
+        metrics.incr("profiler.sessions")
+        return session.status()
+
+    def stop(self) -> dict | None:
+        """Stop the running profile early; returns its status (None if none was ever run)."""
+        session = self._session
+        if session is not None and session.stopped is None:
+            session.stop_reason = session.stop_reason or "stopped"
+            session.stop_event.set()
+            session.done.wait(1.0)
+        return self.status()
+
+    def status(self) -> dict | None:
+        session = self._session
+        if session is None:
+            return None
+        return {**session.status(), "summary": self.summary()}
+
+    # ─── Hooks (only called while profiling) ─────────────────
+    def request_started(self, key: int, label: str):
+        self._threads[threading.get_ident()] = (key, label)
+
+    def request_finished(self, key: int, counted: bool = True):
+        self._threads.pop(threading.get_ident(), None)
+        with self._lock:
+            self._open.pop(key, None)
+            for frame in self._roots_by_request.pop(key, ()):
+                self._roots.pop(frame, None)
+        session = self._session
+        if counted and session is not None and session.stopped is None:
+            session.requests_done += 1
+            if session.max_requests and session.requests_done >= session.max_requests:
+                session.stop_reason = "requests"
+                session.stop_event.set()
+
+    def stage_entered(self, name: str):
+        """Called by metrics.stage(); returns the token to pass to stage_exited()."""
+        frame = sys._getframe(1)
+        # Skip the stage()/_remote_stage() generators and contextlib to the frame running the with-block
+        while frame is not None and (frame.f_code.co_filename == _CONTEXTLIB
+                                     or frame.f_code.co_flags & inspect.CO_GENERATOR):
+            frame = frame.f_back
+        if frame is None:
+            return None
+        request = self._context()
+        entry = (name, request)
+        with self._lock:
+            self._frame_stages.setdefault(frame, []).append(entry)
+            if request is not None:
+                self._open.setdefault(request[0], []).append(name)
+                if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                    root = frame
+                    while root.f_back is not None and root.f_back.f_code.co_flags & inspect.CO_COROUTINE:
+                        root = root.f_back
+                    if root not in self._roots:
+                        self._roots[root] = request
+                        self._roots_by_request.setdefault(request[0], []).append(root)
+        return frame, entry
+
+    def stage_exited(self, token):
+        if token is None:
+            return
+        frame, (name, request) = token
+        with self._lock:
+            entries = self._frame_stages.get(frame)
+            if entries is not None:
+                with contextlib.suppress(ValueError):
+                    entries.remove((name, request))
+                if not entries:
+                    del self._frame_stages[frame]
+            if request is not None:
+                with contextlib.suppress(KeyError, ValueError):
+                    self._open[request[0]].remove(name)
+
+    # ─── Sampling ────────────────────────────────────────────
+    def _run(self, session: _Session):
+        deadline = time.perf_counter() + session.seconds
+        next_tick = time.perf_counter()
+        try:
+            while not session.stop_event.wait(max(0.0, next_tick - time.perf_counter())):
+                self._sample(session)
+                now = time.perf_counter()
+                if now >= deadline:
+                    session.stop_reason = "time"
+                    break
+                next_tick = max(next_tick + session.interval_s, now)
+        finally:
+            metrics.set_stage_listener(None)
+            with self._lock:
+                session.stopped = time.time()
+                session.stop_reason = session.stop_reason or "stopped"
+                self._reset_tables()
+            if self._on_stop is not None:
+                self._on_stop()
+            session.done.set()
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = (f"{getattr(code, 'co_qualname', code.co_name)} "
+                                        f"({_short_path(code.co_filename)}:{code.co_firstlineno})").replace(";", ",")
+        return name
+
+    def _sample(self, session: _Session):
+        own = threading.get_ident()
+        tick: list[tuple[str, ...]] = []
+        for ident, leaf in sys._current_frames().items():
+            if ident == own:
+                continue
+            bound = self._threads.get(ident)
+            label = bound[1] if bound else None
+            names, in_stage = [], False
+            frame, depth = leaf, 0
+            while frame is not None and depth < MAX_DEPTH:
+                for stage, request in reversed(list(self._frame_stages.get(frame, ()))):
+                    names.append(f"[stage] {stage}")
+                    in_stage = True
+                    if label is None and request is not None:
+                        label = request[1]
+                if label is None:
+                    request = self._roots.get(frame)
+                    if request is not None:
+                        label = request[1]
+                names.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+                depth += 1
+            idle = (os.path.basename(leaf.f_code.co_filename), leaf.f_code.co_name) in _IDLE_LEAVES
+            if bound and idle and not in_stage:
+                open_stages = list(self._open.get(bound[0], ()))
+                if open_stages:
+                    names.insert(0, f"[waiting on] {open_stages[-1]}")
+            elif label is None and not in_stage and idle:
+                continue
+            names.append(f"[{label}]" if label else _thread_label(ident))
+            tick.append(tuple(reversed(names)))
+        with self._lock:
+            session.ticks += 1
+            session.stacks.update(tick)
+
+    # ─── Output ──────────────────────────────────────────────
+    def _snapshot(self) -> tuple[_Session | None, Counter]:
+        with self._lock:
+            session = self._session
+            return session, (Counter(session.stacks) if session is not None else Counter())
+
+    def summary(self) -> dict:
+        """Sampled milliseconds per endpoint and per stage, and the hottest leaf functions."""
+        session, stacks = self._snapshot()
+        if session is None:
+            return {}
+        ms = session.interval_s * 1000
+        endpoints: Counter = Counter()
+        stages: dict[str, Counter] = {}
+        leaves: Counter = Counter()
+        for stack, count in stacks.items():
+            endpoints[stack[0]] += count
+            leaves[stack[-1]] += count
+            marker = next((f for f in reversed(stack) if f.startswith(("[stage] ", "[waiting on] "))), None)
+            if marker is not None:
+                kind, _, stage = marker[1:].partition("] ")
+                stages.setdefault(stage, Counter())["waiting" if kind == "waiting on" else "running"] += count
+        return {
+            "endpoints_ms": {k.strip("[]"): round(v * ms) for k, v in endpoints.most_common()},
+            "stages_ms": {k: {kind: round(n * ms) for kind, n in v.items()}
+                          for k, v in sorted(stages.items(), key=lambda kv: -sum(kv[1].values()))},
+            "top_leaves_ms": [[name, round(n * ms)] for name, n in leaves.most_common(TOP_FRAMES)],
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format: "root;caller;callee count" per line."""
+        _, stacks = self._snapshot()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def speedscope(self) -> str:
+        """A speedscope file (https://www.speedscope.app) with one sampled profile per endpoint."""
+        session, stacks = self._snapshot()
+        frames: list[dict] = []
+        index: dict[str, int] = {}
+        profiles: dict[str, dict] = {}
+        ms = session.interval_s * 1000 if session is not None else INTERVAL_MS
+        for stack, count in sorted(stacks.items()):
+            profile = profiles.setdefault(stack[0], {
+                "type": "sampled", "name": stack[0].strip("[]"), "unit": "milliseconds",
+                "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+            })
+            ids = []
+            for name in stack[1:]:
+                if name not in index:
+                    index[name] = len(frames)
+                    frames.append({"name": name})
+                ids.append(index[name])
+            profile["samples"].append(ids)
+            profile["weights"].append(count * ms)
+            profile["endValue"] += count * ms
+        ordered = sorted(profiles.values(), key=lambda p: -p["endValue"])
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": ordered,
+            "name": "sanjeevani " + (session.status()["started_at"] if session is not None else ""),
+            "activeProfileIndex": 0,
+            "exporter": "sanjeevani profiler",
+        })
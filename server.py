@@ -4,17 +4,49 @@
 """
 Start with: python server.py
 Runs on http://localhost:5000
+
+Production: gunicorn -c gunicorn.conf.py wsgi:app
 """
 import io
 import os
 import sys
+import gzip
+import hmac
 import json
+import time
 import base64
-from flask import Flask, request, jsonify, send_file
+import select
+import socket
+import functools
+import tempfile
+import threading
+from flask import (Flask, Request, Response, request, jsonify, send_file, has_request_context, request_started,
+                   request_tearing_down)
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, set_access_cookies, jwt_required, get_jwt_identity, unset_jwt_cookies
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
+import db
+import metrics
+import profiler
+import history_export
+import ai_engine
 from ai_engine import analyze_medicine_image, analyze_prescription_image
-from db import register_user, authenticate_user, save_scan, get_user_history, delete_scan
+from admission import AdmissionController, Rejection, INTERACTIVE, BATCH
+from passwords import KdfBusy
+from db import (register_user, authenticate_user, save_scan, get_user_history, get_scan, history_cursor, search_history,
+                export_history, delete_scan)
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: responses are gzip-compressed only
+    brotli = None
 
 # Fix Windows charmap codec crashes when printing Unicode model output
 if sys.stdout.encoding and sys.stdout.encoding.lower() not in ("utf-8", "utf8"):
@@ -30,7 +62,31 @@ def _safe_log(msg: str):
     except (UnicodeEncodeError, UnicodeError):
         print(msg.encode("ascii", errors="replace").decode("ascii"))
 
+
+class _FastJSONProvider(DefaultJSONProvider):
+    """orjson when it is installed: several times faster, and UTF-8 instead of \\u escapes."""
+    _options = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._options | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = _FastJSONProvider(app)
 CORS(app, supports_credentials=True)
 
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "super-secret-sanjeevani-key")
@@ -40,6 +96,117 @@ app.config["JWT_COOKIE_SAMESITE"] = "Strict"
 app.config["JWT_COOKIE_CSRF_PROTECT"] = False
 jwt = JWTManager(app)
 
+
+# ─── Uploads ─────────────────────────────────────────────────
+# Photos are capped at SANJEEVANI_MAX_UPLOAD_MB, rejected from the Content-Length header
+# before the body is read or an analysis slot is taken. Accepted uploads are spooled to
+# a temp file past SANJEEVANI_UPLOAD_SPOOL_KB, and ai_engine decodes straight from that
+# file, so a worker never holds a whole 48 MP photo in memory as bytes.
+MAX_UPLOAD_MB = float(os.getenv("SANJEEVANI_MAX_UPLOAD_MB", "20"))
+UPLOAD_SPOOL_BYTES = int(os.getenv("SANJEEVANI_UPLOAD_SPOOL_KB", "256")) * 1024
+
+
+class _SpooledUploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, mode="rb+")
+
+
+app.request_class = _SpooledUploadRequest
+app.config["MAX_CONTENT_LENGTH"] = int(MAX_UPLOAD_MB * 1_048_576)
+
+
+@app.before_request
+def _reject_oversized_upload():
+    if request.content_length is not None and request.content_length > app.config["MAX_CONTENT_LENGTH"]:
+        raise RequestEntityTooLarge()
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def _upload_too_large(_e):
+    _safe_log(f"[WARN] Upload rejected: {request.content_length} bytes")
+    return jsonify({"error": f"Image is too large. Please upload a photo under {MAX_UPLOAD_MB:g} MB."}), 413
+
+# ─── Response size ───────────────────────────────────────────
+# Analyze responses carry the whole result plus inlined audio, and on slow mobile links
+# transfer is a large share of the wait. JSON and text bodies are compressed with brotli
+# (pip install brotli) or gzip, whichever the client prefers, and clients can pass
+# ``fields=`` to receive only what they render (see _fields_response).
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = int(os.getenv("SANJEEVANI_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("SANJEEVANI_BROTLI_QUALITY", "5"))
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+@app.after_request
+def _compress_response(response):
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or not (response.mimetype or "").startswith(_COMPRESSIBLE_TYPES)):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    br_quality = request.accept_encodings["br"] if brotli is not None else 0
+    gzip_quality = request.accept_encodings["gzip"]
+    if br_quality and br_quality >= gzip_quality:
+        encoded, encoding = brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    elif gzip_quality:
+        encoded, encoding = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    else:
+        return response
+    response.set_data(encoded)
+    response.headers["Content-Encoding"] = encoding
+    metrics.incr(f"compression.{encoding}")
+    metrics.incr("compression.bytes_saved", len(body) - len(encoded))
+    return response
+
+
+# Status keys survive any projection so clients can always tell success from failure
+_ALWAYS_INCLUDED = ("success", "error", "message")
+
+
+def _field_tree(spec: str) -> dict:
+    """"data.medicines.name,audio_b64" → {"data": {"medicines": {"name": None}}, "audio_b64": None}"""
+    tree: dict = {}
+    for path in spec.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        node = tree
+        for i, part in enumerate(parts):
+            if part in node and node[part] is None:
+                break  # the whole subtree is already selected
+            if i == len(parts) - 1:
+                node[part] = None
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value, tree: dict | None):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _project(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+def _fields_response(payload: dict):
+    """
+    jsonify(payload), trimmed to the comma-separated dotted paths in the ``fields``
+    parameter if the client sent one. Paths start at the top of the response and apply
+    to every item of a list, e.g. ``fields=data.medicine_name,data.uses`` or
+    ``fields=history.id,history.medicine_names,next_before``.
+    """
+    spec = request.values.get("fields", "").strip()
+    if not spec:
+        return jsonify(payload)
+    tree = _field_tree(spec)
+    tree.update({key: None for key in _ALWAYS_INCLUDED})
+    return jsonify(_project(payload, tree))
+
+
 # Audio file cache: filename → absolute path on disk
 _audio_cache: dict[str, str] = {}
 
@@ -55,7 +222,100 @@ LANG_CODE_MAP = {
 }
 
 
+# ─── Admission control ───────────────────────────────────────
+# Analyses hold a worker for 10-30s of Groq/TTS round trips. Per-client token buckets
+# stop any one user or IP from flooding the endpoints (429); a global concurrency cap
+# with a bounded, weighted-fair queue sheds overload quickly (503) instead of piling
+# requests up behind the running scans. Limits are per worker process.
+# Clients mark bulk traffic (e.g. clinic scripts) with the header "X-Request-Class: batch".
+MAX_CONCURRENT_ANALYSES = int(os.getenv("SANJEEVANI_MAX_CONCURRENT_ANALYSES", "16"))
+MAX_QUEUED_ANALYSES = int(os.getenv("SANJEEVANI_MAX_QUEUED_ANALYSES", "32"))
+QUEUE_TIMEOUT_S = float(os.getenv("SANJEEVANI_QUEUE_TIMEOUT", "30"))
+
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_ANALYSES,
+    max_queue=MAX_QUEUED_ANALYSES,
+    queue_timeout=QUEUE_TIMEOUT_S,
+    weights={
+        INTERACTIVE: float(os.getenv("SANJEEVANI_INTERACTIVE_WEIGHT", "4")),
+        BATCH: float(os.getenv("SANJEEVANI_BATCH_WEIGHT", "1")),
+    },
+    max_queued_per_client=int(os.getenv("SANJEEVANI_MAX_QUEUED_PER_CLIENT", "4")),
+    user_rate_per_min=float(os.getenv("SANJEEVANI_USER_SCANS_PER_MIN", "6")),
+    user_burst=float(os.getenv("SANJEEVANI_USER_BURST", "4")),
+    ip_rate_per_min=float(os.getenv("SANJEEVANI_IP_SCANS_PER_MIN", "6")),
+    ip_burst=float(os.getenv("SANJEEVANI_IP_BURST", "4")),
+)
+
+# Behind the Next.js proxy every request comes from 127.0.0.1; set this to the number
+# of trusted proxies so the per-IP buckets (which logged-in requests are charged to as
+# well) see the real client address.
+PROXY_HOPS = int(os.getenv("SANJEEVANI_PROXY_HOPS", "0"))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
+
+
+def analysis_slot(view):
+    """Admit the request through the admission controller before running the view."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        traffic_class = BATCH if request.headers.get("X-Request-Class", "").lower() == BATCH else INTERACTIVE
+        decision = admission.acquire(get_jwt_identity(), request.remote_addr, traffic_class)
+        if isinstance(decision, Rejection):
+            _safe_log(f"[WARN] Analysis rejected with {decision.status}: {decision.reason}")
+            resp = jsonify({"error": decision.reason})
+            resp.status_code = decision.status
+            resp.headers["Retry-After"] = str(decision.retry_after)
+            return resp
+        try:
+            return view(*args, **kwargs)
+        finally:
+            decision.release()
+    return wrapper
+
+
+# ─── Client disconnects ──────────────────────────────────────
+# A user who leaves the scan page aborts the fetch, and the Next.js proxy closes its
+# connection to us. The analyze views hand ai_engine a CancelToken that peeks at the
+# request's socket, so an abandoned scan stops instead of paying for its remaining Groq
+# and TTS calls. Only servers that expose the socket (gunicorn, werkzeug) can detect it.
+_PEEK_FLAGS = socket.MSG_PEEK | getattr(socket, "MSG_DONTWAIT", 0)
+
+
+def _peer_closed(sock) -> bool:
+    """Whether the other end of ``sock`` has closed it (pipelined data does not count)."""
+    try:
+        if hasattr(select, "poll"):  # no FD_SETSIZE limit; gevent's patched select has no poll()
+            poller = select.poll()
+            poller.register(sock, select.POLLIN)
+            readable = bool(poller.poll(0))
+        else:
+            readable = bool(select.select([sock], [], [], 0)[0])
+        return readable and sock.recv(1, _PEEK_FLAGS) == b""
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        return False  # no data yet, or a socket we cannot inspect
+
+
+def _disconnect_token() -> "ai_engine.CancelToken | None":
+    """CancelToken that fires once the current request's client hangs up."""
+    sock = request.environ.get("gunicorn.socket") or request.environ.get("werkzeug.socket")
+    if sock is None:
+        return None
+    return ai_engine.CancelToken(check=lambda: _peer_closed(sock))
+
+
 # ─── Auth ────────────────────────────────────────────────────
+@app.errorhandler(KdfBusy)
+def _kdf_busy(_e):
+    _safe_log("[WARN] Password check rejected: KDF pool saturated")
+    resp = jsonify({"success": False, "message": "Too many sign-ins right now. Please try again in a moment."})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+
 @app.route("/api/auth/register", methods=["POST"])
 def api_register():
     data = request.get_json()
@@ -97,18 +357,27 @@ def api_logout():
 # ─── Analysis ────────────────────────────────────────────────
 @app.route("/api/analyze/medicine", methods=["POST"])
 @jwt_required(optional=True)
+@analysis_slot
 def api_analyze_medicine():
     if "image" not in request.files:
         return jsonify({"error": "No image provided"}), 400
 
+    # "fused" reads and analyzes the strip in one vision call; "two-stage" is OCR then analysis
+    mode = request.values.get("mode") or None
+    if mode is not None and mode not in ai_engine.MEDICINE_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(ai_engine.MEDICINE_MODES)}"}), 400
+
     image_file = request.files["image"]
     language_code = request.form.get("language", "en")
     user_id = get_jwt_identity()
     language = LANG_CODE_MAP.get(language_code, "English")
 
-    image_bytes = image_file.read()
-    data, audio_b64 = analyze_medicine_image(image_bytes, target_language=language)
+    data, audio_b64 = analyze_medicine_image(image_file.stream, target_language=language, mode=mode, cancel=_disconnect_token())
 
+    if data.get("cancelled"):
+        return jsonify(data), 499  # nginx's "client closed request": nobody is left to read it
+    if data.get("retake_photo"):
+        return jsonify(data), 422
     if "error" in data:
         _safe_log(f"[ERROR] Medicine analysis failed: {data['error']}")
         return jsonify(data), 500
@@ -124,11 +393,12 @@ def api_analyze_medicine():
     if audio_b64:
         response["audio_b64"] = audio_b64
 
-    return jsonify(response)
+    return _fields_response(response)
 
 
 @app.route("/api/analyze/prescription", methods=["POST"])
 @jwt_required(optional=True)
+@analysis_slot
 def api_analyze_prescription():
     if "image" not in request.files:
         return jsonify({"error": "No image provided"}), 400
@@ -138,9 +408,12 @@ def api_analyze_prescription():
     user_id = get_jwt_identity()
     language = LANG_CODE_MAP.get(language_code, "English")
 
-    image_bytes = image_file.read()
-    data, audio_b64 = analyze_prescription_image(image_bytes, target_language=language)
+    data, audio_b64 = analyze_prescription_image(image_file.stream, target_language=language, cancel=_disconnect_token())
 
+    if data.get("cancelled"):
+        return jsonify(data), 499  # nginx's "client closed request": nobody is left to read it
+    if data.get("retake_photo"):
+        return jsonify(data), 422
     if "error" in data:
         _safe_log(f"[ERROR] Prescription analysis failed: {data['error']}")
         return jsonify(data), 500
@@ -156,7 +429,7 @@ def api_analyze_prescription():
     if audio_b64:
         response["audio_b64"] = audio_b64
 
-    return jsonify(response)
+    return _fields_response(response)
 
 
 # ─── Audio serving ───────────────────────────────────────────
@@ -175,8 +448,55 @@ def serve_audio(filename):
 @jwt_required()
 def api_history():
     jwt_user = get_jwt_identity()
-    history = get_user_history(int(jwt_user))
-    return jsonify({"success": True, "history": history})
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 100)
+    try:
+        history = get_user_history(int(jwt_user), limit=limit, before=request.args.get("before"))
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid cursor"}), 400
+    next_before = history_cursor(history[-1]) if len(history) == limit else None
+    return _fields_response({"success": True, "history": history, "next_before": next_before})
+
+
+@app.route("/api/history/search", methods=["GET"])
+@jwt_required()
+def api_history_search():
+    jwt_user = get_jwt_identity()
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"success": False, "message": "Search text is required"}), 400
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 50)
+    results = search_history(int(jwt_user), query, limit=limit)
+    return _fields_response({"success": True, "history": results})
+
+
+@app.route("/api/history/export", methods=["GET"])
+@jwt_required()
+def api_history_export():
+    """
+    The whole history as ``format=ndjson`` (one scan per line, full results) or
+    ``format=csv`` (one row per medicine), streamed straight from a database cursor.
+    """
+    jwt_user = get_jwt_identity()
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in history_export.FORMATS:
+        return jsonify({"success": False, "message": f"format must be one of: {', '.join(history_export.FORMATS)}"}), 400
+    metrics.incr(f"history_export.{fmt}")
+    chunks = history_export.export_chunks(export_history(int(jwt_user)), fmt)
+    resp = Response(chunks, mimetype=history_export.FORMATS[fmt])
+    filename = f"sanjeevani-history-{time.strftime('%Y%m%d')}.{fmt}"
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp.headers["X-Accel-Buffering"] = "no"  # let nginx pass chunks through as they come
+    return resp
+
+
+@app.route("/api/history/<int:scan_id>", methods=["GET"])
+@jwt_required()
+def api_get_scan(scan_id):
+    jwt_user = get_jwt_identity()
+    scan = get_scan(int(jwt_user), scan_id)
+    if scan is None:
+        return jsonify({"success": False, "message": "Scan not found"}), 404
+    return _fields_response({"success": True, "scan": scan})
 
 
 @app.route("/api/history/<int:scan_id>", methods=["DELETE"])
@@ -187,12 +507,155 @@ def api_delete_scan(scan_id):
     return jsonify({"success": deleted})
 
 
+# ─── Admin: metrics and profiling ────────────────────────────
+# Operator endpoints: this worker's counters (single-flight dedupes, cancelled scans,
+# cache hits, token usage, ...) and admission state, and the sampling profiler (see
+# profiler.py) for latency investigations. The admin API exists only when
+# SANJEEVANI_ADMIN_TOKEN is set; callers send it in the X-Admin-Token header. Nothing
+# below runs on the request path until a profile is started: the request signal
+# receivers are connected for the profile's duration only. Counters and profiles are
+# per gunicorn worker, so with several workers repeat the call or run a single worker
+# while investigating.
+ADMIN_TOKEN = os.getenv("SANJEEVANI_ADMIN_TOKEN", "")
+
+
+def admin_required(view):
+    """404 unless the request carries the admin token (so the admin API is not discoverable)."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        supplied = request.headers.get("X-Admin-Token", "")
+        if not ADMIN_TOKEN or not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({"error": "Not found"}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _profile_context() -> tuple[int, str] | None:
+    """(request key, "METHOD /rule") of the request whose context this runs in."""
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return id(request._get_current_object()), f"{request.method} {rule}"
+
+
+def _profile_request_started(sender, **extra):
+    profiler_session.request_started(*_profile_context())
+
+
+def _profile_request_finished(sender, **extra):
+    key, _ = _profile_context()
+    profiler_session.request_finished(key, counted=not request.path.startswith("/api/admin/"))
+
+
+def _detach_profiler():
+    request_started.disconnect(_profile_request_started)
+    request_tearing_down.disconnect(_profile_request_finished)
+
+
+profiler_session = profiler.SamplingProfiler(context=_profile_context, on_stop=_detach_profiler)
+
+
+@app.route("/api/admin/metrics", methods=["GET"])
+@admin_required
+def api_admin_metrics():
+    """This worker's counters and admission-control state."""
+    return jsonify({
+        "success": True,
+        "pid": os.getpid(),
+        "counters": metrics.counters(),
+        "admission": admission.stats(),
+    })
+
+
+@app.route("/api/admin/profile", methods=["POST"])
+@admin_required
+def api_profile_start():
+    """Start sampling for ``seconds`` (default 30) or until ``requests`` requests have finished."""
+    params = request.get_json(silent=True) or request.values
+    try:
+        seconds = float(params.get("seconds", 30))
+        requests = int(params["requests"]) if params.get("requests") else None
+        interval_ms = float(params.get("interval_ms", profiler.INTERVAL_MS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds, requests and interval_ms must be numbers"}), 400
+    if seconds <= 0 or (requests is not None and requests <= 0):
+        return jsonify({"error": "seconds and requests must be positive"}), 400
+    request_started.connect(_profile_request_started)
+    request_tearing_down.connect(_profile_request_finished)
+    try:
+        status = profiler_session.start(seconds, requests, interval_ms)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    _safe_log(f"[INFO] Profiling started: {status['seconds']}s, requests={requests}, every {status['interval_ms']} ms")
+    return jsonify({"success": True, "profile": status})
+
+
+@app.route("/api/admin/profile", methods=["GET"])
+@admin_required
+def api_profile_status():
+    """State of the running or last profile, with time per endpoint and per stage."""
+    status = profiler_session.status()
+    if status is None:
+        return jsonify({"error": "No profile has been taken"}), 404
+    return jsonify({"success": True, "profile": status})
+
+
+@app.route("/api/admin/profile", methods=["DELETE"])
+@admin_required
+def api_profile_stop():
+    status = profiler_session.stop()
+    if status is None:
+        return jsonify({"error": "No profile has been taken"}), 404
+    return jsonify({"success": True, "profile": status})
+
+
+@app.route("/api/admin/profile/download", methods=["GET"])
+@admin_required
+def api_profile_download():
+    """The profile as ``format=collapsed`` (flamegraph.pl/inferno) or ``format=speedscope``."""
+    if profiler_session.status() is None:
+        return jsonify({"error": "No profile has been taken"}), 404
+    fmt = request.args.get("format", "speedscope")
+    if fmt == "collapsed":
+        body, mimetype, ext = profiler_session.collapsed(), "text/plain", "txt"
+    elif fmt == "speedscope":
+        body, mimetype, ext = profiler_session.speedscope(), "application/json", "speedscope.json"
+    else:
+        return jsonify({"error": "format must be collapsed or speedscope"}), 400
+    resp = Response(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="profile-{os.getpid()}.{ext}"'
+    return resp
+
+
 # ─── Health check ────────────────────────────────────────────
 @app.route("/api/health", methods=["GET"])
 def health():
     return jsonify({"status": "ok"})
 
 
+# ─── Warm-up ─────────────────────────────────────────────────
+# Importing this module is cheap: the database, OpenCV/PIL, Groq and Edge TTS load on
+# first use. Serving processes call this once the port is bound so that loading happens
+# in the background instead of inside the first request.
+def warm_up_in_background() -> threading.Thread:
+    def _warm():
+        started = time.perf_counter()
+        try:
+            db.init()
+            ai_engine.warm_up()
+        except Exception as e:
+            _safe_log(f"[Warm-up] failed, loading on first request instead: {e}")
+            return
+        _safe_log(f"[Warm-up] ready in {time.perf_counter() - started:.2f}s")
+
+    thread = threading.Thread(target=_warm, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
 if __name__ == "__main__":
     print("🌿 Sanjeevani API server starting on http://localhost:5000")
+    # With debug=True the reloader re-runs this file in a child that does the serving
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up_in_background()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,16 @@
+import { NextResponse } from "next/server";
+
+// Headers from the Python API worth passing on to the browser. fetch() has already
+// decoded any gzip/brotli body, so Content-Encoding and Content-Length must not be copied;
+// Next.js compresses the response to the browser itself.
+const FORWARDED_HEADERS = ["content-type", "content-disposition", "retry-after"];
+
+/** Stream a Python API response to the browser as-is, without parsing and re-serializing the JSON. */
+export function passThrough(response: Response): NextResponse {
+  const headers = new Headers();
+  for (const name of FORWARDED_HEADERS) {
+    const value = response.headers.get(name);
+    if (value) headers.set(name, value);
+  }
+  return new NextResponse(response.body, { status: response.status, headers });
+}
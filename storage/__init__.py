@@ -0,0 +1,19 @@
+# storage — persistence backends behind db.py
+"""
+SQLite (the default) keeps everything in one local file. PostgreSQL lets several API
+nodes behind a load balancer share users, history and caches; it needs
+``pip install "psycopg[binary,pool]"``.
+"""
+from storage.base import Storage
+
+
+def open_storage(url: str) -> Storage:
+    """Backend for a postgresql:// URL, a sqlite:/// URL or a plain SQLite file path."""
+    if url.startswith(("postgresql://", "postgres://")):
+        from storage.postgres import PostgresStorage
+        return PostgresStorage(url)
+    from storage.sqlite import SQLiteStorage
+    return SQLiteStorage(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)
+
+
+__all__ = ["Storage", "open_storage"]
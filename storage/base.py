@@ -0,0 +1,111 @@
+# storage/base.py — the interface every storage backend implements
+import re
+import unicodedata
+from typing import Iterator
+
+# Rows fetched per round trip when streaming a whole history (iter_scans)
+EXPORT_FETCH_ROWS = 200
+
+
+class Storage:
+    """
+    Users, scan history and small key/value caches. Backends must be safe to share
+    between threads and must reopen their connections after a fork (gunicorn workers).
+    History entries are dicts with id, scan_type, language, medicine_names,
+    medicine_count and created_at (ISO 8601); get_scan adds the full ``result``.
+    """
+
+    def migrate(self):
+        """Create or upgrade the schema. Safe to run concurrently from several processes."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release pooled connections held by this process."""
+
+    # ─── users ───────────────────────────────────────────────
+    def create_user(self, username: str, password_hash: str) -> bool:
+        """Insert a user. Returns False if the username is taken."""
+        raise NotImplementedError
+
+    def get_user(self, username: str) -> tuple[int, str] | None:
+        """(user_id, password_hash) for a username, or None."""
+        raise NotImplementedError
+
+    def set_password_hash(self, user_id: int, password_hash: str):
+        raise NotImplementedError
+
+    # ─── scans ───────────────────────────────────────────────
+    def save_scan(self, user_id: int, scan_type: str, language: str, result_data: dict) -> int:
+        raise NotImplementedError
+
+    def list_scans(self, user_id: int, limit: int, before: tuple[str, int] | None) -> list[dict]:
+        """Newest first; ``before`` is the (created_at, id) of the last entry already shown."""
+        raise NotImplementedError
+
+    def get_scan(self, user_id: int, scan_id: int) -> dict | None:
+        raise NotImplementedError
+
+    def search_scans(self, user_id: int, words: list[str], limit: int) -> list[dict]:
+        """Scans where every word is a prefix of an indexed word, best matches first."""
+        raise NotImplementedError
+
+    def iter_scans(self, user_id: int) -> Iterator[dict]:
+        """
+        Every scan of a user with its full result, oldest first, read through a cursor a
+        batch at a time. Holds a connection until exhausted or closed.
+        """
+        raise NotImplementedError
+
+    def delete_scan(self, user_id: int, scan_id: int) -> bool:
+        raise NotImplementedError
+
+    # ─── caches ──────────────────────────────────────────────
+    def cache_get(self, namespace: str, key: str) -> bytes | None:
+        """Cached value, or None. A hit counts as a use for cache_trim."""
+        raise NotImplementedError
+
+    def cache_put(self, namespace: str, key: str, value: bytes):
+        raise NotImplementedError
+
+    def cache_trim(self, namespace: str, max_bytes: int) -> int:
+        """Drop least recently used entries until the namespace fits. Returns entries removed."""
+        raise NotImplementedError
+
+
+def scan_summary(scan_type: str, result_data: dict) -> tuple[list[str], int]:
+    """Medicine names and count shown in the history list, extracted once at save time."""
+    if scan_type == "medicine":
+        name = result_data.get("medicine_name")
+        return ([name] if name else []), 1
+    medicines = [m for m in result_data.get("medicines") or [] if isinstance(m, dict)]
+    return [m.get("name") or "Unknown" for m in medicines], len(medicines)
+
+
+def search_fields(scan_type: str, result_data: dict) -> tuple[str, str, str, str]:
+    """Text indexed for history search: medicine names, salts, diagnosis and doctor."""
+    def _words(values) -> str:
+        return " ".join(str(v) for v in values if v)
+
+    if scan_type == "medicine":
+        # A strip has no diagnosis; the conditions it treats are the closest thing
+        return (
+            _words([result_data.get("medicine_name")]),
+            _words(result_data.get("active_salts") or []),
+            _words(result_data.get("conditions") or []),
+            "",
+        )
+    medicines = [m for m in result_data.get("medicines") or [] if isinstance(m, dict)]
+    doctor = result_data.get("doctor_info") or {}
+    return (
+        _words(m.get("name") for m in medicines),
+        _words(salt for m in medicines for salt in (m.get("active_salts") or [])),
+        _words([result_data.get("diagnosis")]),
+        _words([doctor.get("name") if isinstance(doctor, dict) else None]),
+    )
+
+
+def search_words(text: str) -> list[str]:
+    """Lower-cased, accent-free words, as indexed and as searched."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.findall(r"[^\W_]+", text)
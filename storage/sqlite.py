@@ -0,0 +1,647 @@
+# storage/sqlite.py — single-file SQLite backend (the default)
+"""
+Connections are pooled per process and opened in WAL mode, so history reads never wait
+behind a scan being saved. All writes go through a single writer thread that
+group-commits whatever arrived within a couple of milliseconds in one transaction,
+which turns N concurrent fsyncs into one and avoids "database is locked" between
+Flask threads. Each pooled connection keeps its own prepared-statement cache.
+
+Scan results are stored compressed (see "Result compression" below); the history list
+reads only the summary columns, so a blob is decompressed only when its scan is opened.
+"""
+import os
+import json
+import time
+import zlib
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from datetime import datetime
+
+from storage.base import EXPORT_FETCH_ROWS, Storage, scan_summary, search_fields, search_words
+
+try:
+    import zstandard
+except ImportError:  # optional: results are then stored with zlib only
+    zstandard = None
+
+POOL_SIZE = int(os.getenv("SANJEEVANI_DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = 5000
+GROUP_COMMIT_WINDOW_S = 0.002   # how long the writer waits for more writes to batch
+GROUP_COMMIT_MAX_BATCH = 64
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",        # durable at checkpoints; safe with WAL
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",         # 16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",       # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Result blob formats (first byte of result_json). Rows written before compression
+# are plain JSON text and are still read as such.
+RESULT_FORMAT_ZLIB = 1          # 0x01 + zlib stream
+RESULT_FORMAT_ZSTD_DICT = 2     # 0x02 + 4-byte dictionary id + zstd frame
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 12
+ZSTD_DICT_SIZE = 32 * 1024
+ZSTD_MIN_SAMPLES = 200          # fewer results than this train a dictionary that barely helps
+ZSTD_TRAIN_SAMPLES = 5000
+_DICT_REFRESH_S = 300           # how often workers look for a dictionary trained elsewhere
+MIGRATION_BATCH_ROWS = 500      # rows re-encoded per transaction by long data migrations
+
+_SUMMARY_COLUMNS = "id, scan_type, language, medicine_names, medicine_count, created_at"
+
+
+class _WriteJob:
+    __slots__ = ("fn", "done", "result", "error")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+def _summary_entry(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "scan_type": row["scan_type"],
+        "language": row["language"],
+        "medicine_names": json.loads(row["medicine_names"]),
+        "medicine_count": row["medicine_count"],
+        "created_at": row["created_at"]
+    }
+
+
+def _search_terms(user_id: int, text: str) -> list[str]:
+    """
+    Search words, each prefixed with "u<user_id>x". Every user gets their own slice of
+    the term index, so a prefix query only scans that user's postings instead of every
+    user's scans containing the word.
+    """
+    return [f"u{user_id}x{word}" for word in search_words(text)]
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str):
+        self.path = path
+        self._pool: queue.LifoQueue | None = None
+        self._write_queue: queue.Queue | None = None
+        self._writer: threading.Thread | None = None
+        self._owner_pid: int | None = None
+        self._state_lock = threading.Lock()
+        self._codec_local = threading.local()
+        self._dicts: dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self._current_dict = {"id": None, "checked": None}
+
+    # ─── Connections and the writer thread ───────────────────
+    def _connect(self, autocommit: bool = False) -> sqlite3.Connection:
+        """Open a tuned connection. ``autocommit`` leaves transaction control to the caller."""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=256,
+            isolation_level=None if autocommit else "",
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in _PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _ensure_started(self):
+        """Create the pool and writer for this process (connections and threads don't survive fork)."""
+        if self._owner_pid == os.getpid():
+            return
+        with self._state_lock:
+            if self._owner_pid == os.getpid():
+                return
+            self._pool = queue.LifoQueue(maxsize=POOL_SIZE)
+            self._write_queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, args=(self._write_queue,), name="db-writer",
+                                            daemon=True)
+            self._writer.start()
+            self._owner_pid = os.getpid()
+
+    @contextmanager
+    def _get_conn(self):
+        """Borrow a pooled read connection."""
+        self._ensure_started()
+        pool = self._pool
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _writer_loop(self, jobs: queue.Queue):
+        """
+        Apply queued writes in batches: one transaction and one commit per batch. A None
+        job (from close()) stops the loop once the writes queued before it are committed.
+        """
+        conn = self._connect(autocommit=True)
+        stopping = False
+        while not stopping:
+            job = jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.monotonic() + GROUP_COMMIT_WINDOW_S
+            while len(batch) < GROUP_COMMIT_MAX_BATCH:
+                try:
+                    job = jobs.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for job in batch:
+                    # A savepoint per job: one failing write (e.g. duplicate username) must not
+                    # roll back the others sharing the transaction.
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        job.result = job.fn(conn)
+                        conn.execute("RELEASE job")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                        job.error = e
+                conn.execute("COMMIT")
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                for job in batch:
+                    job.error = job.error or e
+            finally:
+                for job in batch:
+                    job.done.set()
+        conn.close()
+
+    def _write(self, fn, wait: bool = True):
+        """
+        Run ``fn(conn)`` on the writer thread, wait for its batch to commit and return its
+        result. With ``wait=False`` the write is queued and forgotten.
+        """
+        self._ensure_started()
+        job = _WriteJob(fn)
+        self._write_queue.put(job)
+        if not wait:
+            return None
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def close(self):
+        """Commit the writes still queued (including unawaited ones), then close every connection."""
+        if self._owner_pid != os.getpid():
+            return
+        self._write_queue.put(None)
+        self._writer.join()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._owner_pid = None
+
+    # ─── Result compression ──────────────────────────────────
+    # Prescription results are long, repetitive JSON. With the zstandard package installed,
+    # a dictionary trained on past results (stored in result_dicts) compresses each one
+    # several-fold; otherwise zlib is used. Every blob names its format, so rows written
+    # under older dictionaries or without zstandard stay readable.
+    def _load_dict(self, dict_id: int, conn: sqlite3.Connection | None = None):
+        zdict = self._dicts.get(dict_id)
+        if zdict is None:
+            if conn is None:
+                with self._get_conn() as conn:
+                    row = conn.execute("SELECT dict FROM result_dicts WHERE id = ?", (dict_id,)).fetchone()
+            else:
+                row = conn.execute("SELECT dict FROM result_dicts WHERE id = ?", (dict_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown compression dictionary {dict_id}")
+            zdict = self._dicts[dict_id] = zstandard.ZstdCompressionDict(row["dict"])
+        return zdict
+
+    def _current_dict_id(self) -> int | None:
+        """Newest trained dictionary, re-checked every few minutes."""
+        if zstandard is None:
+            return None
+        now = time.monotonic()
+        current = self._current_dict
+        if current["checked"] is None or now - current["checked"] > _DICT_REFRESH_S:
+            with self._get_conn() as conn:
+                row = conn.execute("SELECT MAX(id) AS id FROM result_dicts").fetchone()
+            current.update(id=row["id"], checked=now)
+        return current["id"]
+
+    def _codec(self, kind: str, dict_id: int, conn: sqlite3.Connection | None = None):
+        """Per-thread zstd (de)compressor for a dictionary; they are not safe to share."""
+        cache = self._codec_local.__dict__.setdefault(kind, {})
+        codec = cache.get(dict_id)
+        if codec is None:
+            zdict = self._load_dict(dict_id, conn)
+            if kind == "c":
+                codec = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=zdict)
+            else:
+                codec = zstandard.ZstdDecompressor(dict_data=zdict)
+            cache[dict_id] = codec
+        return codec
+
+    def _encode_result(self, result_data: dict, dict_id: int | None, conn: sqlite3.Connection | None = None) -> bytes:
+        raw = json.dumps(result_data, ensure_ascii=False).encode("utf-8")
+        if dict_id is not None:
+            return (bytes([RESULT_FORMAT_ZSTD_DICT]) + dict_id.to_bytes(4, "big")
+                    + self._codec("c", dict_id, conn).compress(raw))
+        return bytes([RESULT_FORMAT_ZLIB]) + zlib.compress(raw, ZLIB_LEVEL)
+
+    def _decode_result(self, value: str | bytes, conn: sqlite3.Connection | None = None) -> dict:
+        if isinstance(value, str):
+            return json.loads(value)  # stored before compression was introduced
+        fmt = value[0]
+        if fmt == RESULT_FORMAT_ZLIB:
+            raw = zlib.decompress(memoryview(value)[1:])
+        elif fmt == RESULT_FORMAT_ZSTD_DICT:
+            if zstandard is None:
+                raise RuntimeError("This scan was stored with zstd; install the 'zstandard' package to read it.")
+            dict_id = int.from_bytes(value[1:5], "big")
+            raw = self._codec("d", dict_id, conn).decompress(value[5:])
+        else:
+            raise ValueError(f"Unknown result format {fmt}")
+        return json.loads(raw)
+
+    def _train_result_dict(self, conn: sqlite3.Connection) -> int | None:
+        """Train a zstd dictionary on the newest results and store it. Returns its id."""
+        if zstandard is None:
+            return None
+        rows = conn.execute(
+            "SELECT result_json FROM scan_history ORDER BY id DESC LIMIT ?", (ZSTD_TRAIN_SAMPLES,)
+        ).fetchall()
+        if len(rows) < ZSTD_MIN_SAMPLES:
+            return None
+        samples = [
+            json.dumps(self._decode_result(row["result_json"], conn), ensure_ascii=False).encode("utf-8")
+            for row in rows
+        ]
+        zdict = zstandard.train_dictionary(ZSTD_DICT_SIZE, samples, level=ZSTD_LEVEL)
+        return conn.execute(
+            "INSERT INTO result_dicts (dict, created_at) VALUES (?, ?)",
+            (zdict.as_bytes(), datetime.now().isoformat())
+        ).lastrowid
+
+    def _recompress_batch(self, conn: sqlite3.Connection, after_id: int, dict_id: int | None,
+                          batch: int | None = None, plain_only: bool = False) -> int | None:
+        """
+        Re-encode up to ``batch`` (default MIGRATION_BATCH_ROWS) rows with id > after_id.
+        Rows already in the target format are skipped; with ``plain_only``, so is every
+        compressed row. Returns the last id seen, or None when done.
+        """
+        rows = conn.execute(
+            "SELECT id, result_json FROM scan_history WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, batch or MIGRATION_BATCH_ROWS)
+        ).fetchall()
+        if plain_only:
+            prefixes = (bytes([RESULT_FORMAT_ZLIB]), bytes([RESULT_FORMAT_ZSTD_DICT]))
+        elif dict_id is not None:
+            prefixes = (bytes([RESULT_FORMAT_ZSTD_DICT]) + dict_id.to_bytes(4, "big"),)
+        else:
+            prefixes = (bytes([RESULT_FORMAT_ZLIB]),)
+        for row in rows:
+            value = row["result_json"]
+            if isinstance(value, bytes) and value.startswith(prefixes):
+                continue
+            conn.execute(
+                "UPDATE scan_history SET result_json = ? WHERE id = ?",
+                (self._encode_result(self._decode_result(value, conn), dict_id, conn), row["id"])
+            )
+        return rows[-1]["id"] if rows else None
+
+    def compact(self, vacuum: bool = True) -> int | None:
+        """
+        Train a fresh dictionary on current results, re-encode every row with it and reclaim
+        the freed pages. Runs in small transactions so the server can keep writing meanwhile.
+        """
+        conn = self._connect(autocommit=True)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            dict_id = self._train_result_dict(conn)
+            conn.execute("COMMIT")
+            last_id = 0
+            while last_id is not None:
+                conn.execute("BEGIN IMMEDIATE")
+                last_id = self._recompress_batch(conn, last_id, dict_id)
+                conn.execute("COMMIT")
+            if vacuum:
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        self._current_dict["checked"] = None
+        return dict_id
+
+    # ─── Schema migrations ───────────────────────────────────
+    # The baseline tables predate migrations and are created if missing; everything
+    # after them is applied in order, with PRAGMA user_version counting how many have run.
+    def _index_scan(self, conn: sqlite3.Connection, scan_id: int, user_id: int, scan_type: str, result_data: dict):
+        conn.execute(
+            "INSERT INTO scan_search (rowid, medicines, salts, diagnosis, doctor) VALUES (?, ?, ?, ?, ?)",
+            (scan_id, *(" ".join(_search_terms(user_id, field)) for field in search_fields(scan_type, result_data)))
+        )
+
+    def _create_baseline(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                scan_type TEXT NOT NULL,
+                language TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
+
+    def _migrate_history_summary(self, conn: sqlite3.Connection):
+        """Summary columns for the history list and an index for per-user, newest-first paging."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(scan_history)")}
+        if "medicine_names" not in columns:
+            conn.execute("ALTER TABLE scan_history ADD COLUMN medicine_names TEXT NOT NULL DEFAULT '[]'")
+        if "medicine_count" not in columns:
+            conn.execute("ALTER TABLE scan_history ADD COLUMN medicine_count INTEGER NOT NULL DEFAULT 0")
+        rows = conn.execute("SELECT id, scan_type, result_json FROM scan_history").fetchall()
+        for row in rows:
+            try:
+                names, count = scan_summary(row["scan_type"], self._decode_result(row["result_json"], conn))
+            except (ValueError, TypeError, AttributeError):
+                names, count = [], 0
+            conn.execute(
+                "UPDATE scan_history SET medicine_names = ?, medicine_count = ? WHERE id = ?",
+                (json.dumps(names, ensure_ascii=False), count, row["id"])
+            )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scan_history_user_created "
+            "ON scan_history (user_id, created_at DESC, id DESC)"
+        )
+
+    def _migrate_compress_results(self, conn: sqlite3.Connection):
+        """
+        Dictionary table, then compress every row still stored as plain JSON text.
+        Commits every MIGRATION_BATCH_ROWS rows so the server's writes are not held up
+        for the whole table. Rows that already carry a format byte are skipped and a
+        dictionary left by an earlier attempt is reused, so an interrupted run (or a
+        worker taking over between batches) resumes where it stopped.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS result_dicts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dict BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        dict_id = conn.execute("SELECT MAX(id) FROM result_dicts").fetchone()[0]
+        if dict_id is None:
+            dict_id = self._train_result_dict(conn)
+        last_id = 0
+        while last_id is not None:
+            conn.execute("COMMIT")
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = self._recompress_batch(conn, last_id, dict_id, plain_only=True)
+
+    def _migrate_history_search(self, conn: sqlite3.Connection):
+        """
+        FTS5 index for history search, keyed by scan id (terms come from _search_terms).
+        Rebuilt from scratch, so running it again over an existing index is harmless.
+        """
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS scan_search USING fts5(
+                medicines, salts, diagnosis, doctor,
+                tokenize = 'unicode61'
+            )
+        """)
+        conn.execute("DELETE FROM scan_search")
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, user_id, scan_type, result_json FROM scan_history WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, MIGRATION_BATCH_ROWS)
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                try:
+                    result_data = self._decode_result(row["result_json"], conn)
+                except (ValueError, TypeError, RuntimeError):
+                    result_data = {}
+                self._index_scan(conn, row["id"], row["user_id"], row["scan_type"], result_data)
+            last_id = rows[-1]["id"]
+
+    def _migrate_caches(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)")
+
+    _MIGRATIONS = (
+        _migrate_history_summary,
+        _migrate_compress_results,
+        _migrate_history_search,
+        _migrate_caches,
+    )
+
+    def migrate(self):
+        conn = self._connect(autocommit=True)
+        try:
+            self._create_baseline(conn)
+            for version, migration in enumerate(self._MIGRATIONS, start=1):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Re-read inside the write lock: another worker may have just migrated
+                    if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                        conn.execute("COMMIT")
+                        continue
+                    # A long data migration may commit in batches and returns inside a
+                    # transaction; between batches another worker can run the later
+                    # migrations, so the version only ever moves forward.
+                    migration(self, conn)
+                    current = conn.execute("PRAGMA user_version").fetchone()[0]
+                    conn.execute(f"PRAGMA user_version = {max(current, version)}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+
+    # ─── Users ───────────────────────────────────────────────
+    def create_user(self, username: str, password_hash: str) -> bool:
+        row = (username, password_hash, datetime.now().isoformat())
+        try:
+            self._write(lambda conn: conn.execute(
+                "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)", row
+            ))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def get_user(self, username: str) -> tuple[int, str] | None:
+        with self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT id, password_hash FROM users WHERE username = ?", (username,)
+            ).fetchone()
+        return (row["id"], row["password_hash"]) if row else None
+
+    def set_password_hash(self, user_id: int, password_hash: str):
+        self._write(lambda conn: conn.execute(
+            "UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id)
+        ))
+
+    # ─── Scans ───────────────────────────────────────────────
+    def save_scan(self, user_id: int, scan_type: str, language: str, result_data: dict) -> int:
+        names, count = scan_summary(scan_type, result_data)
+        # Compress here rather than on the writer thread, which serializes all writes
+        row = (
+            user_id, scan_type, language, self._encode_result(result_data, self._current_dict_id()),
+            json.dumps(names, ensure_ascii=False), count, datetime.now().isoformat()
+        )
+
+        def _insert(conn):
+            scan_id = conn.execute(
+                "INSERT INTO scan_history (user_id, scan_type, language, result_json, medicine_names, medicine_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", row
+            ).lastrowid
+            self._index_scan(conn, scan_id, user_id, scan_type, result_data)
+            return scan_id
+
+        return self._write(_insert)
+
+    def list_scans(self, user_id: int, limit: int, before: tuple[str, int] | None) -> list[dict]:
+        query = f"SELECT {_SUMMARY_COLUMNS} FROM scan_history WHERE user_id = ?"
+        params: list = [user_id]
+        if before:
+            query += " AND (created_at, id) < (?, ?)"
+            params += list(before)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        with self._get_conn() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [_summary_entry(row) for row in rows]
+
+    def get_scan(self, user_id: int, scan_id: int) -> dict | None:
+        with self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT id, scan_type, language, result_json, created_at FROM scan_history WHERE id = ? AND user_id = ?",
+                (scan_id, user_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "scan_type": row["scan_type"],
+            "language": row["language"],
+            "result": self._decode_result(row["result_json"]),
+            "created_at": row["created_at"]
+        }
+
+    def iter_scans(self, user_id: int) -> Iterator[dict]:
+        with self._get_conn() as conn:
+            cursor = conn.execute(
+                "SELECT id, scan_type, language, result_json, created_at FROM scan_history "
+                "WHERE user_id = ? ORDER BY created_at, id", (user_id,)
+            )
+            while rows := cursor.fetchmany(EXPORT_FETCH_ROWS):
+                for row in rows:
+                    yield {
+                        "id": row["id"],
+                        "scan_type": row["scan_type"],
+                        "language": row["language"],
+                        "result": self._decode_result(row["result_json"], conn),
+                        "created_at": row["created_at"]
+                    }
+
+    def search_scans(self, user_id: int, words: list[str], limit: int) -> list[dict]:
+        # Quoted terms only: user input can never be parsed as FTS5 query syntax. The term
+        # prefix already confines matches to this user; the user_id check backs it up.
+        match = " AND ".join(f'"u{int(user_id)}x{word}"*' for word in words)
+        with self._get_conn() as conn:
+            rows = conn.execute(
+                "SELECT h.id, h.scan_type, h.language, h.medicine_names, h.medicine_count, h.created_at "
+                "FROM scan_search JOIN scan_history AS h ON h.id = scan_search.rowid AND h.user_id = ? "
+                "WHERE scan_search MATCH ? "
+                "ORDER BY bm25(scan_search, 10.0, 5.0, 3.0, 2.0), h.created_at DESC LIMIT ?",
+                (user_id, match, limit)
+            ).fetchall()
+        return [_summary_entry(row) for row in rows]
+
+    def delete_scan(self, user_id: int, scan_id: int) -> bool:
+        def _delete(conn):
+            deleted = conn.execute(
+                "DELETE FROM scan_history WHERE id = ? AND user_id = ?",
+                (scan_id, user_id)
+            ).rowcount > 0
+            if deleted:
+                conn.execute("DELETE FROM scan_search WHERE rowid = ?", (scan_id,))
+            return deleted
+
+        return self._write(_delete)
+
+    # ─── Caches ──────────────────────────────────────────────
+    def cache_get(self, namespace: str, key: str) -> bytes | None:
+        with self._get_conn() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None:
+            return None
+        # Recency only steers eviction: don't make the reader wait for the commit
+        self._write(lambda conn: conn.execute(
+            "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (time.time(), namespace, key)
+        ), wait=False)
+        return row["value"]
+
+    def cache_put(self, namespace: str, key: str, value: bytes):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (namespace, key, value, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, value, len(value), time.time())
+        ))
+
+    def cache_trim(self, namespace: str, max_bytes: int) -> int:
+        return self._write(lambda conn: conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+            "  SELECT key FROM ("
+            "    SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running"
+            "    FROM cache_entries WHERE namespace = ?"
+            "  ) WHERE running > ?"
+            ")",
+            (namespace, namespace, max_bytes)
+        ).rowcount)
@@ -0,0 +1,15 @@
+# tests/conftest.py — offline settings shared by the test suite
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Set before any project module is imported: they read their configuration at import
+os.environ.setdefault("API_KEY", "offline-tests")
+os.environ.setdefault("JWT_SECRET_KEY", "offline-tests-" + "x" * 32)
+os.environ["SANJEEVANI_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sanjeevani-tests-"), "tests.db")
+# The suite runs on SQLite; a PostgreSQL URL is kept only for tests/test_postgres_storage.py
+os.environ.setdefault("SANJEEVANI_TEST_DATABASE_URL", os.environ.pop("SANJEEVANI_DATABASE_URL", ""))
@@ -0,0 +1,168 @@
+# tests/test_admission.py — token buckets, fair queuing and the 429/503 paths
+import time
+import threading
+
+import pytest
+
+from admission import AdmissionController, BATCH, INTERACTIVE, Rejection, Ticket, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def _controller(clock=None, **overrides) -> AdmissionController:
+    options = dict(
+        max_concurrent=1, max_queue=8, queue_timeout=5.0,
+        weights={INTERACTIVE: 2.0, BATCH: 1.0}, max_queued_per_client=4,
+        user_rate_per_min=0, user_burst=1, ip_rate_per_min=0, ip_burst=1,
+        clock=clock or FakeClock(),
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+# ─── Token buckets ───────────────────────────────────────────
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, burst=2, clock=clock)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == pytest.approx(2.0)
+    clock.advance(1.0)
+    assert bucket.take() == pytest.approx(1.0)
+    clock.advance(1.0)
+    assert bucket.take() == 0
+
+
+def test_token_bucket_never_exceeds_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, burst=2, clock=clock)
+    clock.advance(60)
+    bucket.refund()
+    assert [bucket.take() for _ in range(3)] == [0, 0, pytest.approx(1.0)]
+
+
+def test_rate_limit_429_with_retry_after():
+    clock = FakeClock()
+    ctl = _controller(clock, user_rate_per_min=6, user_burst=2)
+    for _ in range(2):
+        ctl.acquire("alice", "10.0.0.1").release()
+    refused = ctl.acquire("alice", "10.0.0.1")
+    assert isinstance(refused, Rejection)
+    assert (refused.status, refused.retry_after) == (429, 10)
+    clock.advance(10)
+    assert isinstance(ctl.acquire("alice", "10.0.0.1"), Ticket)
+
+
+def test_logged_in_scans_are_charged_to_the_ip_too():
+    ctl = _controller(user_rate_per_min=6, user_burst=2, ip_rate_per_min=6, ip_burst=2)
+    ctl.acquire("alice", "10.0.0.1").release()
+    ctl.acquire("bob", "10.0.0.1").release()
+    refused = ctl.acquire("carol", "10.0.0.1")
+    assert isinstance(refused, Rejection) and refused.status == 429
+    # The IP refusal refunded carol's user token: from another address she still has both
+    ctl.acquire("carol", "10.0.0.2").release()
+    ctl.acquire("carol", "10.0.0.3").release()
+    assert isinstance(ctl.acquire("carol", "10.0.0.4"), Rejection)
+
+
+def test_user_refusal_does_not_charge_the_ip():
+    ctl = _controller(user_rate_per_min=6, user_burst=1, ip_rate_per_min=6, ip_burst=2)
+    ctl.acquire("alice", "10.0.0.1").release()
+    assert isinstance(ctl.acquire("alice", "10.0.0.1"), Rejection)
+    ctl.acquire(None, "10.0.0.1").release()
+    assert isinstance(ctl.acquire(None, "10.0.0.1"), Rejection)
+
+
+# ─── Queueing ────────────────────────────────────────────────
+def _queue_up(ctl, requests):
+    """Start one thread per (name, user, traffic class), each queued before the next starts."""
+    granted, tickets, threads = [], {}, []
+    done = threading.Condition()
+
+    def worker(name, user, traffic_class):
+        ticket = ctl.acquire(user, "10.0.0.1", traffic_class)
+        with done:
+            granted.append(name)
+            tickets[name] = ticket
+            done.notify_all()
+
+    for i, (name, user, traffic_class) in enumerate(requests):
+        thread = threading.Thread(target=worker, args=(name, user, traffic_class), daemon=True)
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 5
+        while ctl.stats()["queued"] < i + 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+    return granted, tickets, done
+
+
+def _drain(first: Ticket, count: int, granted, tickets, done) -> list[str]:
+    ticket = first
+    for n in range(count):
+        ticket.release()
+        with done:
+            assert done.wait_for(lambda: len(granted) > n, timeout=5)
+            ticket = tickets[granted[n]]
+    ticket.release()
+    return granted
+
+
+def test_clients_take_turns_within_a_class():
+    ctl = _controller()
+    first = ctl.acquire("other", "10.0.0.9")
+    queued = _queue_up(ctl, [("a1", "a", INTERACTIVE), ("a2", "a", INTERACTIVE),
+                             ("a3", "a", INTERACTIVE), ("b1", "b", INTERACTIVE)])
+    assert _drain(first, 4, *queued) == ["a1", "b1", "a2", "a3"]
+
+
+def test_classes_share_slots_by_weight():
+    ctl = _controller()
+    first = ctl.acquire("other", "10.0.0.9")
+    queued = _queue_up(ctl, [("i1", "i", INTERACTIVE), ("i2", "i", INTERACTIVE), ("i3", "i", INTERACTIVE),
+                             ("b1", "b", BATCH), ("b2", "b", BATCH), ("b3", "b", BATCH)])
+    assert _drain(first, 6, *queued) == ["i1", "b1", "i2", "i3", "b2", "b3"]
+
+
+def test_queue_full_503_with_retry_after():
+    ctl = _controller(max_queue=0)
+    running = ctl.acquire("a", "10.0.0.1")
+    refused = ctl.acquire("b", "10.0.0.2")
+    assert isinstance(refused, Rejection)
+    assert (refused.status, refused.retry_after) == (503, 15)
+    running.release()
+
+
+def test_queue_timeout_503():
+    ctl = _controller(queue_timeout=0.01)
+    running = ctl.acquire("a", "10.0.0.1")
+    refused = ctl.acquire("b", "10.0.0.2")
+    assert isinstance(refused, Rejection) and refused.status == 503
+    assert ctl.stats()["queued"] == 0
+    running.release()
+
+
+def test_client_queue_limit_429():
+    ctl = _controller(max_queued_per_client=0)
+    running = ctl.acquire("a", "10.0.0.1")
+    refused = ctl.acquire("b", "10.0.0.2")
+    assert isinstance(refused, Rejection) and refused.status == 429
+    running.release()
+
+
+def test_server_renders_retry_after(monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "admission", _controller(ip_rate_per_min=6, ip_burst=1))
+    server.admission.acquire(None, "127.0.0.1").release()
+    resp = server.app.test_client().post("/api/analyze/medicine")
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "10"
+    assert "error" in resp.get_json()
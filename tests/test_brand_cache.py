@@ -0,0 +1,81 @@
+# tests/test_brand_cache.py — warmed brand analyses are served only for matching labels
+import json
+import asyncio
+
+import pytest
+
+import ai_engine
+import db
+import metrics
+from benchmarks.stub_backend import STUB_MEDICINE_ANALYSIS, STUB_MEDICINE_OCR
+
+
+@pytest.fixture
+def warmed(monkeypatch):
+    """A brand cache holding the "dolo 650" analysis."""
+    entries = {ai_engine._brand_entry_key("dolo 650"): json.dumps(STUB_MEDICINE_ANALYSIS).encode("utf-8")}
+
+    async def brand_index():
+        return {"dolo": [("dolo", "650")]}
+
+    async def cache_get(namespace, key, max_bytes):
+        return entries.get(key)
+
+    monkeypatch.setattr(ai_engine, "_brand_index", brand_index)
+    monkeypatch.setattr(ai_engine, "_cache_get", cache_get)
+
+
+def _lookup(text):
+    return asyncio.run(ai_engine._cached_brand_analysis(text))
+
+
+def test_hit_for_matching_label(warmed):
+    assert _lookup(STUB_MEDICINE_OCR) == STUB_MEDICINE_ANALYSIS
+
+
+@pytest.mark.parametrize("text", [
+    # Listed name, but the strip states another strength
+    "DOLO 650\nParacetamol Tablets IP 500 mg",
+    # Listed name and strength, but a different salt
+    "DOLO 650\nIbuprofen Tablets IP 650 mg",
+])
+def test_mismatched_label_falls_through(warmed, text):
+    before = metrics.counters().get("brand_cache.mismatches", 0)
+    assert _lookup(text) is None
+    assert metrics.counters().get("brand_cache.mismatches", 0) == before + 1
+
+
+def test_unlisted_strength_is_a_miss(warmed):
+    assert _lookup("DOLO-500\nParacetamol Tablets IP 500 mg") is None
+
+
+@pytest.mark.parametrize("strength, text, ok", [
+    ("37.5mg/325mg", "ULTRACET Tramadol 37.5 mg + Paracetamol 325 mg", True),
+    ("37.5mg/325mg", "ULTRACET Tramadol 37.5 mg + Paracetamol 500 mg", False),
+    ("650mg", "DOLO 650 Paracetamol 650.0 mg Exp. 01/2028", True),
+])
+def test_brand_hit_matches(strength, text, ok):
+    salts = ["Tramadol", "Paracetamol"] if "Tramadol" in text else ["Paracetamol"]
+    analysis = {"dosage_strength": strength, "active_salts": salts}
+    assert ai_engine._brand_hit_matches(analysis, text) is ok
+
+
+def test_index_outlives_trimming_the_analyses(monkeypatch):
+    brands = ["dolo 650", "crocin 500", "pan 40"]
+    entry = json.dumps(STUB_MEDICINE_ANALYSIS, ensure_ascii=False).encode("utf-8")
+
+    async def warm():
+        for brand in brands:
+            await ai_engine._store_brand_analysis(brand, STUB_MEDICINE_ANALYSIS)
+
+    asyncio.run(warm())
+    # Scans keep the analyses fresh while the index is read only every BRAND_INDEX_TTL_S,
+    # so a trim that keeps two analyses must not take the index with it
+    for brand in brands:
+        assert db.cache_get(ai_engine._BRAND_NAMESPACE, ai_engine._brand_entry_key(brand)) == entry
+    db.cache_trim(ai_engine._BRAND_NAMESPACE, 2 * len(entry))
+
+    monkeypatch.setattr(ai_engine, "_brand_index_cache", (0.0, {}))
+    index = asyncio.run(ai_engine._brand_index())
+    assert {" ".join(words) for group in index.values() for words in group} >= set(brands)
+    assert db.cache_get(ai_engine._BRAND_NAMESPACE, ai_engine._brand_entry_key(brands[0])) is None
@@ -0,0 +1,28 @@
+# tests/test_db_cli.py — python db.py migrate | compact
+import os
+import sys
+import subprocess
+
+DB_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db.py")
+
+
+def _db(*args, **env) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, DB_PY, *args], capture_output=True, text=True,
+                          env={**os.environ, **env}, timeout=60)
+
+
+def test_compact_reencodes_a_sqlite_database(tmp_path):
+    path = str(tmp_path / "cli.db")
+    assert _db("migrate", SANJEEVANI_DB_PATH=path).returncode == 0
+    done = _db("compact", SANJEEVANI_DB_PATH=path)
+    assert done.returncode == 0, done.stderr
+    assert "Results re-encoded" in done.stdout
+
+
+def test_compact_refuses_postgres_with_a_message():
+    # Nothing connects: compact is rejected before the store is used
+    done = _db("compact", SANJEEVANI_DATABASE_URL="postgresql://nobody@127.0.0.1:1/none",
+               SANJEEVANI_DB_AUTO_MIGRATE="0")
+    assert done.returncode == 1
+    assert "Traceback" not in done.stderr
+    assert "PostgreSQL compresses results itself" in done.stderr
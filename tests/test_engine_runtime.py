@@ -0,0 +1,67 @@
+# tests/test_engine_runtime.py — the blocking wrapper around the engine loop
+import time
+import asyncio
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+import ai_engine
+from metrics import collect_stages, stage
+
+
+async def _slow(value, delay: float):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_run_sync_waits_past_poll_interval_with_idle_token(monkeypatch):
+    monkeypatch.setattr(ai_engine, "CANCEL_POLL_S", 0.02)
+    token = ai_engine.CancelToken(check=lambda: False)
+    assert ai_engine._run_sync(_slow("done", 0.15), token) == "done"
+
+
+def test_run_sync_without_token():
+    assert ai_engine._run_sync(_slow(42, 0.01)) == 42
+
+
+def test_run_sync_cancels_when_token_fires(monkeypatch):
+    monkeypatch.setattr(ai_engine, "CANCEL_POLL_S", 0.02)
+    token = ai_engine.CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    with pytest.raises(CancelledError):
+        ai_engine._run_sync(_slow("late", 5.0), token)
+
+
+def _spin(seconds: float):
+    end = time.thread_time() + seconds
+    while time.thread_time() < end:
+        pass
+
+
+def _pool_work():
+    with stage("pool"):
+        _spin(0.05)
+
+
+def test_cpu_is_measured_in_the_pool_not_on_the_shared_loop():
+    async def scan():
+        with collect_stages() as stages:
+            with ai_engine._remote_stage("analysis"):
+                await asyncio.sleep(0.1)
+            await ai_engine._run_cpu(_pool_work)
+        return stages
+
+    async def main():
+        # Another scan burns CPU on the loop thread while the first awaits its round trip
+        async def neighbour():
+            await asyncio.sleep(0.01)
+            _spin(0.05)
+
+        stages, _ = await asyncio.gather(scan(), neighbour())
+        return {s["stage"]: s for s in stages}
+
+    stages = asyncio.run(main())
+    assert stages["analysis"]["cpu_s"] is None
+    assert stages["analysis"]["wall_s"] >= 0.1
+    assert stages["pool"]["cpu_s"] >= 0.04
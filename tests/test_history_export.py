@@ -0,0 +1,106 @@
+# tests/test_history_export.py — streamed NDJSON and CSV history exports
+import io
+import sys
+import csv
+import json
+
+import pytest
+
+import db
+import history_export
+import server
+
+STRIP = {"medicine_name": "Crocin", "active_salts": ["Paracetamol"], "dosage_strength": "500mg",
+         "advice": "-2 tablets max"}
+FORMULA_STRIP = {**STRIP, "medicine_name": "=HYPERLINK(\"http://x\")"}
+PRESCRIPTION = {"patient_info": {"name": "Asha", "age": "34"}, "doctor_info": {"name": "Dr. Rao"},
+                "diagnosis": "Fever", "medicines": [
+                    {"order": 1, "name": "Dolo 650", "frequency": "twice a day"},
+                    {"order": 2, "name": "Pan 40", "frequency": "once a day"}]}
+
+# Strip, prescription, strip, prescription, strip: 3 + 2 * 2 CSV rows
+SCANS = [
+    {"id": i + 1, "scan_type": scan_type, "language": "Hindi", "result": result,
+     "created_at": f"2025-01-01T00:00:{i:02d}"}
+    for i, (scan_type, result) in enumerate([
+        ("medicine", FORMULA_STRIP), ("prescription", PRESCRIPTION), ("medicine", STRIP),
+        ("prescription", PRESCRIPTION), ("medicine", STRIP),
+    ])
+]
+
+
+@pytest.fixture(params=["pandas", "csv module"])
+def csv_writer(request, monkeypatch):
+    if request.param == "pandas":
+        pytest.importorskip("pandas")
+    else:
+        monkeypatch.setitem(sys.modules, "pandas", None)  # import pandas raises ImportError
+
+
+# ─── Formats ─────────────────────────────────────────────────
+def test_ndjson_stream(monkeypatch):
+    monkeypatch.setattr(history_export, "CHUNK_SCANS", 2)
+    chunks = list(history_export.export_chunks(iter(SCANS), "ndjson"))
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == SCANS  # lossless, formulas untouched
+
+
+def test_csv_stream(monkeypatch, csv_writer):
+    monkeypatch.setattr(history_export, "CHUNK_SCANS", 2)
+    chunks = list(history_export.export_chunks(iter(SCANS), "csv"))
+    assert len(chunks) == 1 + 3  # header, then one chunk per batch
+    text = b"".join(chunks).decode("utf-8")
+    assert text.startswith("\ufeff")
+    rows = list(csv.reader(io.StringIO(text[1:])))
+    assert rows[0] == list(history_export.CSV_COLUMNS)
+    body = [dict(zip(rows[0], row)) for row in rows[1:]]
+    assert len(body) == 3 + 2 * 2
+    assert body[0]["medicine_name"] == "'=HYPERLINK(\"http://x\")"
+    assert body[0]["warnings"] == "'-2 tablets max"
+    assert [r["medicine_name"] for r in body[1:3]] == ["Dolo 650", "Pan 40"]
+
+
+@pytest.mark.parametrize("value, cell", [
+    ("=1+1", "'=1+1"), ("+91 98450", "'+91 98450"), ("-5", "'-5"), ("@SUM(A1)", "'@SUM(A1)"),
+    ("\tx", "'\tx"), ("\rx", "'\rx"), ("Dolo 650", "Dolo 650"), ("a=b", "a=b"), (None, ""),
+])
+def test_csv_cells_are_not_formulas(value, cell):
+    assert history_export._cell(value) == cell
+
+
+def test_scans_are_read_one_batch_ahead(monkeypatch):
+    monkeypatch.setattr(history_export, "CHUNK_SCANS", 2)
+    read = []
+
+    def cursor():
+        for scan in SCANS:
+            read.append(scan["id"])
+            yield scan
+
+    chunks = history_export.export_chunks(cursor(), "ndjson")
+    next(chunks)
+    assert read == [1, 2]
+
+
+# ─── Endpoint ────────────────────────────────────────────────
+def test_export_endpoint_streams_only_the_callers_scans():
+    http = server.app.test_client()
+    assert http.post("/api/auth/register", json={"username": "export-other", "password": "pass word"}).status_code == 200
+    other = db._storage().get_user("export-other")[0]
+    db.save_scan(other, "medicine", "English", STRIP)
+
+    assert http.post("/api/auth/register", json={"username": "export-user", "password": "pass word"}).status_code == 200
+    user = db._storage().get_user("export-user")[0]
+    saved = [db.save_scan(user, "prescription", "English", PRESCRIPTION), db.save_scan(user, "medicine", "English", STRIP)]
+
+    resp = http.get("/api/history/export?format=ndjson")
+    assert resp.status_code == 200 and resp.is_streamed
+    assert resp.headers["Content-Disposition"].endswith('.ndjson"')
+    assert [json.loads(line)["id"] for line in resp.get_data(as_text=True).splitlines()] == saved
+
+    resp = http.get("/api/history/export?format=csv")
+    assert resp.status_code == 200
+    assert len(resp.get_data(as_text=True).strip().splitlines()) == 1 + 2 + 1  # header, two medicines, a strip
+
+    assert http.get("/api/history/export?format=xlsx").status_code == 400
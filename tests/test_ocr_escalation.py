@@ -0,0 +1,52 @@
+# tests/test_ocr_escalation.py — draft-first OCR renderings and escalation reasons
+import io
+
+import numpy as np
+from PIL import Image
+
+import ai_engine
+
+
+def _page(width: int = 1200, height: int = 900) -> np.ndarray:
+    """A white page with dense text lines in the middle and one faint line at the bottom edge."""
+    page = np.full((height, width), 255, np.uint8)
+    for y in range(300, 600, 30):
+        page[y:y + 12, 300:900] = 0
+    page[height - 14:height - 10, 40:200] = 0  # an expiry line the text-region crop leaves out
+    return page
+
+
+def _size(jpeg: bytes) -> tuple[int, int]:
+    return Image.open(io.BytesIO(jpeg)).size
+
+
+def test_draft_is_cropped_and_detail_is_the_whole_page(monkeypatch):
+    page = _page()
+    monkeypatch.setattr(ai_engine, "_binarize", lambda source: page.copy())
+    assert ai_engine._text_region(page) is not None
+    draft, detail, mime = ai_engine._vision_renders(b"upload")
+    assert mime == "image/jpeg"
+    assert _size(detail) == (1200, 900)
+    draft_w, draft_h = _size(draft)
+    assert draft_w < 1200 and draft_h < 900 and max(draft_w, draft_h) <= ai_engine.OCR_DRAFT_DIM
+    # The faint line survives in the detail rendering
+    bottom = np.asarray(Image.open(io.BytesIO(detail)))[900 - 14:900 - 10, 40:200]
+    assert bottom.mean() < 128
+
+
+def test_undecodable_upload_sends_the_raw_bytes(monkeypatch):
+    def fail(source):
+        raise ValueError("not an image")
+
+    monkeypatch.setattr(ai_engine, "_binarize", fail)
+    monkeypatch.setattr(ai_engine, "_raw_upload", lambda source: (source.read(), "image/png"))
+    assert ai_engine._vision_renders(b"raw bytes") == (None, b"raw bytes", "image/png")
+
+
+def test_escalation_reasons():
+    complete = "DOLO-650\nParacetamol Tablets IP 650 mg\nEach uncoated tablet contains Paracetamol IP 650 mg"
+    assert ai_engine._ocr_escalation_reasons(complete, "medicine") == []
+    assert ai_engine._ocr_escalation_reasons("DOLO", "medicine") == ["short_text", "no_dosage"]
+    assert "misread_drug_name" in ai_engine._ocr_escalation_reasons(
+        complete.replace("Paracetamol", "Paracetarnol"), "medicine")
+    assert "illegible" in ai_engine._ocr_escalation_reasons(complete + "\n[illegible]", "medicine")
@@ -0,0 +1,107 @@
+# tests/test_passwords.py — salted KDF hashes, rehash on login and the bounded KDF pool
+import threading
+
+import pytest
+
+import db
+import metrics
+import passwords
+
+
+@pytest.fixture(autouse=True)
+def cheap_kdf(monkeypatch):
+    # Same code paths at a fraction of the cost
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 10)
+    monkeypatch.setattr(passwords, "PBKDF2_ITERATIONS", 1000)
+
+
+# ─── Hashes ──────────────────────────────────────────────────
+def test_each_hash_has_its_own_salt():
+    first, second = passwords.hash_password("same secret"), passwords.hash_password("same secret")
+    assert first != second
+    assert first.split("$")[0] == ("scrypt" if passwords.HAS_SCRYPT else "pbkdf2_sha256")
+    assert passwords.verify_password("same secret", first) == (True, False)
+    assert passwords.verify_password("same secret", second) == (True, False)
+    assert passwords.verify_password("other secret", first) == (False, False)
+
+
+def test_old_cost_parameters_ask_for_a_rehash(monkeypatch):
+    stored = passwords._hash_now("secret")
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 11)
+    monkeypatch.setattr(passwords, "PBKDF2_ITERATIONS", 2000)
+    assert passwords._verify_now("secret", stored) == (True, True)
+
+
+def test_pbkdf2_fallback_without_scrypt(monkeypatch):
+    monkeypatch.setattr(passwords, "HAS_SCRYPT", False)
+    stored = passwords._hash_now("secret")
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert passwords._verify_now("secret", stored) == (True, False)
+    assert passwords._verify_now("wrong", stored) == (False, False)
+
+
+@pytest.mark.parametrize("stored", ["scrypt$x$8$1$AAAA$AAAA", "pbkdf2_sha256$1000$!!$AAAA", "", "plain"])
+def test_corrupt_hash_is_a_mismatch(stored):
+    assert passwords._verify_now("secret", stored)[0] is False
+
+
+def test_remembered_verification_expires(monkeypatch):
+    stored = passwords._hash_now("secret")
+    passwords.remember("secret", stored)
+    assert passwords._recently_verified("secret", stored)
+    assert not passwords._recently_verified("secret", stored + "x")  # a new hash is a new entry
+    monkeypatch.setattr(passwords, "VERIFIED_CACHE_TTL_S", -1)
+    passwords.remember("secret", stored)
+    assert not passwords._recently_verified("secret", stored)
+
+
+# ─── Login ───────────────────────────────────────────────────
+def test_legacy_hash_verifies_and_is_rehashed():
+    store = db._storage()
+    store.create_user("legacy-user", passwords._legacy_sha256("old secret"))
+    ok, user_id = db.authenticate_user("Legacy-User", "old secret")
+    assert ok and user_id == store.get_user("legacy-user")[0]
+    stored = store.get_user("legacy-user")[1]
+    assert stored.split("$")[0] in ("scrypt", "pbkdf2_sha256")
+    assert passwords._verify_now("old secret", stored) == (True, False)
+
+    # The fresh hash was remembered: the next login skips the KDF
+    before = metrics.counters()
+    assert db.authenticate_user("legacy-user", "old secret") == (True, user_id)
+    after = metrics.counters()
+    assert after.get("passwords.verified_kdf", 0) == before.get("passwords.verified_kdf", 0)
+    assert after["passwords.verified_cached"] == before.get("passwords.verified_cached", 0) + 1
+
+
+def test_wrong_password_is_rejected_and_not_cached():
+    assert db.register_user("careful-user", "right horse battery")[0]
+    stored = db._storage().get_user("careful-user")[1]
+    before = metrics.counters().get("passwords.verified_kdf", 0)
+    for _ in range(2):
+        assert db.authenticate_user("careful-user", "wrong horse battery") == (False, None)
+    # Both attempts paid for the KDF, and the stored hash was left alone
+    assert metrics.counters()["passwords.verified_kdf"] == before + 2
+    assert not passwords._recently_verified("wrong horse battery", stored)
+    assert db._storage().get_user("careful-user")[1] == stored
+
+
+def test_unknown_user_is_rejected():
+    assert db.authenticate_user("nobody-here", "anything") == (False, None)
+
+
+# ─── KDF pool ────────────────────────────────────────────────
+def test_saturated_kdf_pool_answers_503(monkeypatch):
+    import server
+
+    db.register_user("busy-user", "secret pass")
+    monkeypatch.setattr(passwords, "_pending", threading.BoundedSemaphore(1))
+    passwords._pending.acquire()  # every slot taken
+    with pytest.raises(passwords.KdfBusy):
+        passwords.verify_password("secret pass", passwords._legacy_sha256("secret pass"))
+
+    rejected = metrics.counters().get("passwords.rejected_busy", 0)
+    resp = server.app.test_client().post("/api/auth/login", json={"username": "busy-user", "password": "other pass"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.get_json()["success"] is False
+    assert metrics.counters()["passwords.rejected_busy"] == rejected + 1
@@ -0,0 +1,102 @@
+# tests/test_phrasebook.py — schedule phrases parsed and rendered in every language
+import asyncio
+
+import pytest
+
+import ai_engine
+import phrasebook
+from phrasebook import parse_duration, parse_frequency, parse_meal_relation, render_schedule
+
+
+# ─── Parsing ─────────────────────────────────────────────────
+@pytest.mark.parametrize("phrase, key", [
+    ("one time a day", "once_daily"),
+    ("1 time a day", "once_daily"),
+    ("One time daily", "once_daily"),
+    ("once daily", "once_daily"),
+    ("once in a day", "once_daily"),
+    ("1x daily", "once_daily"),
+    ("two times", "twice_daily"),
+    ("two time a day", "twice_daily"),
+    ("twice per day", "twice_daily"),
+    ("three times daily", "thrice_daily"),
+    ("thrice a day", "thrice_daily"),
+    ("four times a day", "four_times_daily"),
+    ("BD", "twice_daily"),
+    ("1-0-1", "morning_night"),
+])
+def test_frequency_phrases(phrase, key):
+    assert parse_frequency(phrase) == (key, None)
+
+
+def test_other_schedule_fields():
+    assert parse_frequency("every 8 hours") == ("every_n_hours", "8")
+    assert parse_meal_relation("After Food") == ("after_food", None)
+    assert parse_meal_relation("n/a") == ("", None)
+    assert parse_duration("one week") == ("weeks", "1")
+    assert parse_duration("for 5-7 days") == ("days", "5-7")
+    assert parse_frequency("as per the chart") is None
+
+
+# ─── Rendering ───────────────────────────────────────────────
+
+ONE_WEEK = {"name": "Pan 40", "dosage": "40mg", "frequency": "one time a day",
+            "meal_relation": "before meals", "duration": "1 week"}
+FIVE_DAYS = {"name": "Augmentin", "dosage": "625mg", "frequency": "two times",
+             "meal_relation": "after food", "duration": "5 days"}
+
+
+@pytest.mark.parametrize("lang, med, sentence", [
+    ("en", ONE_WEEK, "Pan 40, 40mg. Take once a day before meals for 1 week."),
+    ("hi", ONE_WEEK, "Pan 40, 40mg। 1 हफ़्ते तक खाने से पहले दिन में एक बार लें।"),
+    ("mr", ONE_WEEK, "Pan 40, 40mg. 1 आठवडा जेवणापूर्वी दिवसातून एकदा घ्या."),
+    ("bn", ONE_WEEK, "Pan 40, 40mg। 1 সপ্তাহ ধরে খাবারের আগে দিনে একবার খান।"),
+    ("ta", ONE_WEEK, "Pan 40, 40mg. 1 வாரம் உணவுக்கு முன் தினமும் ஒரு முறை எடுத்துக்கொள்ளுங்கள்."),
+    ("te", ONE_WEEK, "Pan 40, 40mg. 1 వారం భోజనానికి ముందు రోజుకు ఒకసారి తీసుకోండి."),
+    ("kn", ONE_WEEK, "Pan 40, 40mg. 1 ವಾರದ ಕಾಲ ಊಟಕ್ಕೆ ಮುಂಚೆ ದಿನಕ್ಕೆ ಒಮ್ಮೆ ತೆಗೆದುಕೊಳ್ಳಿ."),
+    ("ml", ONE_WEEK, "Pan 40, 40mg. 1 ആഴ്ച ഭക്ഷണത്തിന് മുമ്പ് ദിവസം ഒരു തവണ കഴിക്കുക."),
+    ("en", FIVE_DAYS, "Augmentin, 625mg. Take twice a day after meals for 5 days."),
+    ("hi", FIVE_DAYS, "Augmentin, 625mg। 5 दिन तक खाने के बाद दिन में दो बार लें।"),
+    ("mr", FIVE_DAYS, "Augmentin, 625mg. 5 दिवस जेवणानंतर दिवसातून दोनदा घ्या."),
+    ("bn", FIVE_DAYS, "Augmentin, 625mg। 5 দিন ধরে খাবারের পরে দিনে দুবার খান।"),
+    ("ta", FIVE_DAYS, "Augmentin, 625mg. 5 நாட்கள் உணவுக்குப் பின் தினமும் இரண்டு முறை எடுத்துக்கொள்ளுங்கள்."),
+    ("te", FIVE_DAYS, "Augmentin, 625mg. 5 రోజులు భోజనం తర్వాత రోజుకు రెండుసార్లు తీసుకోండి."),
+    ("kn", FIVE_DAYS, "Augmentin, 625mg. 5 ದಿನಗಳ ಕಾಲ ಊಟದ ನಂತರ ದಿನಕ್ಕೆ ಎರಡು ಬಾರಿ ತೆಗೆದುಕೊಳ್ಳಿ."),
+    ("ml", FIVE_DAYS, "Augmentin, 625mg. 5 ദിവസം ഭക്ഷണത്തിന് ശേഷം ദിവസം രണ്ടു തവണ കഴിക്കുക."),
+])
+def test_render_schedule(lang, med, sentence):
+    assert render_schedule(med, lang) == sentence
+
+
+def test_every_language_is_covered():
+    assert set(phrasebook.PHRASES) == {"en", "hi", "mr", "bn", "ta", "te", "kn", "ml"}
+
+
+@pytest.mark.parametrize("lang, med", [
+    ("hi", {**ONE_WEEK, "frequency": "as per the chart"}),   # phrase outside the vocabulary
+    ("hi", {**ONE_WEEK, "duration": "till the fever goes"}),
+    ("hi", {**ONE_WEEK, "dosage": "half tablet"}),            # dosage not kept as written
+    ("hi", {**ONE_WEEK, "name": ""}),
+    ("gu", ONE_WEEK),                                         # language without a phrasebook
+])
+def test_falls_back_to_translation(lang, med):
+    assert render_schedule(med, lang) is None
+
+
+# ─── Prescription summaries ──────────────────────────────────
+def test_only_free_text_goes_to_the_translator(monkeypatch):
+    sent = []
+
+    async def translate_lines(lines, target_language):
+        sent.extend(lines)
+        return [f"<{target_language}> {line}" for line in lines]
+
+    monkeypatch.setattr(ai_engine, "_translate_lines_async", translate_lines)
+    unparsed = {**FIVE_DAYS, "frequency": "as per the chart"}
+    parts_en = [("Pan 40 schedule in English.", "Reduces acidity."),
+                ("Augmentin schedule in English.", "")]
+    summary = asyncio.run(ai_engine._translate_med_summary([ONE_WEEK, unparsed], parts_en, "Hindi"))
+
+    assert sent == ["Reduces acidity.", "Augmentin schedule in English."]
+    assert summary == ("Pan 40, 40mg। 1 हफ़्ते तक खाने से पहले दिन में एक बार लें। "
+                       "<Hindi> Reduces acidity. <Hindi> Augmentin schedule in English.")
@@ -0,0 +1,181 @@
+# tests/test_postgres_storage.py — PostgreSQL backend migrations, JSONB results and history search
+"""
+Needs a server: run with SANJEEVANI_DATABASE_URL=postgresql://… set. Each test works in a
+schema of its own, which is dropped afterwards, so any database the user can create
+schemas in will do.
+"""
+import os
+import time
+import uuid
+import threading
+from datetime import datetime
+
+import pytest
+
+DATABASE_URL = os.environ.get("SANJEEVANI_TEST_DATABASE_URL", "")
+if not DATABASE_URL.startswith(("postgresql://", "postgres://")):
+    pytest.skip("SANJEEVANI_DATABASE_URL is not a PostgreSQL URL", allow_module_level=True)
+
+psycopg = pytest.importorskip("psycopg")
+pytest.importorskip("psycopg_pool")
+
+from psycopg.conninfo import make_conninfo
+
+from storage import postgres as postgres_storage
+from storage.postgres import PostgresStorage
+
+
+@pytest.fixture
+def url():
+    """A connection string whose search_path is a fresh, empty schema."""
+    schema = f"sanjeevani_test_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {schema}")
+    yield make_conninfo(DATABASE_URL, options=f"-c search_path={schema}")
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+
+@pytest.fixture
+def store(url):
+    store = PostgresStorage(url)
+    store.migrate()
+    yield store
+    store.close()
+
+
+def _medicine(name: str) -> dict:
+    return {"medicine_name": name, "active_salts": ["Paracetamol"], "dosage_strength": "650mg"}
+
+
+def _query(url: str, sql: str, params=()) -> list[tuple]:
+    with psycopg.connect(url) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def _versions(url: str) -> list[int]:
+    return [row[0] for row in _query(url, "SELECT version FROM schema_migrations ORDER BY version")]
+
+
+# ─── Migrations ──────────────────────────────────────────────
+def test_migrate_applies_every_version_once(url):
+    store = PostgresStorage(url)
+    store.migrate()
+    store.migrate()
+    assert _versions(url) == list(range(1, len(postgres_storage._MIGRATIONS) + 1))
+
+
+def test_migrate_waits_for_the_advisory_lock(url):
+    store = PostgresStorage(url)
+    errors = []
+
+    def worker():
+        try:
+            store.migrate()
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    # Another node holds the migration lock: this one must not touch the schema meanwhile
+    with psycopg.connect(url, autocommit=True) as holder:
+        holder.execute("SELECT pg_advisory_lock(%s)", (postgres_storage._MIGRATION_LOCK_ID,))
+        thread = threading.Thread(target=worker)
+        thread.start()
+        time.sleep(0.5)
+        assert thread.is_alive()
+        assert _query(url, "SELECT to_regclass('schema_migrations')") == [(None,)]
+        holder.execute("SELECT pg_advisory_unlock(%s)", (postgres_storage._MIGRATION_LOCK_ID,))
+    thread.join(10)
+
+    assert errors == []
+    assert _versions(url) == list(range(1, len(postgres_storage._MIGRATIONS) + 1))
+
+
+def test_concurrent_migrators_apply_each_version_once(url):
+    stores = [PostgresStorage(url) for _ in range(4)]
+    errors = []
+    start = threading.Barrier(len(stores))
+
+    def worker(store):
+        try:
+            start.wait()
+            store.migrate()
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert errors == []
+    assert _versions(url) == list(range(1, len(postgres_storage._MIGRATIONS) + 1))
+
+
+# ─── Scans ───────────────────────────────────────────────────
+def test_results_round_trip_as_jsonb(store):
+    assert store.create_user("alice", "x")
+    alice = store.get_user("alice")[0]
+    result = {
+        "medicine_name": "डोलो 650",
+        "active_salts": ["Paracetamol"],
+        "warnings": {"alcohol": None, "pregnancy": "consult"},
+        "medicine_count": 1,
+        "score": 0.75,
+        "flags": [True, False],
+    }
+    scan = store.save_scan(alice, "medicine", "Hindi", result)
+
+    saved = store.get_scan(alice, scan)
+    assert saved["result"] == result
+    assert (saved["scan_type"], saved["language"]) == ("medicine", "Hindi")
+    assert _query(store.url, "SELECT pg_typeof(result)::text FROM scan_history WHERE id = %s", (scan,)) == [("jsonb",)]
+    assert store.get_scan(alice + 1, scan) is None
+    assert [entry["result"] for entry in store.iter_scans(alice)] == [result]
+
+
+def test_keyset_pages_do_not_skip_or_repeat_equal_timestamps(store):
+    store.create_user("alice", "x")
+    alice = store.get_user("alice")[0]
+    scans = [store.save_scan(alice, "medicine", "English", _medicine(f"Dolo {i}")) for i in range(5)]
+    # Three scans share a timestamp and straddle the first page boundary
+    same = datetime(2025, 1, 1, 12, 0, 0)
+    with psycopg.connect(store.url) as conn:
+        conn.execute("UPDATE scan_history SET created_at = %s WHERE id = ANY(%s)", (same, scans[1:4]))
+        conn.execute("UPDATE scan_history SET created_at = %s WHERE id = %s", (datetime(2025, 1, 1, 11), scans[0]))
+        conn.execute("UPDATE scan_history SET created_at = %s WHERE id = %s", (datetime(2025, 1, 1, 13), scans[4]))
+
+    pages, before = [], None
+    while True:
+        page = store.list_scans(alice, 2, before)
+        if not page:
+            break
+        pages.append([entry["id"] for entry in page])
+        before = (page[-1]["created_at"], page[-1]["id"])
+    assert pages == [[scans[4], scans[3]], [scans[2], scans[1]], [scans[0]]]
+
+
+# ─── History search ──────────────────────────────────────────
+def test_search_is_per_user_and_follows_deletes(store):
+    assert store.create_user("alice", "x") and store.create_user("bob", "x")
+    alice, bob = store.get_user("alice")[0], store.get_user("bob")[0]
+    alice_650 = store.save_scan(alice, "medicine", "English", _medicine("Dolo 650"))
+    alice_500 = store.save_scan(alice, "medicine", "English", _medicine("Dolonex 500"))
+    bob_650 = store.save_scan(bob, "medicine", "English", _medicine("Dolo 650"))
+
+    assert {s["id"] for s in store.search_scans(alice, ["dolo"], 10)} == {alice_650, alice_500}
+    assert [s["id"] for s in store.search_scans(bob, ["dolo"], 10)] == [bob_650]
+    assert [s["id"] for s in store.search_scans(alice, ["dolo", "650"], 10)] == [alice_650]
+
+    assert not store.delete_scan(bob, alice_650)
+    assert store.delete_scan(alice, alice_650)
+    assert [s["id"] for s in store.search_scans(alice, ["dolo"], 10)] == [alice_500]
+    assert [s["id"] for s in store.search_scans(bob, ["dolo"], 10)] == [bob_650]
+
+
+def test_search_ranks_medicine_names_above_salts(store):
+    store.create_user("alice", "x")
+    alice = store.get_user("alice")[0]
+    by_salt = store.save_scan(alice, "medicine", "English",
+                              {"medicine_name": "Calpol", "active_salts": ["Crocin"], "dosage_strength": "500mg"})
+    by_name = store.save_scan(alice, "medicine", "English", _medicine("Crocin Advance"))
+    assert [s["id"] for s in store.search_scans(alice, ["crocin"], 10)] == [by_name, by_salt]
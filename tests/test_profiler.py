@@ -0,0 +1,133 @@
+# tests/test_profiler.py — sampling profiler lifecycle and the admin profile routes
+import time
+import threading
+
+import pytest
+
+import metrics
+import profiler
+import server
+
+
+@pytest.fixture
+def stops():
+    """One entry per on_stop call."""
+    return []
+
+
+@pytest.fixture
+def session(stops):
+    sampler = profiler.SamplingProfiler(context=lambda: None, on_stop=lambda: stops.append(1))
+    yield sampler
+    sampler.stop()
+
+
+def _spin(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+# ─── Lifecycle ───────────────────────────────────────────────
+def test_start_stop(session, stops):
+    assert session.status() is None
+    status = session.start(seconds=30, interval_ms=1)
+    assert status["running"] and session.running
+    assert metrics._stage_listener is session
+    with pytest.raises(RuntimeError):
+        session.start(seconds=30)
+
+    status = session.stop()
+    assert not status["running"] and not session.running
+    assert status["stop_reason"] == "stopped"
+    assert metrics._stage_listener is None
+    assert stops == [1]
+    # A stopped profile keeps its samples and can be followed by another
+    assert session.start(seconds=30)["running"]
+
+
+def test_stops_after_its_time(session, stops):
+    session.start(seconds=0.05, interval_ms=1)
+    assert session._session.done.wait(5)
+    assert session.status()["stop_reason"] == "time"
+    assert stops == [1]
+
+
+def test_stops_after_counted_requests(session):
+    session.start(seconds=30, requests=2, interval_ms=1)
+    session.request_started(1, "GET /api/admin/profile")
+    session.request_finished(1, counted=False)
+    session.request_started(2, "POST /api/analyze/medicine")
+    session.request_finished(2)
+    assert session.running
+    session.request_started(3, "POST /api/analyze/medicine")
+    session.request_finished(3)
+    assert session._session.done.wait(5)
+    status = session.status()
+    assert (status["stop_reason"], status["requests_done"]) == ("requests", 2)
+
+
+def test_samples_are_rooted_at_the_request(session):
+    session.start(seconds=30, interval_ms=1)
+
+    def request():
+        session.request_started(7, "POST /api/analyze/medicine")
+        with metrics.stage("quality"):
+            _spin(0.2)
+        session.request_finished(7)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    thread.join()
+    session.stop()
+
+    lines = session.collapsed().splitlines()
+    assert any(line.startswith("[POST /api/analyze/medicine];") and "[stage] quality;" in line for line in lines)
+    assert session.status()["summary"]["stages_ms"]["quality"]["running"] > 0
+
+
+# ─── Admin routes ────────────────────────────────────────────
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "s3cret-admin")
+    yield server.app.test_client()
+    server.profiler_session.stop()
+
+
+PROFILE_ROUTES = [
+    ("POST", "/api/admin/profile"),
+    ("GET", "/api/admin/profile"),
+    ("DELETE", "/api/admin/profile"),
+    ("GET", "/api/admin/profile/download"),
+]
+
+
+@pytest.mark.parametrize("method, path", PROFILE_ROUTES)
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": "s3cret-admin "}])
+def test_profile_routes_hide_behind_the_token(admin, method, path, headers):
+    resp = admin.open(path, method=method, headers=headers, json={"seconds": 1})
+    assert resp.status_code == 404
+    assert resp.get_json() == {"error": "Not found"}
+    assert not server.profiler_session.running
+
+
+def test_profile_routes_are_off_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "")
+    resp = server.app.test_client().post("/api/admin/profile", headers={"X-Admin-Token": ""}, json={"seconds": 1})
+    assert resp.status_code == 404
+    assert not server.profiler_session.running
+
+
+def test_profile_routes_with_the_token(admin):
+    headers = {"X-Admin-Token": "s3cret-admin"}
+    resp = admin.post("/api/admin/profile", headers=headers, json={"seconds": 30, "interval_ms": 1})
+    assert resp.status_code == 200 and resp.get_json()["profile"]["running"]
+    assert admin.post("/api/admin/profile", headers=headers, json={"seconds": 30}).status_code == 409
+    assert admin.get("/api/health").status_code == 200
+
+    assert admin.get("/api/admin/profile", headers=headers).get_json()["profile"]["running"]
+    stopped = admin.delete("/api/admin/profile", headers=headers).get_json()["profile"]
+    assert not stopped["running"] and stopped["requests_done"] == 1  # the health check, not the admin calls
+
+    download = admin.get("/api/admin/profile/download?format=collapsed", headers=headers)
+    assert download.status_code == 200 and download.mimetype == "text/plain"
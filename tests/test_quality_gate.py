@@ -0,0 +1,91 @@
+# tests/test_quality_gate.py — assess_image_quality on synthetic labels either side of its thresholds
+import io
+
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+import ai_engine
+
+
+def _label(width: int = 640, height: int = 480) -> Image.Image:
+    """A gray card printed with rows of dark text, like a strip's back."""
+    img = Image.new("L", (width, height), 200)
+    draw = ImageDraw.Draw(img)
+    for row, y in enumerate(range(30, height - 30, 28)):
+        draw.text((30, y), f"PARACETAMOL TABLETS IP 650 mg  Batch {row:03d}  Exp 01/2028  DOLO-650", fill=20)
+    return img
+
+
+def _encoded(img: Image.Image, fmt: str = "JPEG") -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def _with_glare(fraction: float) -> Image.Image:
+    """The label with one clipped white square covering ``fraction`` of the photo."""
+    img = _label()
+    side = int((fraction * img.width * img.height) ** 0.5)
+    ImageDraw.Draw(img).rectangle([100, 100, 100 + side - 1, 100 + side - 1], fill=255)
+    return img
+
+
+def test_sharp_label_passes():
+    quality = ai_engine.assess_image_quality(_encoded(_label()))
+    assert quality["ok"], quality
+    assert quality["metrics"]["sharpness"] > ai_engine.QUALITY_THRESHOLDS["min_sharpness"]
+
+
+@pytest.mark.parametrize("radius, blurry", [(1, False), (2, True)])
+def test_blur_either_side_of_the_sharpness_threshold(radius, blurry):
+    quality = ai_engine.assess_image_quality(_encoded(_label().filter(ImageFilter.GaussianBlur(radius))))
+    assert ("blurry" in quality["reasons"]) is blurry, quality
+
+
+def test_sharpness_threshold_is_a_strict_minimum():
+    measured = ai_engine.assess_image_quality(_encoded(_label()))["metrics"]["sharpness"]
+    image = _encoded(_label())
+    assert ai_engine.assess_image_quality(image, {"min_sharpness": measured - 1})["ok"]
+    assert ai_engine.assess_image_quality(image, {"min_sharpness": measured + 1})["reasons"] == ["blurry"]
+
+
+@pytest.mark.parametrize("fraction, glare", [(0.04, False), (0.08, True)])
+def test_glare_either_side_of_the_blob_threshold(fraction, glare):
+    quality = ai_engine.assess_image_quality(_encoded(_with_glare(fraction)))
+    assert quality["metrics"]["glare"] == pytest.approx(fraction, abs=0.005)
+    assert ("glare" in quality["reasons"]) is glare, quality
+
+
+def test_glare_is_ignored_on_a_white_background():
+    img = Image.new("L", (640, 480), 250)
+    draw = ImageDraw.Draw(img)
+    for y in range(30, 450, 28):
+        draw.text((30, y), "Rx  Tab. Dolo 650  1-0-1 x 5 days  after food", fill=20)
+    quality = ai_engine.assess_image_quality(_encoded(img, "PNG"))
+    assert quality["metrics"]["median"] >= 235
+    assert "glare" not in quality["reasons"]
+
+
+@pytest.mark.parametrize("size, fmt, checked", [
+    ((300, 300), "PNG", True),    # 90 000 pixels: decoded in full
+    ((400, 300), "PNG", False),   # 120 000 pixels: too costly, skipped
+    ((400, 300), "JPEG", True),   # JPEG decodes reduced whatever its size
+])
+def test_full_decode_size_limit(monkeypatch, size, fmt, checked):
+    monkeypatch.setattr(ai_engine, "QUALITY_FULL_DECODE_MAX_PIXELS", 100_000)
+    quality = ai_engine.assess_image_quality(_encoded(_label(*size), fmt))
+    assert (quality is not None) is checked
+
+
+def test_large_photo_is_scored_on_a_reduced_copy(monkeypatch):
+    seen = []
+    small_gray = ai_engine._small_gray
+
+    def recording(image):
+        gray = small_gray(image)
+        seen.append(gray.shape)
+        return gray
+
+    monkeypatch.setattr(ai_engine, "_small_gray", recording)
+    assert ai_engine.assess_image_quality(_encoded(_label(2400, 1800))) is not None
+    assert max(seen[0]) == ai_engine.QUALITY_MAX_DIM
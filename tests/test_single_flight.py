@@ -0,0 +1,120 @@
+# tests/test_single_flight.py — identical concurrent scans share one pipeline run
+import io
+import os
+import asyncio
+import threading
+
+import pytest
+
+import ai_engine
+import metrics
+import server
+from benchmarks.stub_backend import StubBackend, install
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CountingStub(StubBackend):
+    """StubBackend that records which upstream calls were made."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+        self._calls_lock = threading.Lock()
+
+    async def _create(self, **kwargs):
+        with self._calls_lock:
+            self.calls.append(kwargs["model"])
+        return await super()._create(**kwargs)
+
+
+@pytest.fixture
+def offline_engine(monkeypatch):
+    # No shared caches, so every pipeline run has to reach the backend
+    for name in ("TTS_CACHE_MAX_BYTES", "TRANSLATION_CACHE_MAX_BYTES", "BRAND_CACHE_MAX_BYTES"):
+        monkeypatch.setattr(ai_engine, name, 0)
+    monkeypatch.setattr(ai_engine, "QUALITY_GATE", False)
+    monkeypatch.setattr(ai_engine, "SINGLE_FLIGHT", True)
+    with open(os.path.join(ROOT, "test_medicine.jpg"), "rb") as f:
+        return f.read()
+
+
+def _scan(image):
+    return ai_engine.analyze_medicine_image(image, "English", mode="two-stage")
+
+
+def test_concurrent_identical_scans_make_one_upstream_run(offline_engine):
+    image = offline_engine
+    solo = CountingStub()
+    with install(solo):
+        _scan(image)
+
+    backend = CountingStub(llm_latency=0.2)
+    before = metrics.counters().get("singleflight.deduped", 0)
+    results = []
+    start = threading.Barrier(2)
+
+    def worker():
+        start.wait()
+        results.append(_scan(image))
+
+    with install(backend):
+        threads = [threading.Thread(target=worker) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert len(results) == 2
+    assert all("error" not in data for data, _ in results)
+    assert results[0][0] == results[1][0]
+    assert results[0][0] is not results[1][0]  # each caller owns its copy
+    assert len(solo.calls) >= 2
+    assert sorted(backend.calls) == sorted(solo.calls)  # one run's worth of calls, not two
+    assert metrics.counters().get("singleflight.deduped", 0) == before + 1
+
+
+def test_duplicates_survive_the_first_requester_going_away(offline_engine, monkeypatch):
+    image = offline_engine
+    release = asyncio.Event()
+    runs = []
+
+    async def run(upload, target_language, mode):
+        runs.append(upload)
+        await release.wait()
+        upload.seek(0)  # e.g. the fused → two-stage fallback reading the upload again
+        return {"size": len(upload.read())}, None
+
+    monkeypatch.setattr(ai_engine, "_analyze_medicine_image", run)
+
+    async def scenario():
+        first, second = io.BytesIO(image), io.BytesIO(image)
+        joined = metrics.counters().get("singleflight.deduped", 0) + 1
+        owner = asyncio.ensure_future(ai_engine.analyze_medicine_image_async(first, "English", "two-stage"))
+        duplicate = asyncio.ensure_future(ai_engine.analyze_medicine_image_async(second, "English", "two-stage"))
+        while metrics.counters().get("singleflight.deduped", 0) < joined:
+            await asyncio.sleep(0.005)
+        # The first client disconnects: its request is cancelled and Flask closes its upload
+        owner.cancel()
+        first.close()
+        await asyncio.sleep(0)
+        release.set()
+        return await duplicate
+
+    assert asyncio.run(scenario()) == ({"size": len(image)}, None)
+    assert len(runs) == 1 and runs[0].closed  # the flight's own copy, closed after the run
+
+
+def test_admin_metrics_endpoint(monkeypatch):
+    client = server.app.test_client()
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "")
+    assert client.get("/api/admin/metrics", headers={"X-Admin-Token": ""}).status_code == 404
+
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "admin-secret")
+    assert client.get("/api/admin/metrics", headers={"X-Admin-Token": "wrong"}).status_code == 404
+    metrics.incr("singleflight.deduped", 0)
+    resp = client.get("/api/admin/metrics", headers={"X-Admin-Token": "admin-secret"})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert "singleflight.deduped" in body["counters"]
+    assert set(body["admission"]) >= {"running", "queued", "queued_by_class"}
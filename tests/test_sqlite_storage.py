@@ -0,0 +1,368 @@
+# tests/test_sqlite_storage.py — SQLite backend migrations, group commit and history search
+import json
+import time
+import sqlite3
+import threading
+
+import pytest
+
+from storage import sqlite as sqlite_storage
+from storage.sqlite import SQLiteStorage
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStorage(str(tmp_path / "test.db"))
+    yield store
+    store.close()
+
+
+def _medicine(name: str) -> dict:
+    return {"medicine_name": name, "active_salts": ["Paracetamol"], "dosage_strength": "650mg"}
+
+
+# ─── Result compression migration ────────────────────────────
+def _plain_text_db(store: SQLiteStorage, rows: int) -> list[dict]:
+    """A database at user_version 1 whose results are still plain JSON text."""
+    conn = store._connect(autocommit=True)
+    try:
+        store._create_baseline(conn)
+        conn.execute("INSERT INTO users (username, password_hash, created_at) VALUES ('u', 'x', '2025-01-01')")
+        results = [_medicine(f"Dolo {i}") for i in range(rows)]
+        for i, result in enumerate(results):
+            conn.execute(
+                "INSERT INTO scan_history (user_id, scan_type, language, result_json, created_at) "
+                "VALUES (1, 'medicine', 'English', ?, ?)", (json.dumps(result), f"2025-01-01T00:00:{i:02d}")
+            )
+        store._migrate_history_summary(conn)
+        conn.execute("PRAGMA user_version = 1")
+    finally:
+        conn.close()
+    return results
+
+
+def _stored(store: SQLiteStorage) -> tuple[int, list]:
+    conn = sqlite3.connect(store.path)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        return version, [row[0] for row in conn.execute("SELECT result_json FROM scan_history ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_compression_migration_commits_in_batches_and_resumes(store, monkeypatch):
+    results = _plain_text_db(store, 7)
+    monkeypatch.setattr(sqlite_storage, "MIGRATION_BATCH_ROWS", 3)
+    encode = SQLiteStorage._encode_result
+    calls = []
+
+    def failing_encode(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 5:
+            raise RuntimeError("interrupted")
+        return encode(self, *args, **kwargs)
+
+    monkeypatch.setattr(SQLiteStorage, "_encode_result", failing_encode)
+    with pytest.raises(RuntimeError):
+        store.migrate()
+    version, values = _stored(store)
+    assert version == 1
+    # The first batch was committed; the failed one rolled back
+    assert [isinstance(v, bytes) for v in values] == [True] * 3 + [False] * 4
+    first_batch = values[:3]
+
+    monkeypatch.setattr(SQLiteStorage, "_encode_result", encode)
+    store.migrate()
+    version, values = _stored(store)
+    assert version == len(SQLiteStorage._MIGRATIONS)
+    assert all(v[:1] == bytes([sqlite_storage.RESULT_FORMAT_ZLIB]) for v in values)
+    assert values[:3] == first_batch  # already compressed rows are left alone
+    assert [store._decode_result(v) for v in values] == results
+
+
+def test_compact_reencodes_every_row(store, monkeypatch):
+    results = _plain_text_db(store, 7)
+    store.migrate()
+    monkeypatch.setattr(sqlite_storage, "MIGRATION_BATCH_ROWS", 3)
+    dict_id = store.compact(vacuum=False)
+    prefix = (bytes([sqlite_storage.RESULT_FORMAT_ZSTD_DICT]) + dict_id.to_bytes(4, "big") if dict_id is not None
+              else bytes([sqlite_storage.RESULT_FORMAT_ZLIB]))
+    _, values = _stored(store)
+    assert all(v.startswith(prefix) for v in values)
+    assert [store._decode_result(v) for v in values] == results
+
+
+class _PausingConnection:
+    """Delegates to a connection; runs ``hook`` once before the first BEGIN it allows."""
+
+    def __init__(self, conn, hook):
+        self._conn = conn
+        self._hook = hook
+
+    def execute(self, sql, *args):
+        if sql == "BEGIN IMMEDIATE" and self._hook is not None and self._hook():
+            self._hook = None
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_concurrent_migrators_never_move_the_version_back(store, monkeypatch):
+    results = _plain_text_db(store, 7)
+    monkeypatch.setattr(sqlite_storage, "MIGRATION_BATCH_ROWS", 3)
+    search_runs = []
+    migrations = list(SQLiteStorage._MIGRATIONS)
+    search = migrations[2]
+
+    def counted_search(self, conn):
+        search_runs.append(1)
+        search(self, conn)
+
+    migrations[2] = counted_search
+    monkeypatch.setattr(SQLiteStorage, "_MIGRATIONS", tuple(migrations))
+
+    # Once the first worker has committed a compression batch, a second worker starts
+    # (and finishes) migrating in another thread before the first takes the lock again
+    other = SQLiteStorage(store.path)
+    errors = []
+
+    def other_worker():
+        try:
+            other.migrate()
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    def after_first_batch() -> bool:
+        _, values = _stored(store)
+        if not any(isinstance(v, bytes) for v in values):
+            return False
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        thread.join(10)
+        return True
+
+    connect = store._connect
+    monkeypatch.setattr(store, "_connect", lambda autocommit=False: _PausingConnection(
+        connect(autocommit=autocommit), after_first_batch))
+    store.migrate()
+    other.close()
+
+    assert errors == []
+    version, values = _stored(store)
+    assert version == len(SQLiteStorage._MIGRATIONS)
+    assert len(search_runs) == 1
+    assert [store._decode_result(v) for v in values] == results
+    # A later start-up finds nothing to do
+    SQLiteStorage(store.path).migrate()
+    assert _stored(store)[0] == len(SQLiteStorage._MIGRATIONS)
+
+
+def test_search_migration_can_run_twice(store):
+    store.migrate()
+    store.create_user("alice", "x")
+    alice = store.get_user("alice")[0]
+    scan = store.save_scan(alice, "medicine", "English", _medicine("Dolo 650"))
+    conn = store._connect(autocommit=True)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        store._migrate_history_search(conn)
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    assert _search_rows(store, scan) == 1
+    assert [s["id"] for s in store.search_scans(alice, ["dolo"], 10)] == [scan]
+
+
+# ─── Group commit ────────────────────────────────────────────
+class _CountingConnection:
+    """Delegates to a connection, counting the transactions it commits."""
+
+    def __init__(self, conn, commits: list):
+        self._conn = conn
+        self._commits = commits
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            self._commits.append(1)
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+@pytest.fixture
+def commits(store, monkeypatch):
+    """Commits made by the store's writer thread."""
+    store.migrate()
+    commits = []
+    connect = store._connect
+    monkeypatch.setattr(store, "_connect", lambda autocommit=False: _CountingConnection(
+        connect(autocommit=autocommit), commits) if autocommit else connect())
+    return commits
+
+
+def _hold_writer(store) -> threading.Event:
+    """Keep the writer busy in a batch of its own until the returned event is set."""
+    running, release = threading.Event(), threading.Event()
+
+    def hold(conn):
+        running.set()
+        release.wait(10)
+
+    store._write(hold, wait=False)
+    assert running.wait(10)
+    return release
+
+
+def _in_threads(store, fns: list) -> tuple[list, list]:
+    """Call store._write(fn) for each of ``fns`` from its own thread: (threads, (result, error) per fn)."""
+    outcomes = [None] * len(fns)
+
+    def call(i, fn):
+        try:
+            outcomes[i] = (store._write(fn), None)
+        except Exception as e:
+            outcomes[i] = (None, e)
+
+    threads = [threading.Thread(target=call, args=(i, fn)) for i, fn in enumerate(fns)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def _insert_user(name: str):
+    return lambda conn: conn.execute(
+        "INSERT INTO users (username, password_hash, created_at) VALUES (?, 'x', '2025-01-01')", (name,)
+    ).lastrowid
+
+
+def _wait_queued(store, count: int):
+    deadline = time.monotonic() + 10
+    while store._write_queue.qsize() < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_queued_writes_share_one_commit(store, commits):
+    release = _hold_writer(store)
+    threads, outcomes = _in_threads(store, [_insert_user(f"user{i}") for i in range(10)])
+    _wait_queued(store, 10)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert all(error is None for _, error in outcomes)
+    assert len({user_id for user_id, _ in outcomes}) == 10
+    assert len(commits) == 2  # the held batch, then all ten writes together
+    assert all(store.get_user(f"user{i}") for i in range(10))
+
+
+def test_failing_write_only_fails_its_own_caller(store, commits):
+    release = _hold_writer(store)
+    threads, outcomes = [], []
+    for fn in (_insert_user("alice"), _insert_user("alice"), _insert_user("bob")):
+        # One at a time, so the duplicate is queued second
+        started, results = _in_threads(store, [fn])
+        threads += started
+        outcomes += [results]
+        _wait_queued(store, len(threads))
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    (alice, alice_error), (_, duplicate_error), (bob, bob_error) = [results[0] for results in outcomes]
+    assert alice_error is None and bob_error is None
+    assert isinstance(duplicate_error, sqlite3.IntegrityError)
+    assert len(commits) == 2
+    assert store.get_user("alice")[0] == alice and store.get_user("bob")[0] == bob
+
+
+def test_close_commits_writes_still_queued(store, commits):
+    release = _hold_writer(store)
+    for i in range(5):
+        store._write(_insert_user(f"late{i}"), wait=False)
+    threading.Timer(0.1, release.set).start()
+    store.close()
+
+    conn = sqlite3.connect(store.path)
+    try:
+        names = [row[0] for row in conn.execute("SELECT username FROM users ORDER BY id")]
+    finally:
+        conn.close()
+    assert names == [f"late{i}" for i in range(5)]
+    assert not store._writer.is_alive()
+
+
+# ─── History pages ───────────────────────────────────────────
+def test_history_cursor_is_stable_across_equal_timestamps(store, monkeypatch):
+    import db
+
+    monkeypatch.setattr(db, "_store", store)
+    store.migrate()
+    store.create_user("alice", "x")
+    alice = store.get_user("alice")[0]
+    scans = [store.save_scan(alice, "medicine", "English", _medicine(f"Dolo {i}")) for i in range(5)]
+    # Three scans saved within the same timestamp straddle the first page boundary
+    conn = sqlite3.connect(store.path)
+    with conn:
+        conn.execute("UPDATE scan_history SET created_at = '2025-01-01T11:00:00' WHERE id = ?", (scans[0],))
+        conn.execute("UPDATE scan_history SET created_at = '2025-01-01T12:00:00' WHERE id IN (?, ?, ?)", scans[1:4])
+        conn.execute("UPDATE scan_history SET created_at = '2025-01-01T13:00:00' WHERE id = ?", (scans[4],))
+    conn.close()
+
+    pages, before = [], None
+    while True:
+        page = db.get_user_history(alice, limit=2, before=before)
+        if not page:
+            break
+        pages.append([entry["id"] for entry in page])
+        before = db.history_cursor(page[-1])
+        # A scan saved while paging is newer than the cursor and does not shift later pages
+        if len(pages) == 1:
+            store.save_scan(alice, "medicine", "English", _medicine("Crocin"))
+    assert pages == [[scans[4], scans[3]], [scans[2], scans[1]], [scans[0]]]
+
+
+# ─── History search ──────────────────────────────────────────
+def _search_rows(store: SQLiteStorage, scan_id: int) -> int:
+    conn = sqlite3.connect(store.path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM scan_search WHERE rowid = ?", (scan_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_search_is_per_user_and_follows_deletes(store):
+    store.migrate()
+    assert store.create_user("alice", "x") and store.create_user("bob", "x")
+    alice, bob = store.get_user("alice")[0], store.get_user("bob")[0]
+    alice_650 = store.save_scan(alice, "medicine", "English", _medicine("Dolo 650"))
+    alice_500 = store.save_scan(alice, "medicine", "English", _medicine("Dolonex 500"))
+    bob_650 = store.save_scan(bob, "medicine", "English", _medicine("Dolo 650"))
+
+    assert {s["id"] for s in store.search_scans(alice, ["dolo"], 10)} == {alice_650, alice_500}
+    assert [s["id"] for s in store.search_scans(bob, ["dolo"], 10)] == [bob_650]
+    assert [s["id"] for s in store.search_scans(alice, ["dolo", "650"], 10)] == [alice_650]
+
+    # bob cannot delete alice's scan; alice's own delete drops its index row
+    assert not store.delete_scan(bob, alice_650)
+    assert store.delete_scan(alice, alice_650)
+    assert _search_rows(store, alice_650) == 0
+    assert [s["id"] for s in store.search_scans(alice, ["dolo"], 10)] == [alice_500]
+    assert [s["id"] for s in store.search_scans(bob, ["dolo"], 10)] == [bob_650]
+
+
+def test_search_checks_the_owner_as_well_as_the_term_prefix(store):
+    store.migrate()
+    store.create_user("alice", "x")
+    store.create_user("bob", "x")
+    alice, bob = store.get_user("alice")[0], store.get_user("bob")[0]
+    bob_scan = store.save_scan(bob, "medicine", "English", _medicine("Crocin"))
+    # An index row carrying alice's terms but pointing at bob's scan must not leak it
+    conn = sqlite3.connect(store.path)
+    with conn:
+        conn.execute("DELETE FROM scan_search WHERE rowid = ?", (bob_scan,))
+        conn.execute("INSERT INTO scan_search (rowid, medicines, salts, diagnosis, doctor) VALUES (?, ?, '', '', '')",
+                     (bob_scan, f"u{alice}xcrocin"))
+    conn.close()
+    assert store.search_scans(alice, ["crocin"], 10) == []
@@ -0,0 +1,150 @@
+# tests/test_token_budget.py — prompt estimates, max_tokens budgets and OCR trimming
+import json
+
+import pytest
+
+import ai_engine
+import metrics
+import token_budget
+from benchmarks.stub_backend import STUB_MEDICINE_ANALYSIS, STUB_PRESCRIPTION_OCR, StubBackend, install
+
+
+# ─── Estimates and budgets ───────────────────────────────────
+def test_prompt_estimate():
+    assert token_budget.estimate_tokens("") == 0
+    assert token_budget.estimate_tokens("a" * 400) == 101      # ~4 ASCII characters a token
+    assert token_budget.estimate_tokens("क" * 400) == 201      # ~2 Indic characters a token
+    messages = [
+        {"role": "system", "content": "a" * 400},
+        {"role": "user", "content": [{"type": "text", "text": "a" * 40},
+                                     {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA"}}]},
+    ]
+    assert token_budget.estimate_messages(messages) == (4 + 101) + (4 + 11)
+
+
+def test_budgets_never_exceed_the_cap(monkeypatch):
+    long_text = "Paracetamol 650 mg twice a day after meals. " * 2000
+    assert token_budget.estimate_tokens(long_text) * token_budget.TRANSLATION_EXPANSION > token_budget.MAX_BUDGET
+    assert token_budget.translation_budget(long_text) == token_budget.MAX_BUDGET
+    monkeypatch.setattr(token_budget, "BUDGET_SCALE", 100.0)
+    for budget in (token_budget.ocr_budget("medicine"), token_budget.medicine_analysis_budget(),
+                   token_budget.prescription_analysis_budget(STUB_PRESCRIPTION_OCR)):
+        assert budget == token_budget.MAX_BUDGET
+
+
+def test_prescription_budget_follows_medicine_lines():
+    base = token_budget.prescription_analysis_budget("Dr. A. Sharma\nNo medicines here")
+    one_more = token_budget.prescription_analysis_budget("1. Tab Dolo 650 mg\n2. Tab Pan 40 mg")
+    assert one_more - base == token_budget.PRESCRIPTION_PER_MEDICINE_BUDGET
+    many = "\n".join(f"{i}. Tab Med {i}" for i in range(1, 40))
+    assert token_budget.prescription_analysis_budget(many) == token_budget._scaled(
+        token_budget.PRESCRIPTION_BASE_BUDGET
+        + token_budget.PRESCRIPTION_PER_MEDICINE_BUDGET * token_budget.PRESCRIPTION_MAX_MEDICINES)
+
+
+# ─── OCR trimming ────────────────────────────────────────────
+def _medicine_lines(text: str) -> list[str]:
+    return [line for line in text.splitlines() if token_budget._MEDICINE_LINE.search(line)]
+
+
+@pytest.mark.parametrize("max_chars", [token_budget.OCR_MAX_CHARS, 400, 320])
+def test_trimming_keeps_every_medicine_line(max_chars):
+    # Advice printed above the Rx lines, and a smudged line that is mostly symbols
+    noisy = "\n".join([
+        "Dr. A. Sharma MBBS, MD", "Advice: " + "plenty of fluids, rest " * 20,
+        "----------------------", "|||||||", "",
+        *[f"{i}) Tab. Medicine{i} 500 mg   1-0-1  x 5 days" for i in range(1, 7)],
+        "~~~ T. Dolo 650mg ~~~ ~~~ ~~~ ~~~ ~~~ ~~~",
+        "Follow up after 1 week", "Follow up after 1 week", "Signature ____________",
+    ])
+    trimmed = token_budget.trim_ocr(noisy, max_chars)
+    assert len(trimmed) <= max_chars
+    assert _medicine_lines(trimmed) == [" ".join(line.split()) for line in _medicine_lines(noisy)]
+    assert "-----" not in trimmed and "|||" not in trimmed
+
+
+def test_trimming_drops_a_looping_transcript():
+    looped = "DOLO-650\n" + "Paracetamol Tablets IP 650 mg\n" * 50 + "Exp. 01/2028"
+    assert token_budget.trim_ocr(looped) == "DOLO-650\nParacetamol Tablets IP 650 mg\nExp. 01/2028"
+
+
+# ─── Retry on truncation ─────────────────────────────────────
+# The stub backend cuts an answer off at max_tokens (4 characters a token) like the API;
+# its analysis answer is STUB_MEDICINE_ANALYSIS and its translation echoes the input.
+ANALYSIS_TOKENS = len(json.dumps(STUB_MEDICINE_ANALYSIS, ensure_ascii=False)) // 4
+JSON_REQUEST = {"model": "stub", "response_format": {"type": "json_object"},
+                "messages": [{"role": "user", "content": "Analyse this strip"}]}
+
+
+def test_truncated_json_is_retried_once_with_twice_the_budget():
+    before = metrics.counters()
+    with install(StubBackend()):
+        response = ai_engine._run_sync(ai_engine._chat("retry_json", ANALYSIS_TOKENS // 2 + 1, **JSON_REQUEST))
+    assert json.loads(response.choices[0].message.content) == STUB_MEDICINE_ANALYSIS
+    after = metrics.counters()
+    assert after["tokens.retry_json.calls"] - before.get("tokens.retry_json.calls", 0) == 2
+    assert after["tokens.retry_json.truncated"] - before.get("tokens.retry_json.truncated", 0) == 1
+    assert after["tokens.retry_json.budget"] - before.get("tokens.retry_json.budget", 0) == \
+        3 * (ANALYSIS_TOKENS // 2 + 1)
+
+
+def test_retry_stops_at_the_budget_cap(monkeypatch):
+    monkeypatch.setattr(token_budget, "MAX_BUDGET", ANALYSIS_TOKENS * 3 // 4)
+    before = metrics.counters()
+    with install(StubBackend()):
+        response = ai_engine._run_sync(ai_engine._chat("retry_cap", ANALYSIS_TOKENS // 2, **JSON_REQUEST))
+        assert ai_engine._truncated(response)
+        ai_engine._run_sync(ai_engine._chat("retry_cap", token_budget.MAX_BUDGET, **JSON_REQUEST))
+    after = metrics.counters()
+    assert after["tokens.retry_cap.calls"] - before.get("tokens.retry_cap.calls", 0) == 3
+    assert after["tokens.retry_cap.budget"] - before.get("tokens.retry_cap.budget", 0) == \
+        ANALYSIS_TOKENS // 2 + 2 * token_budget.MAX_BUDGET
+
+
+def test_cut_off_plain_text_is_not_retried():
+    request = {**JSON_REQUEST}
+    del request["response_format"]  # a cut-off free-text answer is still usable
+    before = metrics.counters().get("tokens.retry_text.calls", 0)
+    with install(StubBackend()):
+        response = ai_engine._run_sync(ai_engine._chat("retry_text", ANALYSIS_TOKENS // 2, **request))
+    assert ai_engine._truncated(response)
+    assert metrics.counters()["tokens.retry_text.calls"] == before + 1
+
+
+# ─── Translations ────────────────────────────────────────────
+# With no expansion allowance the first budget is the 64-token headroom alone: the shorter
+# summary fits in twice that, the longer one does not.
+SHORT_SUMMARY = "Dolo 650 reduces fever and body ache. Do not take more than 4 tablets a day. " * 5
+LONG_SUMMARY = SHORT_SUMMARY * 2
+
+
+@pytest.fixture
+def tight_translation_budget(monkeypatch):
+    monkeypatch.setattr(token_budget, "TRANSLATION_EXPANSION", 0)
+    monkeypatch.setattr(token_budget, "TRANSLATION_MIN_BUDGET", 0)
+    monkeypatch.setattr(ai_engine, "TRANSLATION_CACHE_MAX_BYTES", 0)
+    with install(StubBackend()):
+        yield
+
+
+def test_cut_off_translation_is_retried_with_twice_the_budget(tight_translation_budget):
+    before = metrics.counters()
+    translated = ai_engine._run_sync(ai_engine._translate_text_async(SHORT_SUMMARY, "Hindi"))
+    assert translated == "[translated] " + SHORT_SUMMARY.strip()
+    after = metrics.counters()
+    assert after["tokens.translate.budget"] - before.get("tokens.translate.budget", 0) == 64 + 128
+    assert after.get("translate.truncated_fallback", 0) == before.get("translate.truncated_fallback", 0)
+
+
+def test_translation_cut_off_twice_falls_back_to_english(tight_translation_budget):
+    before = metrics.counters()
+    assert ai_engine._run_sync(ai_engine._translate_text_async(LONG_SUMMARY, "Hindi")) == LONG_SUMMARY
+    after = metrics.counters()
+    assert after["tokens.translate.calls"] - before.get("tokens.translate.calls", 0) == 2
+    assert after["translate.truncated_fallback"] == before.get("translate.truncated_fallback", 0) + 1
+
+
+def test_first_attempt_cut_offs_are_counted_per_language(tight_translation_budget):
+    before = metrics.counters().get("tokens.translate.truncated.tamil", 0)
+    ai_engine._run_sync(ai_engine._translate_text_async(LONG_SUMMARY, "Tamil"))
+    assert metrics.counters()["tokens.translate.truncated.tamil"] == before + 1
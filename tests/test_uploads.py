@@ -0,0 +1,58 @@
+# tests/test_uploads.py — upload size limit and analysis from the spooled upload file
+import io
+import os
+
+import pytest
+
+import server
+from benchmarks.stub_backend import STUB_MEDICINE_ANALYSIS, StubBackend, install
+
+IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_medicine.jpg")
+
+
+@pytest.fixture
+def image_bytes():
+    with open(IMAGE, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def streams(monkeypatch):
+    """Upload streams handed to the medicine analysis, which then runs as usual."""
+    seen = []
+    analyze = server.analyze_medicine_image
+
+    def recording(image, **kwargs):
+        seen.append(image)
+        return analyze(image, **kwargs)
+
+    monkeypatch.setattr(server, "analyze_medicine_image", recording)
+    return seen
+
+
+def _post(image: bytes):
+    return server.app.test_client().post(
+        "/api/analyze/medicine",
+        data={"image": (io.BytesIO(image), "strip.jpg"), "language": "en"},
+        content_type="multipart/form-data",
+    )
+
+
+def test_oversized_upload_is_rejected_before_analysis(monkeypatch, image_bytes, streams):
+    monkeypatch.setitem(server.app.config, "MAX_CONTENT_LENGTH", len(image_bytes) // 2)
+    resp = _post(image_bytes)
+    assert resp.status_code == 413
+    assert "too large" in resp.get_json()["error"]
+    assert streams == []
+
+
+def test_analysis_decodes_from_the_spooled_file(monkeypatch, image_bytes, streams):
+    # Anything past 4 KB goes to disk, so the photo is read back from a temp file
+    monkeypatch.setattr(server, "UPLOAD_SPOOL_BYTES", 4096)
+    with install(StubBackend(llm_latency=0)):
+        resp = _post(image_bytes)
+
+    assert resp.status_code == 200, resp.get_json()
+    assert resp.get_json()["data"]["medicine_name"] == STUB_MEDICINE_ANALYSIS["medicine_name"]
+    [stream] = streams
+    assert stream._rolled  # the analysis got the on-disk file, not the upload as bytes
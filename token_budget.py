@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# token_budget.py — prompt size estimates and max_tokens budgets for the Groq calls
+"""
+An answer that runs long is the slowest part of a scan: generation time grows with every
+output token, and a model that starts repeating itself keeps going until max_tokens.
+Every Groq call therefore gets a max_tokens sized to the answer it should produce:
+
+  * OCR:          fixed per document kind (a strip label is short, a prescription longer)
+  * analysis:     the medicine schema is fixed-size; the prescription budget grows with
+                  the number of medicine lines found in the OCR text
+  * translation:  proportional to the estimated tokens of the text being translated
+
+Token counts are estimated locally (no tokenizer download): about 4 characters per
+token for ASCII text and 2 for Indic scripts. OCR text is cleaned of blank, symbol-only
+and repeated lines before it is pasted into a prompt. ``record`` counts budget against
+actual usage per call so the constants can be checked against live traffic.
+"""
+import os
+import re
+
+from metrics import incr
+
+# Multiplies every budget; raise it if the truncation counters climb
+BUDGET_SCALE = float(os.getenv("SANJEEVANI_TOKEN_BUDGET_SCALE", "1.0"))
+MAX_BUDGET = 8192
+
+ASCII_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 2.0
+
+OCR_BUDGETS = {"medicine": 768, "prescription": 1536}
+OCR_DEFAULT_BUDGET = 2048
+MEDICINE_ANALYSIS_BUDGET = 1024
+# One prescription medicine object (with side effects, alternatives, warnings) is ~250 tokens;
+# the base covers patient/doctor info, interactions, schedule and diet advice
+PRESCRIPTION_BASE_BUDGET = 700
+PRESCRIPTION_PER_MEDICINE_BUDGET = 320
+PRESCRIPTION_MAX_MEDICINES = 15
+# Output tokens per input token when translating English into an Indic language. This
+# sizes the first attempt only: scripts such as Tamil, Malayalam and Bengali can run
+# longer, and a translation cut off here is retried once at twice the budget (see
+# ai_engine._chat). First attempts cut off are counted per target language as
+# tokens.translate.truncated.<language>; a language that shows up there often needs
+# its own factor rather than a higher one for everybody.
+TRANSLATION_EXPANSION = 3.0
+TRANSLATION_MIN_BUDGET = 128
+
+# Longest OCR text pasted into a prompt, in characters
+OCR_MAX_CHARS = int(os.getenv("SANJEEVANI_OCR_MAX_CHARS", "6000"))
+
+_MEDICINE_LINE = re.compile(
+    r"^\s*(?:\d{1,2}\s*[.)]|(?:tab|tabs|cap|caps|syp|syr|inj|oint|susp|gel|cream|drops?|t|c)\b\.?)"
+    r"|\d+(?:\.\d+)?\s*(?:mg|mcg|ml|g|iu)\b",
+    re.IGNORECASE,
+)
+
+
+# ─── Estimation ──────────────────────────────────────────────
+def estimate_tokens(text: str) -> int:
+    """Rough token count of ``text`` for the Llama-family tokenizers Groq serves."""
+    if not text:
+        return 0
+    other = sum(1 for ch in text if ord(ch) > 127)
+    return round((len(text) - other) / ASCII_CHARS_PER_TOKEN + other / OTHER_CHARS_PER_TOKEN) + 1
+
+
+def estimate_messages(messages: list[dict]) -> int:
+    """Estimated prompt tokens of the text parts of a chat request (images are not counted)."""
+    total = 0
+    for msg in messages:
+        content = msg.get("content", "")
+        parts = [content] if isinstance(content, str) else [p.get("text", "") for p in content if p.get("type") == "text"]
+        total += 4 + sum(estimate_tokens(part) for part in parts)  # + role/format overhead
+    return total
+
+
+def medicine_lines(ocr_text: str) -> int:
+    """Lines of a prescription transcript that look like a medicine (Rx number, form, strength)."""
+    return sum(1 for line in ocr_text.splitlines() if _MEDICINE_LINE.search(line))
+
+
+# ─── Budgets ─────────────────────────────────────────────────
+def _scaled(tokens: float) -> int:
+    return max(1, min(MAX_BUDGET, int(tokens * BUDGET_SCALE)))
+
+
+def ocr_budget(kind: str | None) -> int:
+    return _scaled(OCR_BUDGETS.get(kind, OCR_DEFAULT_BUDGET))
+
+
+def medicine_analysis_budget() -> int:
+    return _scaled(MEDICINE_ANALYSIS_BUDGET)
+
+
+def prescription_analysis_budget(ocr_text: str) -> int:
+    medicines = min(max(medicine_lines(ocr_text), 1), PRESCRIPTION_MAX_MEDICINES)
+    return _scaled(PRESCRIPTION_BASE_BUDGET + PRESCRIPTION_PER_MEDICINE_BUDGET * medicines)
+
+
+def translation_budget(text: str) -> int:
+    return _scaled(max(TRANSLATION_MIN_BUDGET, estimate_tokens(text) * TRANSLATION_EXPANSION + 64))
+
+
+# ─── OCR clean-up ────────────────────────────────────────────
+def trim_ocr(text: str, max_chars: int = OCR_MAX_CHARS) -> str:
+    """
+    Drop blank, symbol-only and ruler lines ("-----", "|||"), repeated lines (a model
+    stuck in a loop) and runs of spaces, then cap the transcript at ``max_chars``. The
+    cap drops other lines from the end first: a medicine line is only lost when the
+    medicine lines alone are longer than ``max_chars``.
+    """
+    kept, previous = [], None
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        alnum = sum(ch.isalnum() for ch in line)
+        if not alnum or (len(line) > 8 and alnum < 0.3 * len(line) and not _MEDICINE_LINE.search(line)):
+            continue
+        if len(set(line.replace(" ", ""))) == 1 and len(line) > 3:
+            continue
+        if line.lower() == previous:
+            continue
+        kept.append(line)
+        previous = line.lower()
+    trimmed = "\n".join(kept)
+    if len(trimmed) > max_chars:
+        excess = len(trimmed) - max_chars
+        for i in range(len(kept) - 1, -1, -1):
+            if excess <= 0:
+                break
+            if not _MEDICINE_LINE.search(kept[i]):
+                excess -= len(kept[i]) + 1
+                kept[i] = None
+        trimmed = "\n".join(line for line in kept if line is not None)
+    if len(trimmed) > max_chars:
+        cut = trimmed.rfind("\n", 0, max_chars)
+        trimmed = trimmed[:cut if cut > 0 else max_chars]
+    if len(trimmed) < len(text):
+        incr("tokens.ocr_trimmed_chars", len(text) - len(trimmed))
+    return trimmed
+
+
+# ─── Accounting ──────────────────────────────────────────────
+def record(call: str, budget: int, prompt_estimate: int, response, tag: str | None = None) -> str:
+    """
+    Count budget and usage for one call; returns a log line describing them. A truncated
+    answer is also counted under ``tag`` (e.g. the target language) when one is given.
+    """
+    usage = getattr(response, "usage", None)
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    truncated = getattr(response.choices[0], "finish_reason", None) == "length"
+    incr(f"tokens.{call}.calls")
+    incr(f"tokens.{call}.budget", budget)
+    incr(f"tokens.{call}.prompt_estimate", prompt_estimate)
+    if prompt:
+        incr(f"tokens.{call}.prompt", prompt)
+    if completion:
+        incr(f"tokens.{call}.completion", completion)
+    if truncated:
+        incr(f"tokens.{call}.truncated")
+        if tag:
+            incr(f"tokens.{call}.truncated.{tag}")
+    return (f"Tokens {call}: prompt ~{prompt_estimate} estimated / {prompt if prompt else '?'} actual, "
+            f"completion {completion if completion else '?'} of {budget} budget" + (" — TRUNCATED" if truncated else ""))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# warm_cache.py — precompute analyses, translations and audio for common brands
+"""
+Fill the shared caches for a list of medicine brands, so strip scans of those brands skip
+the analysis, translation and TTS calls (see BRAND CACHE in ai_engine.py):
+
+    python warm_cache.py                                  # warm_brands.txt, every language
+    python warm_cache.py my_brands.txt --languages Hindi,Tamil --per-minute 20
+    python warm_cache.py --window 00:30-05:30 --exit-outside-window   # from cron, nightly
+
+One unit of work is one brand in one language: at most one analysis call (the first
+language only), one translation and one Edge TTS call. Units are rate-limited to
+--per-minute and only run inside the off-peak --window (local time). Outside it the job
+waits, or exits with --exit-outside-window. Progress is checkpointed to --state after
+every unit, so an interrupted or window-bounded run resumes where it stopped. Brands whose
+analysis fails are recorded there and retried with --retry-failed.
+
+Brand files hold one brand per line, with its strength where the brand comes in several
+("Dolo 650", "Pan 40"); "#" starts a comment.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+
+import db
+import metrics
+import ai_engine
+from admission import TokenBucket
+
+DEFAULT_BRANDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_brands.txt")
+DEFAULT_STATE = os.getenv("SANJEEVANI_WARM_STATE", "warm_cache_state.json")
+DEFAULT_WINDOW = os.getenv("SANJEEVANI_WARM_WINDOW", "01:00-06:00")
+
+
+def _safe_log(msg: str):
+    try:
+        print(msg, flush=True)
+    except (UnicodeEncodeError, UnicodeError):
+        print(msg.encode("ascii", errors="replace").decode("ascii"), flush=True)
+
+
+# ─── Inputs ──────────────────────────────────────────────────
+def read_brands(paths: list[str]) -> list[str]:
+    """Brands from the files in order, without comments, blanks or duplicates."""
+    brands, seen = [], set()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                brand = line.split("#", 1)[0].strip()
+                key = ai_engine.brand_key(brand)
+                if key and key not in seen:
+                    seen.add(key)
+                    brands.append(brand)
+    return brands
+
+
+def parse_window(spec: str) -> tuple[datetime.time, datetime.time] | None:
+    """Parse "HH:MM-HH:MM" into (start, end); may wrap past midnight. Empty means always."""
+    if not spec:
+        return None
+    start, end = (datetime.time.fromisoformat(part.strip()) for part in spec.split("-"))
+    return start, end
+
+
+def in_window(window, now: datetime.datetime) -> bool:
+    if window is None:
+        return True
+    start, end = window
+    t = now.time()
+    return start <= t < end if start <= end else t >= start or t < end
+
+
+def seconds_until_window(window, now: datetime.datetime) -> float:
+    start = datetime.datetime.combine(now.date(), window[0])
+    if start <= now:
+        start += datetime.timedelta(days=1)
+    return (start - now).total_seconds()
+
+
+# ─── Checkpoint ──────────────────────────────────────────────
+class Checkpoint:
+    """Languages done per brand, and brands whose analysis failed, kept in a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: dict[str, list[str]] = {}
+        self.failed: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            # Cache entries are keyed by model and prompt: a change means starting over
+            if state.get("version") == ai_engine.BRAND_CACHE_VERSION:
+                self.done = state.get("done", {})
+                self.failed = state.get("failed", {})
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": ai_engine.BRAND_CACHE_VERSION, "done": self.done, "failed": self.failed},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    def mark_done(self, brand: str, language: str):
+        self.done.setdefault(ai_engine.brand_key(brand), []).append(language)
+        self.failed.pop(ai_engine.brand_key(brand), None)
+        self.save()
+
+    def mark_failed(self, brand: str, error: str):
+        self.failed[ai_engine.brand_key(brand)] = error
+        self.save()
+
+    def pending(self, brands: list[str], languages: list[str], retry_failed: bool) -> list[tuple[str, str]]:
+        units = []
+        for brand in brands:
+            key = ai_engine.brand_key(brand)
+            if key in self.failed and not retry_failed:
+                continue
+            units += [(brand, language) for language in languages if language not in self.done.get(key, [])]
+        return units
+
+
+# ─── Run ─────────────────────────────────────────────────────
+def _wait_for_window(window, exit_outside: bool) -> bool:
+    """Block until the window is open; False if the job should exit instead."""
+    now = datetime.datetime.now()
+    if in_window(window, now):
+        return True
+    if exit_outside:
+        return False
+    delay = seconds_until_window(window, now)
+    _safe_log(f"[INFO] Outside the off-peak window; sleeping {delay / 3600:.1f} h")
+    time.sleep(delay)
+    return True
+
+
+def run(units: list[tuple[str, str]], checkpoint: Checkpoint, per_minute: float, window, exit_outside: bool) -> int:
+    """Warm every unit in order; returns how many were left undone."""
+    bucket = TokenBucket(per_minute / 60.0, 1)
+    failed_brands = set()
+    for i, (brand, language) in enumerate(units, start=1):
+        if brand in failed_brands:
+            continue
+        if not _wait_for_window(window, exit_outside):
+            _safe_log("[INFO] Off-peak window closed; progress saved")
+            return len(units) - i + 1
+        wait = bucket.take()
+        while wait:
+            time.sleep(wait)
+            wait = bucket.take()
+        before = metrics.counters()
+        start = time.perf_counter()
+        try:
+            ai_engine.warm_brand(brand, [language])
+        except Exception as e:
+            failed_brands.add(brand)
+            checkpoint.mark_failed(brand, str(e))
+            _safe_log(f"[WARN] {brand}: {e}")
+            continue
+        checkpoint.mark_done(brand, language)
+        after = metrics.counters()
+        made = {name: after.get(counter, 0) - before.get(counter, 0) for name, counter in (
+            ("analysis", "tokens.analysis.medicine.calls"),
+            ("translation", "translation_cache.misses"),
+            ("audio", "tts_cache.misses"),
+        )}
+        generated = ", ".join(f"{n} {name}" for name, n in made.items() if n) or "already cached"
+        _safe_log(f"[INFO] [{i}/{len(units)}] {brand} / {language}: {generated} "
+                  f"({time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Warm the analysis, translation and TTS caches for common brands.")
+    parser.add_argument("brands", nargs="*", default=[DEFAULT_BRANDS], help="brand list files (default: warm_brands.txt)")
+    parser.add_argument("--languages", default=",".join(ai_engine.LANG_MAP),
+                        help="comma-separated LANG_MAP names (default: all)")
+    parser.add_argument("--per-minute", type=float, default=float(os.getenv("SANJEEVANI_WARM_PER_MINUTE", "20")),
+                        help="brand/language units started per minute")
+    parser.add_argument("--window", default=DEFAULT_WINDOW,
+                        help="off-peak hours HH:MM-HH:MM in local time ('' for any time)")
+    parser.add_argument("--exit-outside-window", action="store_true",
+                        help="exit when outside the window instead of waiting (for cron)")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="checkpoint file")
+    parser.add_argument("--retry-failed", action="store_true", help="try brands whose analysis failed before")
+    parser.add_argument("--dry-run", action="store_true", help="list the pending work and exit")
+    args = parser.parse_args(argv)
+
+    languages = [lang.strip() for lang in args.languages.split(",") if lang.strip()]
+    unknown = [lang for lang in languages if lang not in ai_engine.LANG_MAP]
+    if unknown:
+        parser.error(f"unknown languages: {', '.join(unknown)}")
+    window = parse_window(args.window)
+    if not ai_engine.BRAND_CACHE_MAX_BYTES:
+        parser.error("the brand cache is disabled (SANJEEVANI_BRAND_CACHE_MB=0)")
+
+    brands = read_brands(args.brands)
+    checkpoint = Checkpoint(args.state)
+    units = checkpoint.pending(brands, languages, args.retry_failed)
+    _safe_log(f"[INFO] {len(brands)} brands × {len(languages)} languages: {len(units)} units pending, "
+              f"{len(checkpoint.failed)} brands failed before")
+    if args.dry_run:
+        for brand, language in units:
+            print(f"{brand}\t{language}")
+        return 0
+
+    db.init()
+    try:
+        left = run(units, checkpoint, args.per_minute, window, args.exit_outside_window)
+    except KeyboardInterrupt:
+        _safe_log("[INFO] Interrupted; progress saved")
+        return 130
+    finally:
+        ai_engine.shutdown()
+    if left:
+        _safe_log(f"[INFO] {left} units left for the next window")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# wsgi.py — production entry point for the Flask API
+"""
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module only loads Flask and the route table, so the gunicorn master
+binds the port quickly. Each worker then loads the database, OpenCV/PIL, Groq and
+Edge TTS in a background thread (post_worker_init in gunicorn.conf.py).
+"""
+from server import app
+
+__all__ = ["app"]